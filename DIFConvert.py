@@ -0,0 +1,105 @@
+## Converts between a compiled WXL DIF.DAT and the quoted TXT import format, in either direction.
+## Records are streamed through DIFDecode's record iterators and written in large buffered batches, so converting a dump of
+## several hundred MB runs at about disk speed and never holds more than one read buffer in memory. Records are kept in file
+## order and duplicate keys are left alone, the output has the same records as the input.
+## The DAT written here is a plain run of records (what DIFDecode reads), not a full unit image.
+## A DAT record has one flags field and a TXT line two numeric fields. With --flags the DAT's flags go into the first field
+## unchanged and the second is written as 0; going the other way, a line whose second field isn't 0 can't be converted.
+## Quotes inside the data are doubled in the TXT and line breaks are written as they are (the record carries on over the next
+## lines), so any data survives a round trip. A TXT with lines that aren't records isn't converted at all.
+## Usage: python DIFConvert.py wxl_dif.dat wxl_dif.txt [--expiring] [--flags]
+##        python DIFConvert.py wxl_dif.txt wxl_dif.dat [--expiring] [--flags]
+import os, sys, time, argparse, logging, coloredlogs
+import DIFDecode
+import FlavorManagement as FM
+log = logging.getLogger(__name__)
+
+TXT_ENCODING = "cp1252" # same as the DAT's data, so every character survives a round trip
+
+def file_kind(path:str):
+    extension = os.path.splitext(path)[1].lower()
+    return {".dat": "dat", ".txt": "txt"}.get(extension)
+
+def select_records(records, expiring:bool=False, counts:dict=None):
+    '''Drops expiring records unless expiring is set. counts gets "records"/"skipped".'''
+    if counts == None: counts = {"records": 0, "skipped": 0}
+    for key, record_flags, data, exp_ts in records:
+        if exp_ts != 0 and not expiring:
+            counts["skipped"] += 1
+            continue
+        counts["records"] += 1
+        yield key, record_flags, data, exp_ts
+
+def dat_flags(key:str, fields:tuple):
+    '''The DAT flags for a TXT line's numeric fields. Raises ValueError if the second one is set, the DAT has nowhere to keep it.'''
+    if fields[1] != 0:
+        raise ValueError(f"Record '{key}' has {fields[1]} in its second numeric field, which a DAT record can't hold")
+    return fields[0]
+
+def txt_key(key:str):
+    '''Raises ValueError for keys a TXT line can't hold. Data can have line breaks, the key can't.'''
+    if "\n" in key or "\r" in key or '",' in key:
+        raise ValueError(f"Record key {key!r} can't be written to a TXT")
+    return key
+
+def dat_to_txt(src:str, dst_file, expiring:bool=False, flags:bool=False, counts:dict=None):
+    records = select_records(DIFDecode.iter_wxl_dif(src), expiring, counts)
+    dst_file.writelines(FM.dif_string(txt_key(key), data.replace('"', '""'), exp_ts if exp_ts != 0 else None, (record_flags if flags else 0, 0))
+                        for key, record_flags, data, exp_ts in records)
+
+def txt_to_dat(src:str, dst_file, expiring:bool=False, flags:bool=False, counts:dict=None):
+    '''Raises ValueError if any line of src isn't part of a record, after counting them in counts["bad"].'''
+    bad_lines = []
+    records = select_records(DIFDecode.iter_wxl_txt(src, TXT_ENCODING, bad_lines), expiring, counts)
+    dst_file.writelines(DIFDecode.encode_record(key, dat_flags(key, fields) if flags else 0, data, exp_ts)
+                        for key, fields, data, exp_ts in records)
+    if bad_lines:
+        if counts != None: counts["bad"] = len(bad_lines)
+        l, text = bad_lines[0]
+        raise ValueError(f"{len(bad_lines)} line(s) of '{src}' aren't DIF records, the first is line {l}: {text.rstrip()[:80]!r}")
+
+def convert(src:str, dst:str, expiring:bool=False, flags:bool=False):
+    '''Converts src to dst, the direction is picked from the file extensions. Returns {"records", "skipped", "bad"}, the number
+    of records written, the number of expiring records left out and the number of TXT lines that weren't records. Any bad line
+    raises ValueError instead, and dst is only replaced once the conversion has finished.'''
+    direction = (file_kind(src), file_kind(dst))
+    if direction not in (("dat", "txt"), ("txt", "dat")):
+        raise ValueError(f"Can't convert '{src}' to '{dst}', one has to be a .dat and the other a .txt")
+    if os.path.realpath(src) == os.path.realpath(dst):
+        raise ValueError("The source and destination are the same file")
+    counts = {"records": 0, "skipped": 0, "bad": 0}
+    tmp_path = dst + ".tmp"
+    try:
+        if direction == ("dat", "txt"):
+            with open(tmp_path, "w", encoding=TXT_ENCODING, newline="\n", buffering=DIFDecode.BUFFER_SIZE) as dst_file:
+                dat_to_txt(src, dst_file, expiring, flags, counts)
+        else:
+            with open(tmp_path, "wb", buffering=DIFDecode.BUFFER_SIZE) as dst_file:
+                txt_to_dat(src, dst_file, expiring, flags, counts)
+        os.replace(tmp_path, dst)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return counts
+
+def main(argv=None):
+    coloredlogs.install("INFO")
+    parser = argparse.ArgumentParser(description="Convert a WXL DIF between the compiled .dat and the TXT import format.")
+    parser.add_argument("src", help="DIF to read (.dat or .txt)")
+    parser.add_argument("dst", help="DIF to write (.txt or .dat)")
+    parser.add_argument("--expiring", action="store_true", help="Keep records with an expiry timestamp (dropped by default, like DIFDecode.parse)")
+    parser.add_argument("--flags", action="store_true", help="Keep the record flags (written as 0 by default)")
+    args = parser.parse_args(argv)
+    started = time.perf_counter()
+    try:
+        counts = convert(args.src, args.dst, args.expiring, args.flags)
+    except Exception as e:
+        log.error(f"Couldn't convert '{args.src}':\n{e}", exc_info=False)
+        return 1
+    seconds = time.perf_counter() - started
+    size = os.path.getsize(args.src) / (1024 * 1024)
+    log.info(f"Wrote {counts['records']} record(s) to '{args.dst}' ({counts['skipped']} expiring left out) in {seconds:.2f}s, {size / max(seconds, 1e-6):.0f} MB/s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,21 @@
 # WXL DIF.DAT extraction code was made entirely by Needlenose! Please go check him out, most of this wouldn't have been possible without him!
 # https://github.com/needlen0se
+import re
 import json
-import pandas as pd
-import logging, coloredlogs
+import struct
+import logging
 log = logging.getLogger(__name__)
-coloredlogs.install("INFO")
+
+# Layout of one DAT record: the marker, then key (64), flags (4), data (2048) and expiry timestamp (4), big endian
+RECORD_MARKER = b"\xfa\xfa\x00\x00\x08\x52\x00\x00\x08\x48"
+RECORD_STRUCT = struct.Struct(">64sI2048sI")
+RECORD_SIZE = len(RECORD_MARKER) + RECORD_STRUCT.size # 2130
+BUFFER_SIZE = 4 * 1024 * 1024
+# "key",number,number,"data"[,exp_ts] - a quote inside the data is doubled, so the data ends at the first lone quote
+TXT_RECORD = re.compile(r'^\s*"(.*?)",\s*(\d+),\s*(\d+),\s*"((?:[^"]|"")*)"(?:,\s*"?(\d+)"?)?\s*$')
+# A record whose data is still open at the end of the line, i.e. the data has a line break in it and goes on in the next line
+TXT_RECORD_OPEN = re.compile(r'^\s*"(.*?)",\s*(\d+),\s*(\d+),\s*"(?:[^"]|"")*$')
+MAX_TXT_RECORD = 2 * (64 + 2048) + 64 # longest a record's text can get (every character a doubled quote), past this it's not one record
 
 def find_byte_pair(file_content, byte_pair):
     ### CREDIT TO NEEDLENOSE https://github.com/needlen0se ###
@@ -23,37 +34,102 @@ def find_byte_pair(file_content, byte_pair):
         log.error(f"Couldn't find byte pair - is this a valid byte stream?")
         return None
 
-def parse_wxl_dif(file_path):
+def decode_record(buffer, offset:int=0):
+    '''Decodes the record whose marker starts at offset. Returns (key, flags, data, exp_ts).'''
+    key_b, flags, data_b, exp_ts = RECORD_STRUCT.unpack_from(buffer, offset + len(RECORD_MARKER))
+    return key_b.split(b"\x00", 1)[0].decode("ascii"), flags, data_b.split(b"\x00", 1)[0].decode("cp1252"), exp_ts
+
+def encode_record(key:str, flags:int, data:str, exp_ts:int=0):
+    '''Packs one record (marker included) in the layout decode_record reads. Raises ValueError if key or data don't fit.'''
+    key_b = key.encode("ascii")
+    data_b = data.encode("cp1252")
+    if len(key_b) > 64 or len(data_b) > 2048:
+        raise ValueError(f"Record '{key}' is too long for a DIF record ({len(key_b)} byte key, {len(data_b)} byte data)")
+    return RECORD_MARKER + RECORD_STRUCT.pack(key_b, flags, data_b, exp_ts)
+
+def iter_wxl_dif(file_path, buffer_size:int=BUFFER_SIZE):
+    ### Based on Needlenose's decoder https://github.com/needlen0se ###
+    '''Yields (key, flags, data, exp_ts) for every record in a WXL DIF.DAT, expiring ones included.
+    The file is read buffer_size bytes at a time, so memory use doesn't grow with the file.'''
+    with open(file_path, "rb") as file:
+        buffer = b""
+        while True:
+            chunk = file.read(buffer_size)
+            buffer = buffer + chunk if buffer else chunk
+            pos = 0
+            while True:
+                index = buffer.find(RECORD_MARKER, pos)
+                if index == -1:
+                    pos = max(pos, len(buffer) - len(RECORD_MARKER) + 1) # a marker may be split across reads
+                    break
+                if index + RECORD_SIZE > len(buffer):
+                    pos = index # the rest of the record is in the next read
+                    break
+                yield decode_record(buffer, index)
+                pos = index + RECORD_SIZE
+            if not chunk:
+                if len(buffer) - pos >= len(RECORD_MARKER):
+                    log.debug(f"Ignored a truncated record at the end of '{file_path}'")
+                return
+            buffer = buffer[pos:]
+
+def iter_wxl_txt(file_path, encoding:str="cp1252", bad_lines:list=None):
+    '''Yields (key, fields, data, exp_ts) for every record of a TXT DIF dump, expiring ones included. fields is the pair of
+    numeric fields as written, see FM.dif_string. Doubled quotes in the data (as DIFConvert writes them) are read as one quote,
+    and data with line breaks in it carries on over the following lines.
+    bad_lines: Optional list, every non-blank line that isn't part of a record is appended to it as (line number, text).'''
+    with open(file_path, "r", encoding=encoding, newline="") as file:
+        lines = enumerate(file, start=1)
+        read_ahead = [] # lines taken for a record that didn't end up using them, read again (last one first)
+        def next_line():
+            return read_ahead.pop() if read_ahead else next(lines, None)
+        while True:
+            line = next_line()
+            if line == None:
+                return
+            l, first_text = line
+            text = first_text
+            taken = []
+            while TXT_RECORD.match(text) == None and TXT_RECORD_OPEN.match(text) != None and len(text) <= MAX_TXT_RECORD:
+                line = next_line()
+                if line == None:
+                    break
+                taken.append(line)
+                text += line[1]
+            match = TXT_RECORD.match(text)
+            if match == None:
+                read_ahead.extend(reversed(taken))
+                if first_text.strip():
+                    log.warning(f"Line {l} of '{file_path}' isn't a DIF record")
+                    if bad_lines != None:
+                        bad_lines.append((l, first_text))
+                continue
+            key, first, second, data, exp_ts = match.groups()
+            yield key, (int(first), int(second)), data.replace('""', '"'), int(exp_ts) if exp_ts != None else 0
+
+def parse_wxl_dif(file_path, expiring:list=None):
     ### CREDIT TO NEEDLENOSE https://github.com/needlen0se ###
-    '''Decodes the WXL DIF.DAT database for keys and data. Code by needlen0se'''
+    '''Decodes the WXL DIF.DAT database for keys and data. Code by needlen0se
+    expiring: Optional list, the skipped expiring records are appended to it as (key, data, exp_ts)'''
     log.debug(f"Parsing WXL DIF at path: '{file_path}'")
     try:
-        with open(file_path, "rb") as file:
-            file_content = file.read()
         results = {}
-        bytes_before_data = b"\xfa\xfa\x00\x00\x08\x52\x00\x00\x08\x48"
-        match_locations = find_byte_pair(file_content, bytes_before_data)
-        for match_location in match_locations:
-            block_size = 2130
-            match_data = file_content[match_location : match_location + block_size]
-            match_data = match_data[10:]
-            key_b = match_data[0:64]
-            # Flags aren't important for this use case.. they're basically never used
-            data_b = match_data[68:2116]
-            exp_ts = int.from_bytes(match_data[2116:2120], byteorder="big")
-            key_str = str(key_b.split(b"\x00")[0].decode("ascii"))
-            data_str = str(data_b.split(b"\x00")[0].decode("cp1252"))
+        # Flags aren't important for this use case.. they're basically never used
+        for key_str, flags, data_str, exp_ts in iter_wxl_dif(file_path):
             if exp_ts == 0: # We'll ignore expiring data since we really just need the config stuff
                 results[key_str] = data_str
+            elif expiring != None:
+                expiring.append((key_str, data_str, exp_ts))
         return results
     except:
         log.error("Couldn't decode DIF database - is this the correct file type?", exc_info=False)
         return None
     ### CREDIT TO NEEDLENOSE https://github.com/needlen0se ###
 
-def parse_wxl_txt(file_path):
+def parse_wxl_txt(file_path, expiring:list=None):
     ### written by Cable Contributes to Life ###
-    '''Scrapes the TXT DIF-DB entry format for keys and data. Returns in dict'''
+    '''Scrapes the TXT DIF-DB entry format for keys and data. Returns in dict
+    expiring: Optional list, the skipped expiring records are appended to it as (key, data, exp_ts)'''
     log.debug(f"Parsing TXT at path: '{file_path}'")
     try:
         with open(file_path, "r") as file:
@@ -75,6 +151,8 @@ def parse_wxl_txt(file_path):
                         continue
                     if exp_ts != 0:
                         log.debug(f"Expired key on line {l} - ignored")
+                        if expiring != None:
+                            expiring.append((key.strip('"'), data.strip('"'), exp_ts))
                         continue
                 key_str = key.strip('"')
                 data_str = data.strip('"')
@@ -86,23 +164,27 @@ def parse_wxl_txt(file_path):
         log.error("Couldn't decode DIF entries from TXT - is this a valid text file?")
         return None
 
-def parse(file_path:str):
+def parse(file_path:str, expiring:list=None):
+    '''Returns {key: data} for the config records of a DIF (.dat or .txt), {} if none could be read.
+    expiring: Optional list that collects the expiring records the dict leaves out, as (key, data, exp_ts). See DIFExpiry.'''
     if file_path.endswith(".dat"):
         log.info("Fetching database keys from compiled DIF file.")
-        data = parse_wxl_dif(file_path=file_path)
+        data = parse_wxl_dif(file_path=file_path, expiring=expiring)
         if data == None: return {} 
         else: return data
     elif file_path.endswith(".txt"):
         log.info("Fetching database keys from TXT file.")
-        data = parse_wxl_txt(file_path=file_path)
+        data = parse_wxl_txt(file_path=file_path, expiring=expiring)
         if data == None: return {} 
         else: return data
     else:
         log.warning("Unknown file type, attempting algorithm compatibility.")
-        data = parse_wxl_dif(file_path=file_path)
+        data = parse_wxl_dif(file_path=file_path, expiring=expiring)
         if not data:
-            data = parse_wxl_txt(file_path=file_path)
+            if expiring != None: del expiring[:] # don't keep half of a failed attempt
+            data = parse_wxl_txt(file_path=file_path, expiring=expiring)
         if not data:
             log.error("Couldn't find any database keys from the provided file.")
             return {}
+        return data
         
@@ -0,0 +1,131 @@
+## Index of the expiring records in a DIF, the ones DIFDecode.parse leaves out of its dict (anything with a non-zero exp_ts).
+## Handy when debugging a unit: what's about to expire, what's already stale, and which parts of the database it's in.
+## Records are kept in two sorted arrays, one by expiry time and one by key, so every query is a binary search plus the
+## matching slice, and nothing is parsed again after the index is built.
+## Usage: python DIFExpiry.py wxl_dif.dat [--at UNIX_TIME] [--within MINUTES] [--prefix KEY_PREFIX] [--group-parts 2]
+import sys, json, time, argparse, logging, coloredlogs
+from bisect import bisect_right
+import DIFDecode
+import DIFIndex
+log = logging.getLogger(__name__)
+
+class ExpiryIndex:
+    def __init__(self, records=(), config_keys:int=0):
+        '''records: (key, data, exp_ts) tuples, as collected by DIFDecode.parse(path, expiring=[]).
+        config_keys: Number of non-expiring keys in the same database, for the stale summary.'''
+        by_time = sorted((exp_ts, key, data) for key, data, exp_ts in records)
+        self.times = [record[0] for record in by_time]
+        self.keys = [record[1] for record in by_time]
+        self.data = [record[2] for record in by_time]
+        by_key = sorted((key, exp_ts) for exp_ts, key, data in by_time)
+        self.sorted_keys = [record[0] for record in by_key]
+        self.sorted_key_times = [record[1] for record in by_key]
+        self.config_keys = config_keys
+
+    @classmethod
+    def from_file(cls, file_path:str):
+        '''Parses a DIF once. Returns (database dict, ExpiryIndex of the records the database dict left out).'''
+        expiring = []
+        database = DIFDecode.parse(file_path, expiring=expiring)
+        return database, cls(expiring, len(database))
+
+    def __len__(self):
+        return len(self.times)
+
+    def records(self, start:int, end:int):
+        '''Returns [(exp_ts, key, data), ...] for the records sorted by expiry between positions start and end.'''
+        return list(zip(self.times[start:end], self.keys[start:end], self.data[start:end]))
+
+    def expiring_between(self, start_ts:float, end_ts:float):
+        '''Records that expire after start_ts, up to and including end_ts, soonest first.'''
+        return self.records(bisect_right(self.times, start_ts), bisect_right(self.times, end_ts))
+
+    def expiring_within(self, minutes:float, now:float=None):
+        '''Records that are still good now but expire in the next minutes.'''
+        if now == None: now = time.time()
+        return self.expiring_between(now, now + minutes * 60)
+
+    def expired(self, at:float=None):
+        '''Records that have already expired at time at (now by default), oldest first.'''
+        if at == None: at = time.time()
+        return self.records(0, bisect_right(self.times, at))
+
+    def prefix_range(self, prefix:str):
+        '''Returns the (start, end) positions of the keys starting with prefix in sorted_keys.'''
+        return DIFIndex.prefix_bounds(self.sorted_keys, prefix)
+
+    def count(self, prefix:str="", at:float=None):
+        '''Returns (expiring records, already expired at time at) for the keys starting with prefix.'''
+        if at == None: at = time.time()
+        start, end = self.prefix_range(prefix)
+        return end - start, sum(1 for exp_ts in self.sorted_key_times[start:end] if exp_ts <= at)
+
+    def prefix_counts(self, at:float=None, parts:int=2, prefix:str=""):
+        '''Groups the keys starting with prefix by their first parts "_"-separated pieces (i.e. "c_K" for parts=2).
+        Returns {group: {"expiring": n, "expired": n}} sorted by group.'''
+        if at == None: at = time.time()
+        start, end = self.prefix_range(prefix)
+        groups = {}
+        for key, exp_ts in zip(self.sorted_keys[start:end], self.sorted_key_times[start:end]):
+            counts = groups.setdefault("_".join(key.split("_")[:parts]), {"expiring": 0, "expired": 0})
+            counts["expiring"] += 1
+            if exp_ts <= at:
+                counts["expired"] += 1
+        return groups
+
+    def summary(self, at:float=None):
+        '''How much of the database is expiring or already stale at time at.'''
+        if at == None: at = time.time()
+        expired = bisect_right(self.times, at)
+        total = len(self.times) + self.config_keys
+        return {
+            "config_keys": self.config_keys,
+            "expiring": len(self.times),
+            "expired": expired,
+            "stale_percent": round(expired * 100 / total, 1) if total > 0 else 0,
+            "next_expiry": self.times[expired] if expired < len(self.times) else None,
+        }
+
+def format_ts(exp_ts:int):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(exp_ts))
+
+def main(argv=None):
+    coloredlogs.install("INFO")
+    parser = argparse.ArgumentParser(description="Show which records of a DIF are expiring or already expired.")
+    parser.add_argument("dif", help="The unit's database (wxl_dif.dat or a TXT dump)")
+    parser.add_argument("--at", type=float, default=None, help="Unix time to check against (default: now)")
+    parser.add_argument("--within", type=float, default=None, help="List the records expiring in the next MINUTES")
+    parser.add_argument("--prefix", default="", help="Only look at keys starting with this")
+    parser.add_argument("--group-parts", type=int, default=2, help="How many '_' separated parts of the key to group counts by")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args(argv)
+    at = time.time() if args.at == None else args.at
+    started = time.perf_counter()
+    database, index = ExpiryIndex.from_file(args.dif)
+    if not database and len(index) == 0:
+        log.error(f"No records found in '{args.dif}'")
+        return 1
+    log.info(f"Indexed {len(index)} expiring record(s) in {(time.perf_counter() - started) * 1000:.0f} ms")
+    results = {"at": at, "summary": index.summary(at), "groups": index.prefix_counts(at, args.group_parts, args.prefix)}
+    if args.within != None:
+        results["expiring_soon"] = [{"key": key, "exp_ts": exp_ts, "data": data} for exp_ts, key, data in index.expiring_within(args.within, at)
+                                    if key.startswith(args.prefix)]
+    if args.json:
+        sys.stdout.write(json.dumps(results, indent=4) + "\n")
+        return 0
+    summary = results["summary"]
+    lines = [f"At {format_ts(at)}: {summary['expired']} of {summary['expiring']} expiring record(s) have expired, "
+             f"{summary['stale_percent']}% of the database is stale"]
+    if summary["next_expiry"] != None:
+        lines.append(f"Next expiry: {format_ts(summary['next_expiry'])}")
+    for group, counts in results["groups"].items():
+        lines.append(f"  {group}: {counts['expiring']} expiring, {counts['expired']} expired")
+    if args.within != None:
+        lines.append(f"Expiring in the next {args.within:g} minute(s):")
+        for record in results["expiring_soon"]:
+            lines.append(f"  {format_ts(record['exp_ts'])}  {record['key']}")
+    sys.stdout.write("\n".join(lines) + "\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+## Sorted index over the keys of a parsed DIF (the dict from DIFDecode.parse), for "every key starting with c_D_" style questions
+## without walking the whole database. Keys are kept in a sorted list, so prefix and range queries are a pair of binary searches
+## plus the matching slice. Globs narrow down with their literal start, or with their literal end through a second sorted list of
+## the reversed keys (built the first time a glob needs it), and only the keys in that slice are matched against the pattern.
+## Usage: python DIFIndex.py wxl_dif.dat "c_*_product_num" [more patterns...]
+import re, sys, time, fnmatch, argparse, logging, coloredlogs
+from bisect import bisect_left
+import DIFDecode
+log = logging.getLogger(__name__)
+
+GLOB_CHARS = "*?[]"
+
+def prefix_end(prefix:str):
+    '''Returns the first string after every string starting with prefix (None if there is none).'''
+    while prefix:
+        if ord(prefix[-1]) < sys.maxunicode:
+            return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        prefix = prefix[:-1]
+    return None
+
+def prefix_bounds(sorted_keys:list, prefix:str, start:int=0):
+    '''Returns (start, end) of the keys starting with prefix in a sorted list.'''
+    start = bisect_left(sorted_keys, prefix, start)
+    end_key = prefix_end(prefix)
+    return start, len(sorted_keys) if end_key == None else bisect_left(sorted_keys, end_key, start)
+
+def glob_literals(pattern:str):
+    '''Returns the literal start and end of a glob, i.e. "c_*_product_num" -> ("c_", "_product_num").'''
+    first = min([pattern.find(char) for char in GLOB_CHARS if char in pattern] + [len(pattern)])
+    last = max([pattern.rfind(char) for char in GLOB_CHARS if char in pattern] + [-1])
+    return pattern[:first], pattern[last + 1:]
+
+class KeyIndex:
+    def __init__(self, database:dict):
+        self.database = database
+        self.keys = sorted(database)
+        self.reversed_keys = None # sorted reversed keys, for globs with a literal end
+
+    def __len__(self):
+        return len(self.keys)
+
+    def prefix(self, prefix:str):
+        '''Returns the keys starting with prefix, sorted.'''
+        start, end = prefix_bounds(self.keys, prefix)
+        return self.keys[start:end]
+
+    def range(self, low:str, high:str | None=None):
+        '''Returns the keys from low (included) up to high (not included, or to the end), sorted.'''
+        start = bisect_left(self.keys, low)
+        return self.keys[start:len(self.keys) if high == None else bisect_left(self.keys, high, start)]
+
+    def glob(self, pattern:str):
+        '''Returns the keys matching a glob (*, ?, [...]), sorted. Only the keys sharing its literal start or end are checked.'''
+        head, tail = glob_literals(pattern)
+        if head == pattern:
+            return [pattern] if pattern in self.database else []
+        start, end = prefix_bounds(self.keys, head)
+        candidates = None
+        if tail and end - start > 64:
+            if self.reversed_keys == None:
+                self.reversed_keys = sorted(key[::-1] for key in self.keys)
+            tail_start, tail_end = prefix_bounds(self.reversed_keys, tail[::-1])
+            if tail_end - tail_start < end - start:
+                candidates = sorted(key[::-1] for key in self.reversed_keys[tail_start:tail_end])
+        if candidates == None:
+            candidates = self.keys[start:end]
+        match = re.compile(fnmatch.translate(pattern)).match
+        return [key for key in candidates if match(key)]
+
+    def items(self, keys):
+        '''Returns {key: data} for keys, in order.'''
+        return {key: self.database[key] for key in keys}
+
+def main(argv=None):
+    coloredlogs.install("INFO")
+    parser = argparse.ArgumentParser(description="List the keys of a DIF matching a prefix or glob.")
+    parser.add_argument("dif", help="The unit's database (wxl_dif.dat or a TXT dump)")
+    parser.add_argument("patterns", nargs="+", help="Globs like 'c_*_product_num', or plain prefixes like 'c_D_' with --prefix")
+    parser.add_argument("--prefix", action="store_true", help="Treat the patterns as key prefixes")
+    parser.add_argument("--keys-only", action="store_true", help="Only print the keys, not their data")
+    args = parser.parse_args(argv)
+    database = DIFDecode.parse(args.dif)
+    if not database:
+        log.error(f"No database keys found in '{args.dif}'")
+        return 1
+    started = time.perf_counter()
+    index = KeyIndex(database)
+    log.info(f"Indexed {len(index)} keys in {(time.perf_counter() - started) * 1000:.0f} ms")
+    for pattern in args.patterns:
+        started = time.perf_counter()
+        keys = index.prefix(pattern) if args.prefix else index.glob(pattern)
+        log.info(f"'{pattern}': {len(keys)} key(s) in {(time.perf_counter() - started) * 1000:.2f} ms")
+        sys.stdout.writelines((key if args.keys_only else f"{key} = {database[key]}") + "\n" for key in keys)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+## The DIF config key layout of a flavor, in one place. Keys are built from one table of key formats, and read back through a
+## lookup table of every key suffix precompiled from the same formats, so encoding and decoding can't drift apart. Layer and
+## field names come back as the interned constants below, so comparing them is cheap.
+##   c_flavor_{flavor}                    INIT           @Init({flavor}){modifiers}
+##   c_{flavor}_duration                  DURATION       "60.0 sec"
+##   c_{flavor}_{layer}_num               COUNT          item count of the layer
+##   c_{flavor}_{layer}_{nn}              ITEM           item name
+##   c_{flavor}_{layer}_duration_{nn}     ITEM_DURATION  item duration
+##   c_{flavor}_{layer}_version           VERSION        see FlavorManagement.layer_version
+## A key that fits both c_flavor_{flavor} and one of the others is read as the other, i.e. c_flavor_product_num is the product
+## count of a flavor named "flavor" (not the init key of "product_num").
+import sys
+
+PRODUCT, SENSOR, MISC = LAYERS = tuple(sys.intern(layer) for layer in ("product", "sensor", "misc"))
+INIT, DURATION, COUNT, ITEM, ITEM_DURATION, VERSION = FIELDS = tuple(sys.intern(field) for field in
+                                                                      ("init", "duration", "count", "item", "item_duration", "version"))
+# c_ keys that look like flavors but are global settings
+RESERVED = frozenset(("name_prefix", "rule_file_name", "version_name", "SENSORS", "PERM", "TAG"))
+
+# field -> key builder. f-strings rather than str.format templates, building keys is on the export hot path
+KEY_FORMATS = {
+    INIT: lambda flavor, layer, index: f"c_flavor_{flavor}",
+    DURATION: lambda flavor, layer, index: f"c_{flavor}_duration",
+    COUNT: lambda flavor, layer, index: f"c_{flavor}_{layer}_num",
+    ITEM: lambda flavor, layer, index: f"c_{flavor}_{layer}_{index:02}",
+    ITEM_DURATION: lambda flavor, layer, index: f"c_{flavor}_{layer}_duration_{index:02}",
+    VERSION: lambda flavor, layer, index: f"c_{flavor}_{layer}_version",
+}
+TABLE_INDEXES = 100 # the two digit {nn}s are in the lookup table, longer ones (sensor 100+) are parsed
+SUFFIX_START = len("c__")
+
+def _build_suffixes():
+    '''Every key after "c_{flavor}_" (i.e. "product_duration_05") mapped to its (layer, field, index), built from KEY_FORMATS
+    so decode reads exactly the keys encode writes. Also returns the item suffixes without their index, for indexes past the table.'''
+    shapes = [(None, DURATION, None)]
+    for layer in LAYERS:
+        shapes += [(layer, COUNT, None), (layer, VERSION, None)]
+        for index in range(TABLE_INDEXES):
+            shapes += [(layer, ITEM, index), (layer, ITEM_DURATION, index)]
+    suffixes = {KEY_FORMATS[field]("", layer, index)[SUFFIX_START:]: (layer, field, index) for layer, field, index in shapes}
+    item_bases = {KEY_FORMATS[field]("", layer, TABLE_INDEXES)[SUFFIX_START:].rpartition("_")[0]: (layer, field)
+                  for layer in LAYERS for field in (ITEM, ITEM_DURATION)}
+    return suffixes, item_bases
+
+SUFFIXES, ITEM_BASES = _build_suffixes()
+
+def encode(flavor:str, layer:str | None, field:str, index:int | None=None):
+    '''Returns the DIF key for (flavor, layer, field, index), i.e. ("K", PRODUCT, ITEM, 3) -> "c_K_product_03".'''
+    return KEY_FORMATS[field](flavor, layer, index)
+
+def builder(field:str):
+    '''Returns the key builder for field, for loops that build lots of keys of one kind: builder(ITEM)(flavor, layer, index).'''
+    return KEY_FORMATS[field]
+
+def decode(key:str):
+    '''Returns (flavor, layer, field, index) for a flavor key (layer/index are None where the key has none), or None for
+    anything else, global settings included. One split and one table lookup, there's no pattern matching per key.'''
+    if key[:2] != "c_":
+        return None
+    flavor, _, suffix = key[2:].partition("_")
+    shape = SUFFIXES.get(suffix)
+    if shape == None:
+        base, _, index = suffix.rpartition("_")
+        if base in ITEM_BASES and len(index) > 2 and index.isascii() and index.isdigit() and index[0] != "0":
+            shape = ITEM_BASES[base] + (int(index),)
+    if shape == None:
+        if flavor == "flavor": # c_flavor_{flavor}, unless it's one of the keys of a flavor named "flavor" (checked above)
+            return None if suffix == "" or suffix in RESERVED else (suffix, None, INIT, None)
+        return None
+    if flavor == "" or flavor in RESERVED:
+        return None
+    return (flavor,) + shape
@@ -0,0 +1,156 @@
+## Headless batch validation/export of flavor JSONs. No Qt in here, so this can run from CI or cron.
+## Usage: python FlavorBatch.py flavor-data --out exported [--combined all_flavors.txt] [--summary summary.json]
+import os, sys, json, time, argparse, logging, coloredlogs
+from concurrent.futures import ProcessPoolExecutor
+import FlavorManagement as FM
+import FlavorVersions as FV
+log = logging.getLogger(__name__)
+
+def find_flavor_files(folder:str):
+    '''Returns a sorted list of every flavor JSON in the folder.'''
+    files = []
+    for entry in os.scandir(folder):
+        if entry.is_file() and entry.name.lower().endswith(".json"):
+            files.append(entry.path)
+    files.sort()
+    return files
+
+def process_flavor_file(path:str, out_dir:str | None=None, keep_dif:bool=False, unit_versions:dict | None=None):
+    '''Loads, validates and (optionally) exports a single flavor JSON. Runs inside a worker process.
+    out_dir: If given, the DIF TXT for a valid flavor is written to out_dir/<name>.txt
+    keep_dif: If True, the DIF TXT is returned in the result (used for combined exports).
+    unit_versions: The target unit's manifest entries. If given, only sections that changed since the last export are emitted.'''
+    result = {"file": path, "name": None, "ok": False, "errors": [], "output": None, "versions": None, "sections": [], "skipped": False, "timings": {}}
+    t = time.perf_counter()
+    try:
+        with open(path, "r") as flavor_file:
+            flavor = json.load(flavor_file)
+    except Exception as e:
+        result["errors"].append(f"Could not load flavor JSON: {e}")
+        result["timings"]["load"] = time.perf_counter() - t
+        return result
+    result["timings"]["load"] = time.perf_counter() - t
+    result["name"] = flavor.get("name")
+
+    t = time.perf_counter()
+    try:
+        result["errors"] = FM.error_check(flavor)
+    except Exception as e:
+        result["errors"] = [f"Could not validate flavor: {e}"]
+    result["timings"]["validate"] = time.perf_counter() - t
+    if len(result["errors"]) > 0:
+        return result
+
+    if out_dir or keep_dif:
+        t = time.perf_counter()
+        try:
+            if unit_versions != None:
+                dif, result["versions"], result["sections"] = FV.build_incremental_dif(flavor, unit_versions.get(result["name"]))
+            else:
+                result["versions"] = FV.section_hashes(flavor)
+                result["sections"] = list(FM.DIF_SECTIONS)
+                dif = FM.build_dif_txt(flavor)
+            if dif == "":
+                log.debug(f"Flavor '{result['name']}' is unchanged since the last export - skipped")
+                result["skipped"] = True
+            elif out_dir:
+                out_path = os.path.join(out_dir, f"{result['name']}.txt")
+                with open(out_path, "w") as out_f:
+                    out_f.write(dif)
+                result["output"] = out_path
+            if keep_dif:
+                result["dif"] = dif
+        except Exception as e:
+            result["errors"].append(f"Could not export flavor: {e}")
+            result["timings"]["export"] = time.perf_counter() - t
+            return result
+        result["timings"]["export"] = time.perf_counter() - t
+    result["ok"] = True
+    return result
+
+def run_batch(folder:str, out_dir:str | None=None, combined_path:str | None=None, workers:int | None=None, unit:str | None=None, manifest_path:str=FV.DEFAULT_MANIFEST_PATH):
+    '''Validates (and exports) every flavor JSON in folder across a process pool. Returns the summary dict.
+    unit: If given, the export is incremental against what the version manifest says was last exported to this unit.'''
+    started = time.perf_counter()
+    manifest = FV.VersionManifest(manifest_path) if unit != None else None
+    unit_versions = manifest.unit(unit) if manifest != None else None
+    files = find_flavor_files(folder)
+    log.info(f"Found {len(files)} flavor JSON file(s) in '{folder}'")
+    if out_dir and not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+    keep_dif = combined_path != None
+    results = []
+    if len(files) > 0:
+        with ProcessPoolExecutor(max_workers=workers, initializer=coloredlogs.install, initargs=("INFO",)) as pool:
+            futures = [pool.submit(process_flavor_file, path, out_dir, keep_dif, unit_versions) for path in files]
+            for future in futures: # collected in submission order so the output is deterministic
+                results.append(future.result())
+
+    if combined_path:
+        with open(combined_path, "w") as out_f:
+            for result in results:
+                if result["ok"] and not result["skipped"]:
+                    out_f.write(result.pop("dif"))
+        log.info(f"Wrote combined DIF for {sum(1 for r in results if r['ok'] and not r['skipped'])} flavor(s) to '{combined_path}'")
+
+    if manifest != None and (out_dir or combined_path):
+        for result in results:
+            if result["ok"] and not result["skipped"]:
+                manifest.mark_exported(unit, result["name"], result["versions"])
+        manifest.save()
+
+    names = {}
+    for result in results:
+        if result["name"]:
+            names.setdefault(result["name"], []).append(result["file"])
+    duplicates = {name: paths for name, paths in names.items() if len(paths) > 1}
+    for name, paths in duplicates.items():
+        log.warning(f"Flavor '{name}' is defined in more than one file: {', '.join(paths)}")
+
+    summary = {
+        "folder": folder,
+        "total": len(results),
+        "valid": sum(1 for r in results if r["ok"]),
+        "invalid": sum(1 for r in results if not r["ok"]),
+        "skipped": sum(1 for r in results if r["skipped"]),
+        "unit": unit,
+        "duplicates": duplicates,
+        "combined_output": combined_path,
+        "elapsed": time.perf_counter() - started,
+        "results": results,
+    }
+    return summary
+
+def main(argv=None):
+    coloredlogs.install("INFO")
+    parser = argparse.ArgumentParser(description="Validate and export a folder of flavor JSONs without the GUI.")
+    parser.add_argument("folder", help="Folder containing flavor JSON files (i.e. 'flavor-data')")
+    parser.add_argument("--out", default=None, help="Write one DIF TXT per valid flavor into this folder")
+    parser.add_argument("--combined", default=None, help="Write every valid flavor into a single DIF TXT at this path")
+    parser.add_argument("--summary", default=None, help="Write the JSON summary to this path instead of stdout")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (defaults to CPU count)")
+    parser.add_argument("--unit", default=None, help="Only export flavors/layers that changed since the last export to this unit")
+    parser.add_argument("--manifest", default=FV.DEFAULT_MANIFEST_PATH, help=f"Version manifest used with --unit (default: {FV.DEFAULT_MANIFEST_PATH})")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.folder):
+        log.error(f"Flavor folder does not exist: '{args.folder}'")
+        return 2
+    summary = run_batch(args.folder, out_dir=args.out, combined_path=args.combined, workers=args.workers, unit=args.unit, manifest_path=args.manifest)
+    for result in summary["results"]:
+        if not result["ok"]:
+            log.error(f"'{result['file']}' failed:\n" + "\n".join(f"! {err}" for err in result["errors"]))
+    log.info(f"{summary['valid']}/{summary['total']} flavor(s) passed in {summary['elapsed']:.2f}s")
+    if args.unit != None:
+        log.info(f"{summary['skipped']} flavor(s) unchanged since the last export to '{args.unit}'")
+
+    summary_json = json.dumps(summary, indent=4)
+    if args.summary:
+        with open(args.summary, "w") as summary_file:
+            summary_file.write(summary_json)
+    else:
+        sys.stdout.write(summary_json + "\n")
+    return 0 if summary["invalid"] == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+## Offscreen benchmark of the editor, so UI performance work can be measured on a headless box.
+## Loads synthetic flavors of a few sizes into a real MainWindow and drives the product/sensor dialogs the way a user would (add,
+## edit, renumber, delete), then opens DIFs with thousands of flavors in the flavor picker (filter, sort, load). Every operation
+## is timed until the event loop is idle again, so the flavor events it queued, the strips re-syncing and the repaint all count.
+## The report has latency percentiles per operation, and how many widgets were alive before and after each scenario.
+## Usage: python FlavorBenchmark.py [--products 10 50 99] [--dif-flavors 1000 5000] [--repeat 30] [--json results.json]
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen") # has to be set before PySide6 is loaded. Set it to xcb/windows to watch the run
+import sys, copy, json, math, time, random, shutil, tempfile, argparse, platform, logging, coloredlogs
+import PySide6
+from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import Qt
+import FlavorManagement as FM
+import FlavorBuilderGUI as FBG
+import FlavorTable
+log = logging.getLogger(__name__)
+
+DEFAULT_PRODUCT_COUNTS = (10, 50, 99)
+DEFAULT_DIF_FLAVORS = (1000, 5000)
+DEFAULT_REPEAT = 30
+DEFAULT_DIF_REPEAT = 5 # the DIF scenarios extract the whole file every round, so fewer rounds
+SEED = 2024
+PERCENTILES = (50, 90, 99)
+NAME_CHARS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+DURATIONS = ("2", "4.5", "8", "10", "12", "15")
+FILTERS = ("A", "B1", "Z", "Q9", "") # typed into the picker's filter box, one at a time
+
+def folder_names(folder:str, fallback:str):
+    '''The product/sensor names with a thumbnail folder, so the strips have real thumbnails to draw (made up ones without them).'''
+    names = sorted(name for name in os.listdir(folder) if os.path.isdir(os.path.join(folder, name))) if os.path.isdir(folder) else []
+    return names or [f"{fallback}{n:03}" for n in range(40)]
+
+def synthetic_flavor(rng:random.Random, name:str, products:int, sensors:int, product_names:list, sensor_names:list):
+    '''Returns a valid flavor JSON with the given number of products and sensors.'''
+    target = {
+        "name": name,
+        "init": True,
+        "modifiers": None,
+        "products": {"order": [{"name": rng.choice(product_names), "duration": FM.float_or_int(rng.choice(DURATIONS))} for _ in range(products)]},
+        "sensors": {"order": [{"name": rng.choice(sensor_names), "duration": FM.float_or_int(rng.choice(DURATIONS))} for _ in range(sensors)]},
+        "misc": {"count": 0},
+    }
+    FM.get_total_products(target)
+    FM.get_total_sensors(target)
+    return target
+
+def flavor_names(rng:random.Random, count:int):
+    names = set()
+    while len(names) < count:
+        names.add("".join(rng.choice(NAME_CHARS) for _ in range(rng.randint(2, 6))))
+    return sorted(names)
+
+def percentile(values:list, pct:float):
+    '''Nearest rank percentile of a sorted list.'''
+    return values[min(len(values) - 1, max(0, math.ceil(pct / 100 * len(values)) - 1))]
+
+def latency_summary(samples:list):
+    '''Returns {"n", "mean", "p50", "p90", "p99", "max"} in ms for a list of ms timings.'''
+    values = sorted(samples)
+    summary = {"n": len(values), "mean": round(sum(values) / len(values), 3)}
+    for pct in PERCENTILES:
+        summary[f"p{pct}"] = round(percentile(values, pct), 3)
+    summary["max"] = round(values[-1], 3)
+    return summary
+
+class Benchmark:
+    def __init__(self, app:QApplication, window, rng:random.Random):
+        self.app = app
+        self.window = window
+        self.rng = rng
+        self.product_names = folder_names("product-data", "prod")
+        self.sensor_names = folder_names("sensor-data", "par_sens")
+        self.scenarios = []
+
+    def settle(self):
+        '''Hands out the queued flavor events and lets Qt work through everything they posted (layouts, repaints).'''
+        self.window.flavor_events.flush()
+        self.app.processEvents()
+
+    def widget_count(self):
+        return len(QApplication.allWidgets())
+
+    def begin(self, name:str, **details):
+        self.settle()
+        self.current = {"name": name, **details, "widgets": {"start": self.widget_count()}, "samples": {}}
+        self.scenarios.append(self.current)
+
+    def end(self):
+        self.settle()
+        self.current["widgets"]["end"] = self.widget_count()
+        self.current["ops"] = {op: latency_summary(samples) for op, samples in self.current.pop("samples").items()}
+
+    def timed(self, op:str, function, *args):
+        '''Runs function(*args) and settles the UI, timing both. Returns what function returned.'''
+        started = time.perf_counter()
+        result = function(*args)
+        self.settle()
+        self.current["samples"].setdefault(op, []).append((time.perf_counter() - started) * 1000)
+        return result
+
+    def check_size(self, layer:str, expected:int):
+        count = len(FM.flavor[layer]["order"])
+        if count != expected:
+            raise RuntimeError(f"Expected {expected} {layer} after a round of edits, the flavor has {count}")
+
+    def edit_layer(self, kind:str, count:int):
+        '''One round of add, edit, renumber and delete on one layer through its dialogs. The layer ends up the same size.'''
+        layer = f"{kind}s"
+        names = self.product_names if kind == "product" else self.sensor_names
+        window_class = FBG.ProductWindow if kind == "product" else FBG.SensorWindow
+        def add():
+            dialog = window_class(None)
+            getattr(dialog, f"{kind}NameEditBox").setText(self.rng.choice(names))
+            getattr(dialog, f"{kind}DurEditBox").setText(self.rng.choice(DURATIONS))
+            getattr(dialog, f"confirm_{kind}")()
+        def edit(index):
+            dialog = window_class(index)
+            getattr(dialog, f"{kind}DurEditBox").setText(self.rng.choice(DURATIONS))
+            getattr(dialog, f"confirm_{kind}")()
+        def renumber(index, new_index):
+            dialog = FBG.RenumberWindow(index, layer)
+            dialog.renumberEditBox.setText(str(new_index))
+            dialog.renumber_prod()
+        def delete(index):
+            getattr(window_class(index), f"delete_{kind}")()
+        self.timed(f"add_{kind}", add)
+        self.timed(f"edit_{kind}", edit, self.rng.randrange(count + 1))
+        self.timed(f"renumber_{kind}", renumber, self.rng.randrange(count + 1), self.rng.randrange(count + 1))
+        self.timed(f"delete_{kind}", delete, self.rng.randrange(count + 1))
+        self.check_size(layer, count)
+
+    def flavor_scenario(self, products:int, sensors:int, repeat:int):
+        target = synthetic_flavor(self.rng, "BENCH", products, sensors, self.product_names, self.sensor_names)
+        FM.set_flavor(copy.deepcopy(target)) # warm up: the first load decodes the thumbnails in the background
+        self.settle()
+        self.window.thumbnails.wait_for_pending()
+        self.begin(f"{products} products, {sensors} sensors", products=products, sensors=sensors)
+        for _ in range(repeat):
+            self.timed("load", FM.set_flavor, copy.deepcopy(target))
+            self.timed("refresh_flavor", self.window.refresh_flavor)
+            self.timed("get_products", self.window.get_products)
+            self.timed("get_sensors", self.window.get_sensors)
+            self.timed("repaint", self.window.repaint)
+            self.edit_layer("product", products)
+            if sensors > 0:
+                self.edit_layer("sensor", sensors)
+        self.end()
+
+    def dif_scenario(self, flavor_count:int, repeat:int, folder:str):
+        import FlavorExtractor as FE
+        path = os.path.join(folder, f"bench_{flavor_count}.txt")
+        with open(path, "w") as dif_file:
+            for name in flavor_names(self.rng, flavor_count):
+                target = synthetic_flavor(self.rng, name, self.rng.randint(1, 99), self.rng.randint(0, 30), self.product_names, self.sensor_names)
+                dif_file.write(FM.build_dif_txt(target))
+        self.begin(f"DIF with {flavor_count} flavors", dif_flavors=flavor_count)
+        open_widgets = 0
+        for _ in range(repeat):
+            flavors = self.timed("extract", FE.extract_flavors_from_file, path)
+            dialog = self.timed("picker_open", self.open_picker, flavors)
+            open_widgets = max(open_widgets, self.widget_count())
+            for text in FILTERS:
+                self.timed("picker_filter", dialog.filter_box.setText, text)
+            for column in range(len(FlavorTable.COLUMNS)):
+                order = Qt.DescendingOrder if self.rng.random() < 0.5 else Qt.AscendingOrder
+                self.timed("picker_sort", dialog.list.sortByColumn, column, order)
+            self.timed("picker_load", self.load_from_picker, dialog, self.rng.randrange(len(flavors)))
+            dialog = None
+        self.end()
+        self.current["widgets"]["picker_open"] = open_widgets
+
+    def open_picker(self, flavors:dict):
+        dialog = FBG.FoundFlavorsWindow(flavors)
+        dialog.show()
+        return dialog
+
+    def load_from_picker(self, dialog, row:int):
+        '''What the "Load Selected" button does, plus the refresh MainWindow.load_dif_flavors runs once the picker is accepted.'''
+        dialog.list.selectRow(row)
+        dialog.load_flavor()
+        self.window.refresh_flavor()
+
+def run(product_counts=DEFAULT_PRODUCT_COUNTS, dif_flavors=DEFAULT_DIF_FLAVORS, repeat:int=DEFAULT_REPEAT,
+        dif_repeat:int=DEFAULT_DIF_REPEAT, seed:int=SEED, trace:str=None):
+    '''Runs every scenario in one MainWindow and returns the results. trace: Also write a Chrome trace of the handlers to this file.'''
+    tracer = FBG.start_tracing(slow_ms=float("inf"), stall_ms=float("inf"))[0] if trace else None # timed here, not logged
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    folder = tempfile.mkdtemp(prefix="flavor_bench_")
+    previous_flavor = copy.deepcopy(FM.flavor) # the window fills in (and the scenarios replace) the active flavor
+    window = FBG.MainWindow(autosave_folder=os.path.join(folder, "autosave")) # never touches (or offers to recover) the real autosave
+    window.show()
+    benchmark = Benchmark(app, window, random.Random(seed))
+    started = time.perf_counter()
+    try:
+        for products in product_counts:
+            log.info(f"Benchmarking a flavor with {products} products")
+            benchmark.flavor_scenario(products, products, repeat)
+        for flavor_count in dif_flavors:
+            log.info(f"Benchmarking a DIF with {flavor_count} flavors")
+            benchmark.dif_scenario(flavor_count, dif_repeat, folder)
+    finally:
+        window.close()
+        window = None
+        FM.flavor = previous_flavor
+        shutil.rmtree(folder, ignore_errors=True)
+        if tracer != None:
+            tracer.restore() # the next traced run instruments everything again
+    if tracer != None:
+        log.info(f"Wrote {tracer.export(trace)} trace event(s) to '{trace}'")
+    return {
+        "platform": QApplication.platformName(),
+        "qt": PySide6.__version__,
+        "python": platform.python_version(),
+        "seed": seed,
+        "seconds": round(time.perf_counter() - started, 2),
+        "scenarios": benchmark.scenarios,
+    }
+
+def format_report(results:dict):
+    lines = [f"Flavor Builder UI benchmark (Qt {results['qt']}, {results['platform']} platform, {results['seconds']} s)"]
+    columns = ["n", "mean"] + [f"p{pct}" for pct in PERCENTILES] + ["max"]
+    for scenario in results["scenarios"]:
+        widgets = scenario["widgets"]
+        lines.append("")
+        lines.append(f"{scenario['name']}: {widgets['start']} widget(s) before, {widgets['end']} after" +
+                     (f", {widgets['picker_open']} with the picker open" if "picker_open" in widgets else ""))
+        lines.append(f"  {'operation (ms)':<20}" + "".join(f"{column:>10}" for column in columns))
+        for op, summary in scenario["ops"].items():
+            lines.append(f"  {op:<20}" + "".join(f"{summary[column]:>10}" if column == "n" else f"{summary[column]:>10.2f}" for column in columns))
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the Flavor Builder's editor and flavor picker offscreen.")
+    parser.add_argument("--products", type=int, nargs="*", default=list(DEFAULT_PRODUCT_COUNTS), help="Flavor sizes to edit (products, and as many sensors)")
+    parser.add_argument("--dif-flavors", type=int, nargs="*", default=list(DEFAULT_DIF_FLAVORS), help="Flavor counts of the DIFs to open in the picker")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Rounds of edits per flavor size")
+    parser.add_argument("--dif-repeat", type=int, default=DEFAULT_DIF_REPEAT, help="Rounds of extract/open/filter/sort/load per DIF")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--json", metavar="FILE", help="Also write the results to FILE as JSON")
+    parser.add_argument("--trace", metavar="FILE", help="Write a Chrome trace of the editor's handlers to FILE (see FlavorTrace.py)")
+    parser.add_argument("--log-level", default="WARNING", help="The editor logs every edit at INFO, which would end up in the timings")
+    args = parser.parse_args(argv)
+    coloredlogs.install(args.log_level)
+    if any(products < 1 or products > 99 for products in args.products):
+        parser.error("--products must be between 1 and 99")
+    results = run(args.products, args.dif_flavors, args.repeat, args.dif_repeat, args.seed, args.trace)
+    sys.stdout.write(format_report(results) + "\n")
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json.dump(results, json_file, indent=4)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,42 +1,55 @@
 # Cable Contributes to Life
-import sys, logging, coloredlogs, os
+import time
+STARTED = time.perf_counter() # startup is timed from here, the first window paint is logged against it
+import sys, argparse, logging, coloredlogs, os
 from PySide6.QtWidgets import (
-    QApplication, QWidget, QScrollArea, QHBoxLayout,
+    QApplication, QWidget, QHBoxLayout,
     QVBoxLayout, QPushButton, QFrame, QFileDialog, QToolButton,
-    QLabel, QLineEdit, QDialog, QMessageBox, QCheckBox, QListWidget, QListWidgetItem, QAbstractItemView, QMenu
+    QLabel, QLineEdit, QDialog, QMessageBox, QCheckBox, QAbstractItemView, QMenu,
+    QTableView, QHeaderView
 )
-from PySide6.QtGui import QIcon
-from PySide6.QtCore import QSize, Qt
+from PySide6.QtCore import QSize, Qt, QTimer
 import FlavorManagement as FM
-import FlavorExtractor as FE
+import FlavorJournal as FJ
+import FlavorEvents as FEV
+import ThumbnailCache
+import LayerStrip
+import FlavorTable
 
 log = logging.getLogger("FlavorBuilderGUI")
-coloredlogs.install("INFO")
 
-if not os.path.exists("flavor-data"):
-    os.makedirs("flavor-data")
-if not os.path.exists("product-data"):
-    os.makedirs("product-data")
-if not os.path.exists("sensor-data"):
-    os.makedirs("sensor-data")
+AUTOSAVE_DELAY_MS = 3000 # compact the autosave journal into a full snapshot after this long without edits
 
 class FoundFlavorsWindow(QDialog):
     def __init__(self, flavors:dict):
         super().__init__()
-        self.resize(350,350)
+        self.resize(520,420)
         self.flavors = flavors
         layout = QVBoxLayout()
         self.setWindowTitle("DIF Flavor Manager")
-        found_label = QLabel("Flavors extracted from database:")
-        
-        self.list = QListWidget()
+        found_label = QLabel(f"Flavors extracted from database ({len(self.flavors)}):")
+
+        self.filter_box = QLineEdit()
+        self.filter_box.setPlaceholderText("Filter flavors by name...")
+        self.filter_box.setClearButtonEnabled(True)
+
+        self.model = FlavorTable.FlavorTableModel(self.flavors, self)
+        self.proxy = FlavorTable.FlavorFilterProxy(self)
+        self.proxy.setSourceModel(self.model)
+        self.filter_box.textChanged.connect(self.proxy.set_filter_text)
+        self.list = QTableView()
+        self.list.setModel(self.proxy)
         self.list.setSelectionMode(QAbstractItemView.MultiSelection)
-        
-        flavor_list = []
-        for flavor in self.flavors:
-            flavor_list.append(flavor)
-        flavor_list.sort()
-        self.list.addItems(flavor_list)
+        self.list.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.list.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder) # names start out sorted, sort again only when asked
+        self.list.setSortingEnabled(True)
+        self.list.horizontalHeader().setStretchLastSection(True) # fixed column widths, sizing to contents would read every row
+        self.list.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.list.verticalHeader().hide()
+        self.list.setWordWrap(False)
+        self.list.setColumnWidth(FlavorTable.COLUMNS.index("Init"), 40)
+        self.list.setColumnWidth(FlavorTable.COLUMNS.index("Modifiers"), 160)
+        self.list.setColumnWidth(FlavorTable.COLUMNS.index("Products"), 70)
         
         options_row = QHBoxLayout()
         load_flavor_btn = QPushButton("Load Selected")
@@ -52,33 +65,37 @@ class FoundFlavorsWindow(QDialog):
         options_widget.setLayout(options_row)
 
         layout.addWidget(found_label)
+        layout.addWidget(self.filter_box)
         layout.addWidget(self.list)
         layout.addWidget(options_widget)
         self.setLayout(layout)
     
+    def selected_names(self):
+        '''Returns the names of the selected flavors, in the order they're shown.'''
+        rows = sorted(self.list.selectionModel().selectedRows(FlavorTable.NAME_COLUMN), key=lambda index: index.row())
+        return [self.model.flavor_name(self.proxy.mapToSource(index).row()) for index in rows]
+
     def load_flavor(self):
-        selection = self.list.selectedItems()
+        selection = self.selected_names()
+        if len(selection) == 0:
+            return
         if len(selection) > 1:
             warning = (f"Only one flavor may be loaded into the editor at a time.")
             log.error(warning)
             QApplication.beep()  # Plays default system alert sound
             QMessageBox.warning(self, "Warning", warning)
         else:
-            selected = selection[0].text()
+            selected = selection[0]
             selected_flavor = self.flavors.get(selected)
-            FM.flavor = selected_flavor
+            FM.set_flavor(selected_flavor)
             log.info(f"Loaded flavor '{FM.flavor.get('name', 'Untitled')}'")
             self.accept()
             self.close()
 
     def save_selected_flavors(self):
-        tmp_flavor_cache = FM.flavor # CONTEXT: i'm too lazy to add logic or write a new save function, so i'm just going to load each flavor to the FlavorManagement global and then run the save function. 
-        # once the saves are complete, i'll reload the cached flavor as to not lose the user's progress, should they cancel loading a flavor from the list.
-        selections = self.list.selectedItems()
-        for selection in selections:
-            flavor_name = selection.text()
+        # FM's save and error check take the flavor to work on, so the active flavor is left alone while saving the discovered ones
+        for flavor_name in self.selected_names():
             flavor = self.flavors.get(flavor_name)
-            FM.flavor = flavor
             log.debug(f"Prompting save for flavor '{flavor_name}'")
             flavor_name_path = os.path.join("flavor-data", f"{flavor_name}.json")
             file_path, _ = QFileDialog.getSaveFileName(
@@ -88,11 +105,9 @@ class FoundFlavorsWindow(QDialog):
             "JSON Files (*.json);;All Files (*)"
             )
             if file_path:
-                self.save_flavor(output_path=file_path)
-        FM.flavor = tmp_flavor_cache # return the active flavor back to what it was before saving the discovered flavors
+                self.save_flavor(output_path=file_path, flavor=flavor)
 
     def save_all_flavors(self):
-        tmp_flavor_cache = FM.flavor
         #flavor_name_path = os.path.join("flavor-data", f"{flavor_name}.json")
         folder_path = QFileDialog.getExistingDirectory(
         self,
@@ -100,17 +115,18 @@ class FoundFlavorsWindow(QDialog):
         "flavor-data", 
         QFileDialog.ShowDirsOnly | QFileDialog.DontResolveSymlinks
         )
+        if not folder_path:
+            log.debug(f"Save aborted.")
+            return
         for flavor_name in self.flavors:
             flavor = self.flavors.get(flavor_name)
-            FM.flavor = flavor
             file_path = os.path.join(folder_path, f"{flavor_name}.json")
-            self.save_flavor(output_path=file_path)
-        FM.flavor = tmp_flavor_cache
+            self.save_flavor(output_path=file_path, flavor=flavor)
 
-    def save_flavor(self, output_path):
-        FM.save_flavor(output_path)
+    def save_flavor(self, output_path, flavor:dict):
+        FM.save_flavor(output_path, target=flavor)
         ## ERROR CHECK BEFORE SAVE ##
-        self.ErrorList = FM.error_check()
+        self.ErrorList = FM.error_check(flavor)
         ErrorString = ""
         for error in self.ErrorList:
             ErrorString += f"{error}\n"
@@ -387,7 +403,7 @@ class ProductWindow(QDialog):
 
 
 class MainWindow(QWidget):
-    def __init__(self):
+    def __init__(self, autosave_folder:str=FJ.AUTOSAVE_FOLDER):
         ## SETUP
         super().__init__()
         self.flavor_length = 0
@@ -401,6 +417,9 @@ class MainWindow(QWidget):
         self.resize(800, 600)
         self.selected_file = None
         self.ErrorList = []
+        self.first_paint_logged = False
+        self.thumbnails = ThumbnailCache.get_cache()
+        self.thumbnails.changed.connect(self.thumbnails_changed)
 
         main_layout = QVBoxLayout()
 
@@ -420,6 +439,9 @@ class MainWindow(QWidget):
         self.exportDIFbtn = QPushButton("Export Flavor to DIF")
         self.exportDIFbtn.clicked.connect(self.export_dif_txt)
         main_layout.addWidget(self.exportDIFbtn)
+        self.previewbtn = QPushButton("Preview Forecast")
+        self.previewbtn.clicked.connect(self.preview_flavor)
+        main_layout.addWidget(self.previewbtn)
 
         # FLAVOR ERROR WIDGET
         self.ErrorMessageLabel = QLabel("")
@@ -468,66 +490,128 @@ class MainWindow(QWidget):
 
         # PRODUCT ORDER CONTAINER
         self.product_duration_label = QLabel(f"Products Length: 0 seconds")
-        self.product_area = QScrollArea()
-        self.product_area.setWidgetResizable(True)
-        self.product_area.setFixedHeight(160)
-        container_products = QFrame()
-        self.products_layout_root = QVBoxLayout(container_products)
+        self.product_model = LayerStrip.LayerModel("product", self)
+        self.product_model.moved.connect(self.strip_moved)
+        self.product_view = LayerStrip.LayerStripView("product", self.product_model)
+        self.product_view.clicked.connect(lambda index: self.edit_product(index.row()))
+        self.product_view.customContextMenuRequested.connect(lambda pos: self.strip_context_menu("product", pos))
+        self.product_area = QFrame()
+        self.products_layout_root = QVBoxLayout(self.product_area)
         self.products_layout_root.addWidget(self.product_duration_label)
         self.products_layout = QHBoxLayout()
         self.products_layout.setSpacing(10)
-        self.product_area.setWidget(container_products)
+        self.products_layout.addWidget(self.product_view)
         self.products_layout_root.addLayout(self.products_layout)
         main_layout.addWidget(self.product_area)
+        # ADD PRODUCT BUTTON AT THE END
+        addproductbtn = QToolButton()
+        addproductbtn.setIcon(self.thumbnails.static_icon("app/add.png"))
+        addproductbtn.setIconSize(QSize(100, 100))
+        addproductbtn.setFixedSize(110, 110)
+        addproductbtn.setText("Add Product")
+        addproductbtn.setToolButtonStyle(Qt.ToolButtonTextUnderIcon)
+        addproductbtn.clicked.connect(self.add_product)
+        self.products_layout.addWidget(addproductbtn)
         
         # SENSOR ORDER CONTAINER
         self.sensor_duration_label = QLabel(f"Sensors Length: 0 seconds")
-        self.sensor_area = QScrollArea()
-        self.sensor_area.setWidgetResizable(True)
-        self.sensor_area.setFixedHeight(110)
-        container_sensors = QFrame()
-        self.sensors_layout_root = QVBoxLayout(container_sensors)
+        self.sensor_model = LayerStrip.LayerModel("sensor", self)
+        self.sensor_model.moved.connect(self.strip_moved)
+        self.sensor_view = LayerStrip.LayerStripView("sensor", self.sensor_model)
+        self.sensor_view.clicked.connect(lambda index: self.edit_sensor(index.row()))
+        self.sensor_view.customContextMenuRequested.connect(lambda pos: self.strip_context_menu("sensor", pos))
+        self.sensor_area = QFrame()
+        self.sensors_layout_root = QVBoxLayout(self.sensor_area)
         self.sensors_layout_root.addWidget(self.sensor_duration_label)
         self.sensors_layout = QHBoxLayout()
         self.sensors_layout.setSpacing(10)
+        self.sensors_layout.addWidget(self.sensor_view)
         self.sensors_layout_root.addLayout(self.sensors_layout)
-        self.sensor_area.setWidget(container_sensors)
         main_layout.addWidget(self.sensor_area)
+        btn = QToolButton()
+        btn.setIcon(self.thumbnails.static_icon("app/add_sens.png"))
+        btn.setIconSize(QSize(100, 50))
+        btn.setFixedSize(110, 50)
+        btn.setText("Add Sensor")
+        btn.setToolButtonStyle(Qt.ToolButtonTextUnderIcon)
+        btn.clicked.connect(self.add_sensor)
+        self.sensors_layout.addWidget(btn)
 
         self.lf_length_label = QLabel(f"Total Forecast Length: 0 seconds")
+        main_layout.addWidget(self.lf_length_label)
 
-        # PRODUCTS AND SENSORS (NONE BY DEFAULT)
-        self.get_products()
-        self.get_sensors()
+        # FLAVOR EVENTS - each part of the editor only updates when something it shows has changed
+        self.flavor_events = FEV.FlavorEvents(self)
+        self.flavor_events.subscribe({FEV.PRODUCT_CHANGED, FEV.PRODUCT_MOVED}, lambda events: self.get_products())
+        self.flavor_events.subscribe({FEV.SENSOR_CHANGED, FEV.SENSOR_MOVED}, lambda events: self.get_sensors())
+        self.flavor_events.subscribe({FEV.PRODUCT_CHANGED}, self.update_clock_length)
+        self.flavor_events.subscribe({FEV.PRODUCT_CHANGED, FEV.SENSOR_CHANGED}, self.update_duration_labels)
+        self.flavor_events.subscribe({FEV.NAME, FEV.CLOCK, FEV.PRODUCT_CHANGED}, self.update_errors)
+        self.flavor_events.subscribe({FEV.NAME}, self.update_title)
+        self.flavor_events.subscribe({FEV.REPLACED}, self.update_settings)
 
+        self.setLayout(main_layout)
 
-        main_layout.addWidget(self.lf_length_label)
+        # AUTOSAVE JOURNAL (crash recovery)
+        self.autosave_timer = QTimer(self)
+        self.autosave_timer.setSingleShot(True)
+        self.autosave_timer.setInterval(AUTOSAVE_DELAY_MS)
+        self.journal = FJ.FlavorJournal(autosave_folder, on_record=self.autosave_timer.start) # every edit pushes the snapshot back, debouncing it
+        self.autosave_timer.timeout.connect(self.journal.compact)
+        recovered = self.recover_autosave()
+        self.refresh_flavor() # PRODUCTS AND SENSORS (NONE BY DEFAULT)
+        self.journal.start(snapshot=recovered) # after the first refresh, which re-applies the clock - that isn't an edit to recover
+
+    def recover_autosave(self):
+        '''Offers to restore the flavor from the autosave journal if the last session didn't close cleanly. Returns True if it was restored.'''
+        if not self.journal.has_session():
+            return False
+        QApplication.beep()
+        response = QMessageBox.question(
+            self,
+            "Restore Unsaved Flavor?",
+            "The Flavor Builder didn't close properly last time. Do you want to restore the flavor you were editing?",
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.Yes
+        )
+        if response == QMessageBox.Yes:
+            self.journal.recover()
+            self.refresh_flavor()
+            return True
+        log.info("Discarded autosaved flavor")
+        return False
 
-        self.setLayout(main_layout)
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.first_paint_logged:
+            self.first_paint_logged = True
+            QTimer.singleShot(0, self.log_first_paint) # after the child widgets have painted too
+
+    def log_first_paint(self):
+        log.info(f"First window paint {(time.perf_counter() - STARTED) * 1000:.0f} ms after startup")
+
+    def closeEvent(self, event):
+        self.autosave_timer.stop()
+        self.flavor_events.close()
+        self.journal.close(discard=True) # clean exit, nothing to recover next time
+        super().closeEvent(event)
 
 
     def clock_toggle(self, state):
         if state == Qt.CheckState.Checked.value: # compares int to int, resolving issue #1
-            FM.update_clock_setting(True, self.total_product_length)
+            FM.update_clock_setting(True, FM.get_total_products()[1])
             log.info(f"On-screen clock enabled")
         else:
-            FM.update_clock_setting(False, self.total_product_length)
+            FM.update_clock_setting(False, FM.get_total_products()[1])
             log.info(f"On-screen clock disabled")
-         ## ERROR CHECK UPON UPDATE ##
-        self.ErrorList = FM.error_check()
-        ErrorString = ""
-        for error in self.ErrorList:
-            ErrorString += f"{error}\n"
-        self.ErrorMessageLabel.setText(ErrorString)
 
     def init_flavor(self, state):
         if state == Qt.CheckState.Checked.value: # compares int to int, resolving issue #1
             self.flavorInitMod.setEnabled(True)
-            FM.flavor["init"] = True
+            FM.set_init(True)
         else:
             self.flavorInitMod.setEnabled(False)
-            FM.flavor["init"] = False
-            FM.flavor["modifiers"] = None
+            FM.set_init(False)
 
     def reset_everything(self):
         QApplication.beep()
@@ -540,13 +624,11 @@ class MainWindow(QWidget):
         )
         if response == QMessageBox.Yes:
             log.debug("Attempting to reset flavor config")
-            FM.flavor = {} # reset! LOL
+            FM.clear_flavor() # reset! LOL
             self.flavorNameEditBox.setText("")
             self.clockBox.setChecked(False)
             self.flavorInitBox.setChecked(False)
             self.flavorInitMod.setText("")
-            self.get_products()
-            self.get_sensors()
 
     def load_json_file(self):
         file_path, _ = QFileDialog.getOpenFileName(
@@ -573,13 +655,7 @@ class MainWindow(QWidget):
         if file_path:
             self.selected_file = file_path
             FM.save_flavor(file_path)
-            ## ERROR CHECK BEFORE SAVE ##
-            self.ErrorList = FM.error_check()
-            ErrorString = ""
-            for error in self.ErrorList:
-                ErrorString += f"{error}\n"
-            self.ErrorMessageLabel.setText(ErrorString)
-            #############################
+            self.update_errors() # ERROR CHECK BEFORE SAVE
             if len(self.ErrorList) > 0:
                 warning = (f"You have saved a flavor with configuration errors. You will not be able to export this flavor to DIF until you resolve the following errors:\n"
                  + ", ".join(f"\n! {err}" for err in self.ErrorList)          
@@ -590,12 +666,11 @@ class MainWindow(QWidget):
 
     def refresh_flavor(self):
         '''Refreshes all of the editor elements to reflect the current state of FM.flavor'''
-        self.flavor_name = FM.flavor.get("name")
-        self.setWindowTitle(f"WeatherSTAR XL Flavor Builder | Editing Flavor: {self.flavor_name}")
-        self.flavorNameEditBox.setText(self.flavor_name)
-        ## LOAD INTO EDITOR:
-        self.get_products() # Get the products to show in the list
-        self.get_sensors()
+        self.flavor_events.refresh()
+
+    def update_settings(self, events=None):
+        '''Fills in the name, clock and init widgets from FM.flavor after a new flavor was loaded.'''
+        self.flavorNameEditBox.setText(FM.flavor.get("name"))
         misc_order = FM.flavor.get("misc", {}).get("order", None)
         if misc_order:
             # Clock might be enabled but let's check
@@ -615,6 +690,8 @@ class MainWindow(QWidget):
             self.flavorInitMod.setText(flavor_mods)
         else:
             self.flavorInitMod.setText("")
+
+    def update_errors(self, events=None):
         ## ERROR CHECK UPON UPDATE ##
         self.ErrorList = FM.error_check()
         ErrorString = ""
@@ -622,6 +699,22 @@ class MainWindow(QWidget):
             ErrorString += f"{error}\n"
         self.ErrorMessageLabel.setText(ErrorString)
 
+    def update_title(self, events=None):
+        self.flavor_name = FM.flavor.get("name")
+        self.setWindowTitle(f"WeatherSTAR XL Flavor Builder | Editing Flavor: {self.flavor_name}")
+
+    def update_clock_length(self, events=None):
+        '''Keeps the clock as long as the products.'''
+        if self.clockBox.isChecked():
+            FM.update_clock_setting(True, FM.get_total_products()[1])
+
+    def update_duration_labels(self, events=None):
+        self.total_product_count, self.total_product_length = FM.get_total_products()
+        self.total_sensor_count, self.total_sensor_length = FM.get_total_sensors()
+        self.product_duration_label.setText(f"Products Length: {self.total_product_length} seconds")
+        self.sensor_duration_label.setText(f"Sensors Length: {self.total_sensor_length} seconds")
+        self.lf_length_label.setText(f"Total Forecast Length: {self.total_product_length} seconds")
+
     def load_dif_flavors(self):
         file_path, _ = QFileDialog.getOpenFileName(
             self,
@@ -630,6 +723,7 @@ class MainWindow(QWidget):
             "WXL DIF Files (*.dat *.txt);;All Files (*)"
         )
         if file_path:
+            import FlavorExtractor as FE # the DIF decoder stack is only loaded the first time it's needed
             extracted_flavors = FE.extract_flavors_from_file(file_path=file_path)
             dialog = FoundFlavorsWindow(extracted_flavors)
             if dialog.exec() == QDialog.Accepted:
@@ -638,12 +732,7 @@ class MainWindow(QWidget):
 
 
     def export_dif_txt(self):
-        ## ERROR CHECK UPON UPDATE ##
-        self.ErrorList = FM.error_check()
-        ErrorString = ""
-        for error in self.ErrorList:
-            ErrorString += f"{error}\n"
-        self.ErrorMessageLabel.setText(ErrorString)
+        self.update_errors()
         if len(self.ErrorList) < 1:
             suggested_path = os.path.join("exported", f"{self.flavor_name}.txt")
             if not os.path.exists("exported"):
@@ -664,28 +753,17 @@ class MainWindow(QWidget):
             QApplication.beep()  # Plays default system alert sound
             QMessageBox.warning(self, "Warning", warning)
 
+    def preview_flavor(self):
+        import TimelinePreview
+        dialog = TimelinePreview.TimelinePreview(FM.flavor, self)
+        dialog.exec()
+        dialog.deleteLater() # it's parented to the window, it would otherwise stay around until the editor closes
+
     def update_flavor_name(self, new_name):
-        self.flavor_name = new_name
-        FM.flavor["name"] = self.flavor_name
-        self.setWindowTitle(f"WeatherSTAR XL Flavor Builder | Editing Flavor: {self.flavor_name}")
-        ## ERROR CHECK UPON UPDATE ##
-        self.ErrorList = FM.error_check()
-        ErrorString = ""
-        for error in self.ErrorList:
-            ErrorString += f"{error}\n"
-        self.ErrorMessageLabel.setText(ErrorString)
+        FM.set_name(new_name)
     
     def update_flavor_mods(self, modifiers):
-        if modifiers != "":
-            FM.flavor["modifiers"] = modifiers
-            ## ERROR CHECK UPON UPDATE ##
-            self.ErrorList = FM.error_check()
-            ErrorString = ""
-            for error in self.ErrorList:
-                ErrorString += f"{error}\n"
-            self.ErrorMessageLabel.setText(ErrorString)
-        else:
-            FM.flavor["modifiers"] = None
+        FM.set_modifiers(modifiers)
 
     def update_product_order(self):
         log.warning(f"To do")
@@ -696,13 +774,6 @@ class MainWindow(QWidget):
             log.debug(f"Product edits confirmed.")
         else:
             log.debug(f"Product edits aborted.")
-        self.get_products()
-        ## ERROR CHECK UPON UPDATE ##
-        self.ErrorList = FM.error_check()
-        ErrorString = ""
-        for error in self.ErrorList:
-            ErrorString += f"{error}\n"
-        self.ErrorMessageLabel.setText(ErrorString)
 
     def edit_sensor(self, index):
         dialog = SensorWindow(index)
@@ -710,13 +781,6 @@ class MainWindow(QWidget):
             log.debug(f"Sensor edits confirmed.")
         else:
             log.debug(f"Sensor edits aborted.")
-        self.get_sensors()
-        ## ERROR CHECK UPON UPDATE ##
-        self.ErrorList = FM.error_check()
-        ErrorString = ""
-        for error in self.ErrorList:
-            ErrorString += f"{error}\n"
-        self.ErrorMessageLabel.setText(ErrorString)
 
     def add_product(self):
         self.edit_product(None) # No index if non-existing product
@@ -731,7 +795,6 @@ class MainWindow(QWidget):
         delete_action = menu.addAction("Delete")
         delete_action.triggered.connect(lambda: FM.remove_sensor(index))
         menu.exec(button.mapToGlobal(pos))
-        self.get_sensors()
 
     def product_context_menu(self, button, pos, index):
         menu = QMenu()
@@ -740,116 +803,85 @@ class MainWindow(QWidget):
         delete_action = menu.addAction("Delete")
         delete_action.triggered.connect(lambda: FM.remove_product(index))
         menu.exec(button.mapToGlobal(pos))
-        self.get_products()
+
+    def thumbnails_changed(self, kind):
+        '''Re-paints the tiles when thumbnails change on disk.'''
+        if kind == "product":
+            self.product_model.thumbnails_changed()
+        else:
+            self.sensor_model.thumbnails_changed()
+
+    def strip_context_menu(self, kind, pos):
+        view = self.product_view if kind == "product" else self.sensor_view
+        index = view.indexAt(pos)
+        if not index.isValid():
+            return
+        if kind == "product":
+            self.product_context_menu(view.viewport(), pos, index.row())
+        else:
+            self.sensor_context_menu(view.viewport(), pos, index.row())
+
+    def strip_moved(self, source, target):
+        '''A tile was dragged to a new position, FM has already been renumbered.'''
+        log.debug(f"Moved tile {source} to position {target}")
 
     def get_products(self):
-        container_products = QFrame()
-        self.products_layout_root = QVBoxLayout(container_products)
-        self.products_layout_root.addWidget(self.product_duration_label)
-        self.products_layout = QHBoxLayout()
-        self.products_layout.setSpacing(10)
-        self.products_layout_root.addLayout(self.products_layout)
-        self.product_area.setWidget(container_products)
         products_list = FM.get_products()
-        i = 0
-        for product_dict in products_list:
-            prod_name = product_dict.get("name", None)
-            prod_dur = product_dict.get("duration", None)
-            if prod_name and prod_dur:
-                btn = QToolButton()
-                ico_path = os.path.join("product-data", prod_name, "thumb.jpg")
-                if os.path.exists(ico_path):
-                    log.debug(f"Found thumbnail for product '{prod_name}'")
-                    btn.setIcon(QIcon(ico_path))
-                    btn.setIconSize(QSize(100, 100))
-                btn.setFixedSize(110, 110)
-                #btn.setStyleSheet("border: none;")
-                btn.setText(prod_name)
-                btn.setToolButtonStyle(Qt.ToolButtonTextUnderIcon)
-                #btn.clicked.connect(lambda n=i: self.edit_product(n))
-                btn.setCheckable(False)
-                btn.clicked.connect(lambda *args, n=i: self.edit_product(n))
-                self.products_layout.addWidget(btn)
-                # 2/3/2026 right-click "move product" option
-                btn.setContextMenuPolicy(Qt.CustomContextMenu)
-                btn.customContextMenuRequested.connect(lambda pos, b=btn, i=i: self.product_context_menu(b, pos, i))
-
-
-                i += 1 # up the index AFTER adding product to list
-            else:
-                i += 1
+        for i in reversed(range(len(products_list))):
+            if not (products_list[i].get("name", None) and products_list[i].get("duration", None)):
                 log.warning(f"Invalid product found in JSON - deleting.")
                 FM.remove_product(i)
-                i -= 1
-        self.total_product_count, self.total_product_length = FM.get_total_products()
-        if self.clockBox.isChecked():
-            FM.update_clock_setting(True, self.total_product_length)
-        self.product_duration_label.setText(f"Products Length: {self.total_product_length} seconds")
-        self.lf_length_label.setText(f"Total Forecast Length: {self.total_product_length} seconds")
-
-        # ADD PRODUCT BUTTON AT THE END
-        addproductbtn = QToolButton()
-        addproductbtn.setIcon(QIcon("app/add.png"))
-        addproductbtn.setIconSize(QSize(100, 100))
-        addproductbtn.setFixedSize(110, 110)
-        addproductbtn.setText("Add Product")
-        addproductbtn.setToolButtonStyle(Qt.ToolButtonTextUnderIcon)
-        addproductbtn.clicked.connect(self.add_product)
-        self.products_layout.addWidget(addproductbtn)
+        self.product_model.sync(products_list)
 
     def get_sensors(self):
-        container_sensors = QFrame()
-        self.sensors_layout_root = QVBoxLayout(container_sensors)
-        self.sensors_layout_root.addWidget(self.sensor_duration_label)
-        self.sensors_layout = QHBoxLayout()
-        self.sensors_layout.setSpacing(10)
-        self.sensors_layout_root.addLayout(self.sensors_layout)
-        self.sensor_area.setWidget(container_sensors)
         sensors_list = FM.get_sensors()
-        i = 0
-        for sensors_dict in sensors_list:
-            sens_name = sensors_dict.get("name", None)
-            sens_dur = sensors_dict.get("duration", None)
-            if sens_name and sens_dur:
-                btn = QToolButton()
-                ico_path = os.path.join("sensor-data", sens_name, "thumb.png")
-                if os.path.exists(ico_path):
-                    log.debug(f"Found thumbnail for sensor '{sens_name}'")
-                    btn.setIcon(QIcon(ico_path))
-                    btn.setIconSize(QSize(100, 50))
-                btn.setFixedSize(110, 50)
-                btn.setText(sens_name)
-                btn.setToolButtonStyle(Qt.ToolButtonTextUnderIcon)
-                btn.setCheckable(False)
-                btn.clicked.connect(lambda *args, n=i: self.edit_sensor(n))
-                # 2/3/2026 right-click "move product" option
-                btn.setContextMenuPolicy(Qt.CustomContextMenu)
-                btn.customContextMenuRequested.connect(lambda pos, b=btn, i=i: self.sensor_context_menu(b, pos, i))
-
-                self.sensors_layout.addWidget(btn)
-                i += 1
-            else:
-                i += 1
+        for i in reversed(range(len(sensors_list))):
+            if not (sensors_list[i].get("name", None) and sensors_list[i].get("duration", None)):
                 log.warning(f"Invalid sensor found in JSON - deleting.")
-                FM.remove_product(i)
-                i -= 1
-        self.total_sensor_count, self.total_sensor_length = FM.get_total_sensors()
-        self.sensor_duration_label.setText(f"Sensors Length: {self.total_sensor_length} seconds")
-
-        btn = QToolButton()
-        btn.setIcon(QIcon("app/add_sens.png"))
-        btn.setIconSize(QSize(100, 50))
-        btn.setFixedSize(110, 50)
-        btn.setText("Add Sensor")
-        btn.setToolButtonStyle(Qt.ToolButtonTextUnderIcon)
-        btn.clicked.connect(self.add_sensor)
-        self.sensors_layout.addWidget(btn)
+                FM.remove_sensor(i)
+        self.sensor_model.sync(sensors_list)
+
+def start_tracing(slow_ms:float, stall_ms:float):
+    '''Wraps the editor's handlers (and the slow paths under them) in timing spans. Returns the tracer and its stall watchdog.'''
+    import FlavorTrace
+    import FlavorExtractor as FE
+    import DIFDecode
+    tracer = FlavorTrace.Tracer(slow_ms=slow_ms)
+    for owner in (MainWindow, FoundFlavorsWindow, RenumberWindow, ProductWindow, SensorWindow):
+        tracer.instrument(owner)
+    tracer.instrument(FEV.FlavorEvents, ["flush"])
+    tracer.instrument(LayerStrip.LayerModel, ["sync"])
+    tracer.instrument(FM, ["load_flavor", "set_flavor", "error_check", "update_product", "update_sensor", "remove_product", "remove_sensor",
+                           "renumber", "get_total_products", "build_dif_txt", "export_dif_txt"])
+    tracer.instrument(FE, ["extract_flavors_from_file", "extract_flavors"])
+    tracer.instrument(DIFDecode, ["parse"])
+    return tracer, FlavorTrace.StallWatchdog(tracer, stall_ms=stall_ms)
+
+def main():
+    coloredlogs.install("INFO")
+    parser = argparse.ArgumentParser(description="WeatherSTAR XL Flavor Builder")
+    parser.add_argument("--trace", metavar="FILE", help="Time the editor's handlers, log UI stalls, and write a Chrome trace to FILE on exit")
+    parser.add_argument("--slow-ms", type=float, default=100, help="With --trace, log handlers that block the UI for longer than this")
+    parser.add_argument("--stall-ms", type=float, default=250, help="With --trace, log a stack sample when the UI is stuck for longer than this")
+    args, qt_args = parser.parse_known_args()
+    for folder in ("flavor-data", "product-data", "sensor-data"):
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+    tracer, watchdog = start_tracing(args.slow_ms, args.stall_ms) if args.trace else (None, None)
+    app = QApplication(sys.argv[:1] + qt_args)
+    if watchdog != None:
+        watchdog.start(app)
+    window = MainWindow()
+    window.show()
+    log.debug(f"Window shown {(time.perf_counter() - STARTED) * 1000:.0f} ms after startup")
+    result = app.exec()
+    if tracer != None:
+        watchdog.stop()
+        log.info(f"Wrote {tracer.export(args.trace)} trace event(s) to '{args.trace}' ({watchdog.stalls} UI stall(s))")
+    return result
 
 # Main execution
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    window = MainWindow()
-    window.show()
-    app.exec()
+    sys.exit(main())
 
 # Cable Contributes to Life
\ No newline at end of file
@@ -0,0 +1,185 @@
+## Bulk edits across every flavor extracted from a DIF: replace, retime or remove a product/sensor everywhere it's used in one
+## pass, recomputing the product/sensor totals and the clock duration of each flavor that changed. The edited flavors can then
+## be exported together as one DIF TXT.
+## Usage: python FlavorBulkEdit.py <dif .dat/.txt> [--replace OLD NEW] [--retime NAME SECONDS] [--remove NAME] [--sensors]
+##        [--preview] [--out bulk.txt] [--json-out folder]
+import os, sys, copy, argparse, logging, coloredlogs
+import FlavorManagement as FM
+log = logging.getLogger(__name__)
+
+ACTIONS = ("replace", "retime", "remove")
+LAYERS = ("products", "sensors")
+
+def make_edit(action:str, name:str, layer:str="products", new_name:str | None=None, duration=None):
+    '''Returns one bulk edit as a dict, or an error string if it doesn't make sense.
+    replace: every item called name becomes new_name (and gets duration, if given). retime: every item called name gets
+    duration. remove: every item called name is removed.'''
+    if action not in ACTIONS:
+        return f"Unknown bulk edit action '{action}'."
+    if layer not in LAYERS:
+        return f"Bulk edits only work on {' or '.join(LAYERS)}, not '{layer}'."
+    if not name:
+        return "A bulk edit needs the name of the product/sensor to look for."
+    if action == "replace" and not new_name:
+        return f"Replacing '{name}' needs a new name."
+    if action == "retime" and duration == None:
+        return f"Retiming '{name}' needs a duration."
+    if duration != None:
+        duration = FM.float_or_int(str(duration))
+        if duration == None or duration <= 0:
+            return "Durations must be a positive whole number or decimal."
+    return {"action": action, "layer": layer, "name": name, "new_name": new_name, "duration": duration}
+
+def edit_order(order:list, edit:dict):
+    '''Applies one edit to a layer order list in place. Returns the list of change descriptions (empty if nothing matched).'''
+    changes = []
+    kind = edit["layer"][:-1]
+    for i in reversed(range(len(order))): # back to front so removals don't shift the indices still to come
+        item = order[i]
+        if item.get("name") != edit["name"]:
+            continue
+        if edit["action"] == "remove":
+            order.pop(i)
+            changes.insert(0, f"removed {kind} '{edit['name']}' ({i})")
+            continue
+        item_changes = []
+        if edit["action"] == "replace":
+            item["name"] = edit["new_name"]
+            item_changes.append(f"{kind} '{edit['name']}' ({i}) -> '{edit['new_name']}'")
+        if edit["duration"] != None and FM.float_or_int(str(item.get("duration"))) != edit["duration"]:
+            item_changes.append(f"{kind} '{item['name']}' ({i}) duration {item.get('duration')} -> {edit['duration']}")
+            item["duration"] = edit["duration"]
+        changes[0:0] = item_changes
+    return changes
+
+def clock_item(target:dict):
+    '''Returns the clock entry of a flavor's misc order, or None if it has no clock.'''
+    for item in (target.get("misc") or {}).get("order") or []:
+        if item.get("name") == "clock":
+            return item
+    return None
+
+def clock_duration(target:dict):
+    clock = clock_item(target)
+    return FM.float_or_int(str(clock.get("duration"))) if clock != None else None
+
+def apply_edits(flavors:dict, edits:list, preview:bool=False):
+    '''Runs every edit over every flavor in one pass. flavors is the dict from FlavorExtractor.extract_flavors_from_file.
+    preview: Leave flavors alone and work on copies of the affected ones.
+    Returns (edited, report): edited maps flavor name -> edited flavor for every flavor that changed, report is a list of
+    {"name", "changes", "product_length", "sensor_length", "clock", "errors"} with (before, after) pairs, sorted by name.'''
+    edited = {}
+    report = []
+    names_by_layer = {layer: set(edit["name"] for edit in edits if edit["layer"] == layer) for layer in LAYERS}
+    for flavor_name in sorted(flavors):
+        target = flavors[flavor_name]
+        # Skip flavors that don't use any of the names before copying anything
+        if not any(item.get("name") in names_by_layer[layer] for layer in LAYERS for item in (target.get(layer) or {}).get("order") or []):
+            continue
+        if preview:
+            target = copy.deepcopy(target)
+        before_products = FM.get_total_products(target)[1]
+        before_sensors = FM.get_total_sensors(target)[1]
+        before_clock = clock_duration(target)
+        changes = []
+        for edit in edits:
+            order = target.get(edit["layer"], {}).get("order")
+            if order:
+                changes += edit_order(order, edit)
+        if not changes:
+            continue
+        _, after_products = FM.get_total_products(target)
+        _, after_sensors = FM.get_total_sensors(target)
+        if before_clock != None:
+            clock_item(target)["duration"] = after_products # the clock runs for as long as the products do
+        edited[flavor_name] = target
+        report.append({
+            "name": flavor_name,
+            "changes": changes,
+            "product_length": (before_products, after_products),
+            "sensor_length": (before_sensors, after_sensors),
+            "clock": (before_clock, clock_duration(target)),
+            "errors": FM.error_check(target),
+        })
+    log.info(f"Bulk edit {'would change' if preview else 'changed'} {len(edited)} of {len(flavors)} flavor(s)")
+    return edited, report
+
+def format_report(report:list):
+    '''Returns the report from apply_edits as readable text, one block per affected flavor.'''
+    lines = []
+    for entry in report:
+        lines.append(f"Flavor '{entry['name']}':")
+        lines += [f"    {change}" for change in entry["changes"]]
+        before, after = entry["product_length"]
+        if before != after:
+            lines.append(f"    products length {before} -> {after} seconds")
+        before, after = entry["sensor_length"]
+        if before != after:
+            lines.append(f"    sensors length {before} -> {after} seconds")
+        before, after = entry["clock"]
+        if before != after:
+            lines.append(f"    clock {before} -> {after} seconds")
+        lines += [f"    ! {error}" for error in entry["errors"]]
+    if not lines:
+        lines.append("No flavors use the products/sensors being edited.")
+    return "\n".join(lines)
+
+def export_flavors(flavors:dict, file_path:str | None=None, json_folder:str | None=None):
+    '''Writes every flavor that passes the error check into one DIF TXT (and/or one JSON each into json_folder).
+    Returns the names of the flavors that were skipped because of configuration errors.'''
+    skipped = []
+    dif = ''
+    for flavor_name in sorted(flavors):
+        target = flavors[flavor_name]
+        errors = FM.error_check(target)
+        if len(errors) > 0:
+            log.error(f"Flavor '{flavor_name}' has configuration errors and won't be exported:\n" + "\n".join(f"! {err}" for err in errors))
+            skipped.append(flavor_name)
+            continue
+        dif += FM.build_dif_txt(target)
+        if json_folder != None:
+            if not os.path.exists(json_folder):
+                os.makedirs(json_folder)
+            FM.save_flavor(os.path.join(json_folder, f"{flavor_name}.json"), target)
+    if file_path != None:
+        with open(file_path, "w") as out_f:
+            out_f.write(dif)
+        log.info(f"Wrote {len(flavors) - len(skipped)} edited flavor(s) to '{file_path}'!\nYou can import this to your XL by uploading the file via FTP, and then running the following command:\n/twc/bin/db_imp -d -r -s dif /twc/dif/wxl_dif /path/to/file.txt")
+    return skipped
+
+def main(argv=None):
+    coloredlogs.install("INFO")
+    parser = argparse.ArgumentParser(description="Replace, retime or remove a product/sensor across every flavor in a DIF.")
+    parser.add_argument("dif", help="DIF to extract the flavors from (wxl_dif.dat or a TXT dump)")
+    parser.add_argument("--replace", nargs=2, action="append", default=[], metavar=("OLD", "NEW"), help="Swap OLD for NEW everywhere")
+    parser.add_argument("--retime", nargs=2, action="append", default=[], metavar=("NAME", "SECONDS"), help="Set the duration of NAME everywhere")
+    parser.add_argument("--remove", action="append", default=[], metavar="NAME", help="Remove NAME everywhere")
+    parser.add_argument("--duration", default=None, help="Also give replaced items this duration")
+    parser.add_argument("--sensors", action="store_true", help="Edit sensors instead of products")
+    parser.add_argument("--preview", action="store_true", help="Only show which flavors would change")
+    parser.add_argument("--out", default=None, help="Write the edited flavors into this DIF TXT")
+    parser.add_argument("--json-out", default=None, help="Also save each edited flavor as JSON into this folder")
+    args = parser.parse_args(argv)
+
+    layer = "sensors" if args.sensors else "products"
+    edits = [make_edit("replace", old, layer, new_name=new, duration=args.duration) for old, new in args.replace]
+    edits += [make_edit("retime", name, layer, duration=seconds) for name, seconds in args.retime]
+    edits += [make_edit("remove", name, layer) for name in args.remove]
+    if not edits:
+        parser.error("Nothing to do, give at least one --replace, --retime or --remove.")
+    for edit in edits:
+        if isinstance(edit, str):
+            log.error(edit)
+            return 1
+
+    import FlavorExtractor as FE
+    flavors = FE.extract_flavors_from_file(args.dif)
+    edited, report = apply_edits(flavors, edits, preview=args.preview or (args.out == None and args.json_out == None))
+    sys.stdout.write(format_report(report) + "\n")
+    if args.preview or not edited or (args.out == None and args.json_out == None):
+        return 0
+    skipped = export_flavors(edited, args.out, args.json_out)
+    return 1 if skipped else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
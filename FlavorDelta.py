@@ -0,0 +1,98 @@
+## Delta DIF export: compares an edited flavor against a unit's current database (wxl_dif.dat or a TXT dump) and only emits
+## the keys whose values changed, plus removals for index keys the flavor no longer uses (i.e. product_08 - product_11 after
+## shrinking a flavor from 12 products to 8).
+## Usage: python FlavorDelta.py <unit dif .dat/.txt> <flavor.json> [more flavor JSONs...] --out delta.txt
+import sys, json, argparse, logging, coloredlogs
+import DIFDecode
+import DIFKeys
+import FlavorManagement as FM
+log = logging.getLogger(__name__)
+
+# Orphaned keys are re-imported blank with an expiry of 1 (1970). Expiring records are what DIFDecode already ignores, and
+# the XL drops a record once its expiry time has passed, so this removes the key without needing a separate delete command.
+REMOVED_EXP_TS = 1
+
+def delta_entries(database:dict, target:dict):
+    '''Compares target against a database dict from DIFDecode.parse.
+    Returns (changed, orphaned): changed is a list of (key, data) to import, orphaned is a list of keys to remove.'''
+    flavor_name = target.get("name")
+    entries = FM.dif_entries(target)
+    wanted = []
+    for section in FM.DIF_SECTIONS:
+        wanted += entries[section]
+    for item_type in FM.LAYER_TYPES:
+        wanted.append((DIFKeys.encode(flavor_name, item_type, DIFKeys.VERSION), FM.layer_version(entries[item_type])))
+
+    changed = []
+    wanted_keys = set()
+    for key, data in wanted:
+        wanted_keys.add(key)
+        if database.get(key) != str(data):
+            changed.append((key, data))
+
+    orphaned = []
+    for key in database:
+        if key in wanted_keys:
+            continue
+        decoded = DIFKeys.decode(key)
+        if decoded == None or decoded[0] != flavor_name:
+            continue
+        if decoded[2] in (DIFKeys.ITEM, DIFKeys.ITEM_DURATION, DIFKeys.INIT): # the init key goes away if the flavor is no longer initialized
+            orphaned.append(key)
+    orphaned.sort()
+    return changed, orphaned
+
+def build_delta_txt(database:dict, target:dict, removals:bool=True):
+    '''Builds the delta DIF TXT for one flavor. Returns (dif, changed count, orphaned count).'''
+    changed, orphaned = delta_entries(database, target)
+    dif = ''
+    for key, data in changed:
+        dif += FM.dif_string(key, data)
+    if removals:
+        for key in orphaned:
+            dif += FM.dif_string(key, "", exp_ts=REMOVED_EXP_TS)
+    elif orphaned:
+        log.warning(f"Flavor '{target.get('name')}' leaves {len(orphaned)} orphaned key(s) behind: {', '.join(orphaned)}")
+    return dif, len(changed), len(orphaned)
+
+def export_delta_txt(database_path:str, flavor_paths:list, file_path:str, removals:bool=True):
+    '''Writes one delta DIF TXT covering every flavor JSON in flavor_paths. Returns False if nothing could be exported.'''
+    database = DIFDecode.parse(database_path)
+    if not database:
+        log.error(f"No database keys were found in '{database_path}', refusing to build a delta against nothing.")
+        return False
+    dif = ''
+    for flavor_path in flavor_paths:
+        try:
+            with open(flavor_path, "r") as flavor_file:
+                target = json.load(flavor_file)
+        except Exception as e:
+            log.error(f"Could not load flavor JSON '{flavor_path}':\n{e}", exc_info=False)
+            return False
+        errors = FM.error_check(target)
+        if len(errors) > 0:
+            log.error(f"Flavor '{target.get('name')}' has configuration errors and can't be exported:\n" + "\n".join(f"! {err}" for err in errors))
+            return False
+        flavor_dif, changed, orphaned = build_delta_txt(database, target, removals=removals)
+        log.info(f"Flavor '{target.get('name')}': {changed} changed key(s), {orphaned} orphaned key(s)")
+        dif += flavor_dif
+    with open(file_path, "w") as out_f:
+        out_f.write(dif)
+    if dif == '':
+        log.info(f"Nothing changed - wrote an empty delta to '{file_path}'")
+    else:
+        log.info(f"Wrote delta DIF to '{file_path}'!\nYou can import this to your XL by uploading the file via FTP, and then running the following command:\n/twc/bin/db_imp -d -r -s dif /twc/dif/wxl_dif /path/to/file.txt")
+    return True
+
+def main(argv=None):
+    coloredlogs.install("INFO")
+    parser = argparse.ArgumentParser(description="Export only the DIF keys that differ from a unit's current database.")
+    parser.add_argument("database", help="The unit's current database (wxl_dif.dat or a TXT dump)")
+    parser.add_argument("flavors", nargs="+", help="Edited flavor JSON file(s)")
+    parser.add_argument("--out", required=True, help="Path of the delta DIF TXT to write")
+    parser.add_argument("--no-removals", action="store_true", help="Don't emit removals for orphaned keys, just warn about them")
+    args = parser.parse_args(argv)
+    return 0 if export_delta_txt(args.database, args.flavors, args.out, removals=not args.no_removals) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
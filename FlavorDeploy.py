@@ -0,0 +1,154 @@
+## Uploads exported DIF TXTs to many XL units at once over FTP.
+## Every unit gets its own worker (up to --workers at a time) and a single FTP session that all of its files go through. Failed
+## uploads are retried with exponential backoff, reconnecting if the session dropped. Permanent errors (bad login, permission
+## denied) fail the unit straight away. Files are uploaded under a temporary name and renamed over the real one when complete, so a
+## half-uploaded file never sits under the real name.
+## Usage: python FlavorDeploy.py --hosts hosts.json exported/K.txt [more files...]
+## hosts.json: [{"host": "10.0.0.5", "port": 21, "user": "...", "password": "...", "remote_dir": "/twc/dif"}, ...]
+import os, sys, json, time, ftplib, argparse, threading, logging, coloredlogs
+from concurrent.futures import ThreadPoolExecutor, as_completed
+log = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 8
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 2.0 # seconds before the first retry, doubled after each one
+DEFAULT_TIMEOUT = 30
+TRANSIENT_ERRORS = (ftplib.error_temp, OSError, EOFError) # 4xx replies and dropped connections; 5xx (error_perm) won't go away by retrying
+PARTIAL_SUFFIX = ".part"
+IMPORT_COMMAND = "/twc/bin/db_imp -d -r -s dif /twc/dif/wxl_dif {path}"
+
+def load_hosts(path:str):
+    '''Reads the hosts file. Returns a list of host dicts, or an error string.'''
+    try:
+        with open(path, "r") as hosts_file:
+            hosts = json.load(hosts_file)
+    except Exception as e:
+        return f"Could not load hosts file '{path}':\n{e}"
+    if not isinstance(hosts, list) or not all(isinstance(host, dict) and host.get("host") for host in hosts):
+        return f"Hosts file '{path}' must be a list of objects with at least a \"host\"."
+    return hosts
+
+class HostSession:
+    '''One FTP session to one unit, reconnected on demand. Every file for the unit goes through the same connection.'''
+    def __init__(self, host:dict, timeout:float=DEFAULT_TIMEOUT):
+        self.host = host
+        self.timeout = timeout
+        self.ftp = None
+
+    def connect(self):
+        self.close()
+        ftp = ftplib.FTP(timeout=self.timeout)
+        ftp.connect(self.host["host"], int(self.host.get("port", 21)))
+        ftp.login(self.host.get("user", "anonymous"), self.host.get("password", ""))
+        if self.host.get("remote_dir"):
+            ftp.cwd(self.host["remote_dir"])
+        self.ftp = ftp
+
+    def upload(self, file_path:str):
+        '''Uploads one file under a temporary name and renames it into place. Returns the remote path.'''
+        if self.ftp == None:
+            self.connect()
+        name = os.path.basename(file_path)
+        with open(file_path, "rb") as upload_file:
+            self.ftp.storbinary(f"STOR {name}{PARTIAL_SUFFIX}", upload_file)
+        try:
+            self.ftp.rename(f"{name}{PARTIAL_SUFFIX}", name)
+        except ftplib.error_perm:
+            # Some servers won't rename over an existing file. Only then is the old file deleted first, which leaves the unit
+            # without it until the rename
+            self.ftp.delete(name)
+            self.ftp.rename(f"{name}{PARTIAL_SUFFIX}", name)
+        return f"{self.host.get('remote_dir', '').rstrip('/')}/{name}" if self.host.get("remote_dir") else name
+
+    def close(self):
+        if self.ftp == None:
+            return
+        try:
+            self.ftp.quit()
+        except Exception:
+            self.ftp.close()
+        self.ftp = None
+
+def deploy_host(host:dict, files:list, retries:int=DEFAULT_RETRIES, backoff:float=DEFAULT_BACKOFF, progress=None,
+                timeout:float=DEFAULT_TIMEOUT):
+    '''Uploads every file to one host. progress(host name, message) is called as it goes.
+    Returns {"host", "ok", "uploaded": [remote paths], "attempts", "error", "seconds"}.'''
+    name = host["host"] if not host.get("port") else f"{host['host']}:{host['port']}"
+    report = lambda message: progress(name, message) if progress != None else None
+    started = time.perf_counter()
+    result = {"host": name, "ok": False, "uploaded": [], "attempts": 0, "error": None, "seconds": 0}
+    session = HostSession(host, timeout)
+    try:
+        for n, file_path in enumerate(files):
+            for attempt in range(retries + 1):
+                result["attempts"] += 1
+                try:
+                    remote_path = session.upload(file_path)
+                    result["uploaded"].append(remote_path)
+                    report(f"uploaded {os.path.basename(file_path)} ({n + 1}/{len(files)})")
+                    break
+                except TRANSIENT_ERRORS as e:
+                    session.close() # start over with a fresh connection
+                    if attempt == retries:
+                        raise
+                    delay = backoff * (2 ** attempt)
+                    report(f"{os.path.basename(file_path)} failed ({e}), retrying in {delay:g}s")
+                    time.sleep(delay)
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = str(e)
+        report(f"FAILED: {e}")
+    finally:
+        session.close()
+        result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+def deploy(files:list, hosts:list, workers:int=DEFAULT_WORKERS, retries:int=DEFAULT_RETRIES, backoff:float=DEFAULT_BACKOFF,
+           progress=None, timeout:float=DEFAULT_TIMEOUT):
+    '''Uploads files to every host concurrently (at most workers hosts at a time). Returns the per-host results in hosts order.'''
+    missing = [file_path for file_path in files if not os.path.isfile(file_path)]
+    if missing:
+        raise FileNotFoundError(f"Nothing to deploy, missing file(s): {', '.join(missing)}")
+    lock = threading.Lock()
+    def host_progress(name, message):
+        if progress != None:
+            with lock: # progress callbacks never run at the same time, so the caller doesn't need to be thread safe
+                progress(name, message)
+
+    results = [None] * len(hosts)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(hosts)))) as pool:
+        futures = {pool.submit(deploy_host, host, files, retries, backoff, host_progress, timeout): i for i, host in enumerate(hosts)}
+        for finished, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            log.debug(f"{finished}/{len(hosts)} unit(s) finished")
+    return results
+
+def main(argv=None):
+    coloredlogs.install("INFO")
+    parser = argparse.ArgumentParser(description="Upload exported DIF TXTs to many XL units concurrently over FTP.")
+    parser.add_argument("files", nargs="+", help="DIF TXT file(s) to upload")
+    parser.add_argument("--hosts", required=True, help="JSON file listing the units (see the top of FlavorDeploy.py)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help=f"Units to upload to at once (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help=f"Retries per file (default: {DEFAULT_RETRIES})")
+    parser.add_argument("--backoff", type=float, default=DEFAULT_BACKOFF, help=f"Seconds before the first retry (default: {DEFAULT_BACKOFF})")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help=f"FTP timeout in seconds (default: {DEFAULT_TIMEOUT})")
+    args = parser.parse_args(argv)
+    hosts = load_hosts(args.hosts)
+    if isinstance(hosts, str):
+        log.error(hosts)
+        return 1
+    log.info(f"Deploying {len(args.files)} file(s) to {len(hosts)} unit(s)...")
+    started = time.perf_counter()
+    results = deploy(args.files, hosts, args.workers, args.retries, args.backoff,
+                     progress=lambda name, message: log.info(f"[{name}] {message}"), timeout=args.timeout)
+    failed = [result for result in results if not result["ok"]]
+    log.info(f"Deployed to {len(results) - len(failed)}/{len(results)} unit(s) in {time.perf_counter() - started:.1f}s")
+    for result in failed:
+        log.error(f"[{result['host']}] {result['error']}")
+    deployed = [result for result in results if result["ok"]]
+    if deployed:
+        log.info("To load the files, run the following on each unit:\n" + "\n".join(IMPORT_COMMAND.format(path=path) for path in deployed[0]["uploaded"]))
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
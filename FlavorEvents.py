@@ -0,0 +1,94 @@
+## Observable view of FM.flavor for the editor.
+## Every FM edit (see FM.edit_listeners) is turned into typed change events, and widgets subscribe to just the events they
+## depend on. Events are collected and handed out once per event loop tick, so a burst of edits (i.e. a dialog adding a product
+## and fixing the clock) only updates each widget once.
+import logging
+from PySide6.QtCore import QObject, QTimer
+import FlavorManagement as FM
+log = logging.getLogger(__name__)
+
+# Change events
+NAME = "name"
+MODIFIERS = "modifiers"
+INIT = "init"
+CLOCK = "clock"
+PRODUCT_CHANGED = "product_changed" # added, removed or edited, so counts and lengths may have changed
+PRODUCT_MOVED = "product_moved" # same products in a different order
+SENSOR_CHANGED = "sensor_changed"
+SENSOR_MOVED = "sensor_moved"
+REPLACED = "replaced" # a whole new flavor was loaded, widgets that mirror the flavor settings need to be filled in again
+ALL_EVENTS = frozenset((NAME, MODIFIERS, INIT, CLOCK, PRODUCT_CHANGED, PRODUCT_MOVED, SENSOR_CHANGED, SENSOR_MOVED, REPLACED))
+
+MAX_PASSES = 10 # subscribers that keep editing the flavor in response to each other are cut off after this many rounds
+
+def events_for(op:str, args:dict):
+    '''Returns the change events for one FM edit op.'''
+    if op == "name":
+        return {NAME}
+    if op == "modifiers":
+        return {MODIFIERS}
+    if op == "init":
+        return {INIT}
+    if op == "clock":
+        return {CLOCK}
+    if op in ("update_product", "remove_product"):
+        return {PRODUCT_CHANGED}
+    if op in ("update_sensor", "remove_sensor"):
+        return {SENSOR_CHANGED}
+    if op == "renumber":
+        return {SENSOR_MOVED} if args.get("prod_type") == "sensors" else {PRODUCT_MOVED}
+    return set(ALL_EVENTS) # "replace", or anything new we don't know the scope of
+
+class FlavorEvents(QObject):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.subscribers = [] # (events, callback), called in the order they subscribed
+        self.pending = set()
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(0) # fires on the next event loop tick
+        self.timer.timeout.connect(self.flush)
+        FM.edit_listeners.append(self.record)
+
+    def subscribe(self, events, callback):
+        '''Calls callback(events) with the set of events it asked for that happened since the last tick.'''
+        self.subscribers.append((frozenset(events), callback))
+
+    def record(self, op:str, args:dict):
+        self.pending |= events_for(op, args)
+        self.timer.start()
+
+    def refresh(self):
+        '''Updates every subscriber right away, i.e. after FM.flavor was replaced without an edit being recorded.'''
+        self.pending |= ALL_EVENTS
+        self.flush()
+
+    def flush(self):
+        self.timer.stop()
+        handled = [set() for _ in self.subscribers] # events each subscriber has already been told about in this flush
+        batch = set()
+        for _ in range(MAX_PASSES):
+            if not self.pending:
+                return
+            # A subscriber can edit the flavor too (i.e. the clock following the product length). Those events are folded into
+            # this flush, so later subscribers see everything at once and earlier ones get another pass.
+            for i, (events, callback) in enumerate(self.subscribers):
+                if self.pending:
+                    batch |= self.pending
+                    for seen in handled:
+                        seen -= self.pending
+                    self.pending.clear()
+                hits = (events & batch) - handled[i]
+                if hits:
+                    handled[i] |= hits
+                    try:
+                        callback(hits)
+                    except Exception as e:
+                        log.error(f"Flavor event subscriber failed for {sorted(hits)}:\n{e}", exc_info=False)
+        log.warning(f"Flavor events are still changing after {MAX_PASSES} passes: {sorted(self.pending)}")
+        self.pending.clear()
+
+    def close(self):
+        self.timer.stop()
+        if self.record in FM.edit_listeners:
+            FM.edit_listeners.remove(self.record)
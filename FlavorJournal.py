@@ -0,0 +1,174 @@
+## Crash-safe autosave for the active flavor.
+## Every edit FM reports through notify_edit is appended to a journal as one compact JSON line (a single buffered write + flush,
+## no fsync), and the full flavor JSON is only rewritten when the journal is compacted. On startup the last snapshot is loaded
+## and the journal is replayed on top of it, so at most the edit being written at the moment of a crash can be lost.
+## Every snapshot has a generation number and the journal starts with the generation it applies on top of, so a journal whose
+## edits are already in the snapshot (a crash between writing the snapshot and truncating the journal) isn't replayed again.
+import os, json, logging
+import FlavorManagement as FM
+log = logging.getLogger(__name__)
+
+AUTOSAVE_FOLDER = "autosave"
+MAX_JOURNAL_ENTRIES = 500 # compact right away once the journal gets this long, even if the debounce timer keeps getting pushed back
+GENERATION_OP = "generation" # the journal's first line, ["generation", <snapshot generation>]; 0 means there is no snapshot
+
+def _replay_op(op:str, args:dict):
+    '''Applies one journaled edit to FM.flavor using the same FM functions that produced it.'''
+    if op == "update_product":
+        FM.update_product(args["index"], args["name"], args["duration"])
+    elif op == "remove_product":
+        FM.remove_product(args["index"])
+    elif op == "update_sensor":
+        FM.update_sensor(args["index"], args["name"], args["duration"])
+    elif op == "remove_sensor":
+        FM.remove_sensor(args["index"])
+    elif op == "renumber":
+        FM.renumber(args["index"], args["new_index"], args["prod_type"])
+    elif op == "clock":
+        FM.update_clock_setting(args["on"], args["duration"])
+    elif op == "name":
+        FM.set_name(args["name"])
+    elif op == "init":
+        FM.set_init(args["on"])
+    elif op == "modifiers":
+        FM.set_modifiers(args["modifiers"])
+    else:
+        log.warning(f"Unknown journal operation '{op}' - ignored")
+
+class FlavorJournal:
+    def __init__(self, folder:str=AUTOSAVE_FOLDER, on_record=None):
+        '''folder: Where the snapshot and journal are kept.
+        on_record: Optional callable run after every journaled edit. The GUI uses it to (re)start its debounced compaction timer.'''
+        self.folder = folder
+        self.snapshot_path = os.path.join(folder, "session.json")
+        self.journal_path = os.path.join(folder, "session.journal")
+        self.on_record = on_record
+        self.entries = 0
+        self.generation = 0 # of the last snapshot written or recovered
+        self.replaying = False
+        self.journal_file = None
+
+    def has_session(self):
+        '''True if a previous session left a snapshot or journaled edits behind (i.e. the app didn't close cleanly).'''
+        if os.path.exists(self.snapshot_path):
+            return True
+        if not os.path.exists(self.journal_path):
+            return False
+        with open(self.journal_path, "r") as journal_file:
+            return any(line.strip() and not line.startswith(f'["{GENERATION_OP}"') for line in journal_file)
+
+    def read_snapshot(self):
+        '''Returns (generation, flavor) from the snapshot, (0, {}) if there's none, or (None, {}) if it's unreadable.'''
+        if not os.path.exists(self.snapshot_path):
+            return 0, {}
+        try:
+            with open(self.snapshot_path, "r") as snapshot_file:
+                snapshot = json.load(snapshot_file)
+            return snapshot["generation"], snapshot["flavor"]
+        except Exception as e:
+            log.error(f"Autosave snapshot is unreadable, replaying journal onto a blank flavor:\n{e}", exc_info=False)
+            return None, {}
+
+    def recover(self):
+        '''Loads the last snapshot into FM.flavor and replays the journal on top of it. Returns the number of edits replayed, or None if there was nothing to recover.'''
+        if not self.has_session():
+            return None
+        generation, recovered = self.read_snapshot()
+        self.generation = generation or 0
+        FM.flavor = recovered
+        replayed = 0
+        self.replaying = True
+        listeners = FM.edit_listeners[:]
+        FM.edit_listeners.clear() # nobody else needs to hear about edits that already happened
+        try:
+            if os.path.exists(self.journal_path):
+                with open(self.journal_path, "r") as journal_file:
+                    for line in journal_file:
+                        try:
+                            op, args = json.loads(line)
+                        except ValueError:
+                            log.debug("Skipping torn journal entry") # the last line can be half written if we died mid-write
+                            continue
+                        if op == GENERATION_OP:
+                            if generation != None and args != generation:
+                                log.info("Autosave journal is already part of the snapshot, not replaying it")
+                                break
+                            continue
+                        _replay_op(op, args)
+                        replayed += 1
+        finally:
+            FM.edit_listeners.extend(listeners)
+            self.replaying = False
+        log.info(f"Recovered autosaved flavor '{FM.flavor.get('name')}' ({replayed} journaled edit(s) replayed)")
+        return replayed
+
+    def start(self, snapshot:bool=True):
+        '''Starts journaling edits to FM.flavor. snapshot: Make the current flavor the new snapshot (i.e. a recovered flavor).
+        Otherwise the previous session is discarded and nothing is left to recover until the first edit.'''
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder)
+        self.generation = max(self.generation, self.read_snapshot()[0] or 0) # never reuse the generation of a snapshot on disk
+        if snapshot:
+            self.compact()
+        else:
+            self.open_journal(0)
+            if os.path.exists(self.snapshot_path):
+                os.remove(self.snapshot_path) # after the journal, which no longer applies to it
+        if self.record not in FM.edit_listeners:
+            FM.edit_listeners.append(self.record)
+
+    def record(self, op:str, args:dict):
+        '''FM edit listener. Appends one compact record to the journal.'''
+        if self.replaying or self.journal_file == None:
+            return
+        if op == "replace":
+            self.compact() # a whole new flavor was loaded, there's nothing to replay on top of the old snapshot
+            return
+        self.journal_file.write(json.dumps([op, args], separators=(",", ":")) + "\n")
+        self.journal_file.flush() # hands the record to the OS so it survives the app dying; fsync is left to compaction
+        self.entries += 1
+        if self.entries >= MAX_JOURNAL_ENTRIES:
+            self.compact()
+        elif self.on_record:
+            self.on_record()
+
+    def compact(self):
+        '''Writes the full flavor snapshot atomically under a new generation and starts a new journal on top of it.'''
+        generation = self.generation + 1
+        tmp_path = self.snapshot_path + ".tmp"
+        try:
+            with open(tmp_path, "w") as snapshot_file:
+                json.dump({"generation": generation, "flavor": FM.flavor}, snapshot_file, separators=(",", ":"))
+                snapshot_file.flush()
+                os.fsync(snapshot_file.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+        except Exception as e:
+            log.error(f"Could not write autosave snapshot, keeping the journal:\n{e}", exc_info=False)
+            return False
+        self.generation = generation
+        self.open_journal(generation)
+        log.debug("Compacted autosave journal")
+        return True
+
+    def open_journal(self, generation:int):
+        '''Truncates the journal and starts it with the generation of the snapshot its edits apply to.'''
+        if self.journal_file != None:
+            self.journal_file.close()
+        self.journal_file = open(self.journal_path, "w")
+        self.journal_file.write(json.dumps([GENERATION_OP, generation]) + "\n")
+        self.journal_file.flush()
+        self.entries = 0
+
+    def close(self, discard:bool=True):
+        '''Stops journaling. discard: If True (a clean exit), the snapshot and journal are deleted so the next launch starts fresh.'''
+        if self.record in FM.edit_listeners:
+            FM.edit_listeners.remove(self.record)
+        if not discard:
+            self.compact()
+        if self.journal_file != None:
+            self.journal_file.close()
+            self.journal_file = None
+        if discard:
+            for path in (self.snapshot_path, self.journal_path):
+                if os.path.exists(path):
+                    os.remove(path)
@@ -0,0 +1,273 @@
+## SQLite-backed flavor library. Keeps thousands of flavors (from any number of units/stations/seasons) in one indexed
+## database instead of a folder of JSON files, while still importing/exporting the same JSON shape FM.save_flavor writes.
+## Usage: python FlavorLibrary.py [--db path] import|list|search|export ...
+import os, sys, json, sqlite3, time, argparse, logging, coloredlogs
+import FlavorManagement as FM
+log = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join("flavor-data", "library.db")
+LAYERS = ("products", "sensors", "misc")
+FLAVOR_KEYS = ("name", "init", "modifiers", "duration") + LAYERS # anything else in the JSON is kept in the "extra" column
+NULLABLE_KEYS = ("modifiers", "duration") # only put back on the flavor when the JSON had them
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS flavors (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL DEFAULT '',
+    name TEXT NOT NULL,
+    init INTEGER NOT NULL DEFAULT 0,
+    modifiers TEXT,
+    duration TEXT,
+    length REAL NOT NULL DEFAULT 0,
+    product_count INTEGER NOT NULL DEFAULT 0,
+    sensor_count INTEGER NOT NULL DEFAULT 0,
+    clock INTEGER NOT NULL DEFAULT 0,
+    extra TEXT,
+    layers TEXT,
+    updated INTEGER NOT NULL,
+    UNIQUE (source, name)
+);
+CREATE INDEX IF NOT EXISTS flavors_name_idx ON flavors (name);
+CREATE TABLE IF NOT EXISTS product_names (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS layer_items (
+    flavor_id INTEGER NOT NULL REFERENCES flavors (id) ON DELETE CASCADE,
+    layer TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    product_id INTEGER NOT NULL REFERENCES product_names (id),
+    duration,
+    PRIMARY KEY (flavor_id, layer, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS layer_items_product_idx ON layer_items (product_id, flavor_id);
+"""
+# layer_items.duration is deliberately untyped so "5", 5 and 7.5 all come back out exactly as they went in
+# flavors.layers is the JSON of each layer without its items ("order" is null where they go), so "count" and any other layer
+# keys come back as they were even when they don't match the items (i.e. extracted flavors)
+
+class FlavorLibrary:
+    def __init__(self, path:str=DEFAULT_DB_PATH):
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.executescript(SCHEMA)
+        if "layers" not in [column[1] for column in self.db.execute("PRAGMA table_info(flavors)")]:
+            self.db.execute("ALTER TABLE flavors ADD COLUMN layers TEXT") # rows saved before this rebuild their layers from the items
+        self._product_ids = {} # product name -> id, saves a lookup per layer item during bulk inserts
+        log.debug(f"Opened flavor library at '{path}'")
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _product_id(self, name:str):
+        product_id = self._product_ids.get(name)
+        if product_id == None:
+            self.db.execute("INSERT OR IGNORE INTO product_names (name) VALUES (?)", (name,))
+            product_id = self.db.execute("SELECT id FROM product_names WHERE name = ?", (name,)).fetchone()[0]
+            self._product_ids[name] = product_id
+        return product_id
+
+    def _insert_flavor(self, flavor:dict, source:str):
+        '''Inserts or replaces one flavor. Must be called inside a transaction.'''
+        name = flavor.get("name")
+        if not name:
+            raise ValueError("Flavor has no name")
+        totals = json.loads(json.dumps(flavor)) # FM's counters write into the dict (and fill in "duration"), so count on a copy
+        product_count, product_length = FM.get_total_products(totals)
+        sensor_count, _ = FM.get_total_sensors(totals)
+        misc_order = flavor.get("misc", {}).get("order", []) or []
+        clock = any(item.get("name") == "clock" for item in misc_order)
+        # an explicit null modifiers/duration goes in extra as it is, there's nothing in the other columns to rebuild it from
+        extra = {key: value for key, value in flavor.items() if key not in FLAVOR_KEYS or (key in NULLABLE_KEYS and value == None)}
+        layers = {key: {**value, "order": None} if isinstance(value, dict) and value.get("order") else value
+                  for key, value in flavor.items() if key in LAYERS}
+        self.db.execute("DELETE FROM flavors WHERE source = ? AND name = ?", (source, name)) # cascades to layer_items
+        cursor = self.db.execute(
+            "INSERT INTO flavors (source, name, init, modifiers, duration, length, product_count, sensor_count, clock, extra, layers, updated) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (source, name, int(bool(flavor.get("init", False))), flavor.get("modifiers"), flavor.get("duration"),
+             product_length or 0, product_count, sensor_count, int(clock), json.dumps(extra) if extra else None, json.dumps(layers), int(time.time()))
+        )
+        flavor_id = cursor.lastrowid
+        rows = []
+        for layer in LAYERS:
+            order = flavor.get(layer, {}).get("order", []) or []
+            for position, item in enumerate(order):
+                rows.append((flavor_id, layer, position, self._product_id(item.get("name")), item.get("duration")))
+        self.db.executemany("INSERT INTO layer_items (flavor_id, layer, position, product_id, duration) VALUES (?, ?, ?, ?, ?)", rows)
+        return flavor_id
+
+    def save_flavor(self, flavor:dict, source:str=""):
+        '''Adds a flavor to the library, replacing any flavor with the same name from the same source. Returns the row id.'''
+        try:
+            with self.db:
+                return self._insert_flavor(flavor, source)
+        except Exception as e:
+            log.error(f"Could not save flavor '{flavor.get('name')}' to library:\n{e}", exc_info=False)
+            self._product_ids = {} # ids added in the rolled back transaction are gone
+            return None
+
+    def save_flavors(self, flavors, source:str=""):
+        '''Bulk inserts flavors in a single transaction. Accepts the dict returned by FlavorExtractor.extract_flavors_from_file, or a list of flavor dicts.
+        Returns the number of flavors saved (0 if the transaction was rolled back).'''
+        if isinstance(flavors, dict):
+            flavors = list(flavors.values())
+        try:
+            with self.db:
+                for flavor in flavors:
+                    self._insert_flavor(flavor, source)
+            log.info(f"Saved {len(flavors)} flavor(s) to library (source: '{source}')")
+            return len(flavors)
+        except Exception as e:
+            log.error(f"Could not save flavors to library, nothing was written:\n{e}", exc_info=False)
+            self._product_ids = {}
+            return 0
+
+    def import_folder(self, folder:str, source:str=""):
+        '''Imports every flavor JSON in a folder (i.e. 'flavor-data') in one transaction.'''
+        flavors = []
+        for entry in sorted(os.scandir(folder), key=lambda e: e.name):
+            if entry.is_file() and entry.name.lower().endswith(".json"):
+                try:
+                    with open(entry.path, "r") as flavor_file:
+                        flavors.append(json.load(flavor_file))
+                except Exception as e:
+                    log.error(f"Skipping '{entry.path}': {e}", exc_info=False)
+        return self.save_flavors(flavors, source=source)
+
+    def load_flavor(self, name:str, source:str=""):
+        '''Returns the flavor in the same JSON shape FM.load_flavor reads, or None if it isn't in the library.'''
+        row = self.db.execute("SELECT * FROM flavors WHERE source = ? AND name = ?", (source, name)).fetchone()
+        if row == None:
+            log.error(f"Flavor '{name}' (source: '{source}') is not in the library.")
+            return None
+        flavor = json.loads(row["extra"]) if row["extra"] else {}
+        flavor["name"] = row["name"]
+        flavor["init"] = bool(row["init"])
+        for key in NULLABLE_KEYS:
+            if row[key] != None:
+                flavor[key] = row[key]
+        if row["layers"] != None:
+            flavor.update(json.loads(row["layers"]))
+        else:
+            for layer in LAYERS:
+                flavor.setdefault(layer, {"count": 0})
+        items = self.db.execute(
+            "SELECT layer_items.layer, product_names.name, layer_items.duration FROM layer_items "
+            "JOIN product_names ON product_names.id = layer_items.product_id "
+            "WHERE layer_items.flavor_id = ? ORDER BY layer_items.layer, layer_items.position", (row["id"],)
+        )
+        for layer, item_name, duration in items:
+            if row["layers"] != None:
+                if flavor[layer]["order"] == None:
+                    flavor[layer]["order"] = []
+                flavor[layer]["order"].append({"name": item_name, "duration": duration})
+            else:
+                flavor[layer].setdefault("order", []).append({"name": item_name, "duration": duration})
+                flavor[layer]["count"] += 1
+        return flavor
+
+    def export_flavor(self, name:str, path:str, source:str=""):
+        '''Writes a library flavor back out as a flavor JSON.'''
+        flavor = self.load_flavor(name, source)
+        if flavor == None:
+            return False
+        FM.save_flavor(path, target=flavor)
+        return True
+
+    def delete_flavor(self, name:str, source:str=""):
+        with self.db:
+            self.db.execute("DELETE FROM flavors WHERE source = ? AND name = ?", (source, name))
+
+    def list_flavors(self, source:str | None=None):
+        '''Lists flavors without touching their layer items. Returns a list of dicts.'''
+        query = "SELECT source, name, init, modifiers, length, product_count, sensor_count, clock, updated FROM flavors"
+        params = ()
+        if source != None:
+            query += " WHERE source = ?"
+            params = (source,)
+        query += " ORDER BY source, name"
+        return [dict(row) for row in self.db.execute(query, params)]
+
+    def sources(self):
+        return [row[0] for row in self.db.execute("SELECT DISTINCT source FROM flavors ORDER BY source")]
+
+    def search(self, name:str | None=None, product:str | None=None, source:str | None=None):
+        '''Finds flavors by name (SQL LIKE pattern, i.e. 'K%') and/or by a product or sensor they contain.'''
+        query = "SELECT DISTINCT flavors.source, flavors.name, flavors.init, flavors.modifiers, flavors.length, flavors.product_count, flavors.sensor_count, flavors.clock, flavors.updated FROM flavors"
+        where = []
+        params = []
+        if product != None:
+            query += " JOIN layer_items ON layer_items.flavor_id = flavors.id JOIN product_names ON product_names.id = layer_items.product_id"
+            where.append("product_names.name = ?")
+            params.append(product)
+        if name != None:
+            where.append("flavors.name LIKE ?")
+            params.append(name)
+        if source != None:
+            where.append("flavors.source = ?")
+            params.append(source)
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY flavors.source, flavors.name"
+        return [dict(row) for row in self.db.execute(query, params)]
+
+    def product_usage(self):
+        '''Returns {product name: number of flavors using it}.'''
+        rows = self.db.execute(
+            "SELECT product_names.name, COUNT(DISTINCT layer_items.flavor_id) FROM product_names "
+            "JOIN layer_items ON layer_items.product_id = product_names.id GROUP BY product_names.name ORDER BY product_names.name"
+        )
+        return {row[0]: row[1] for row in rows}
+
+def main(argv=None):
+    coloredlogs.install("INFO")
+    parser = argparse.ArgumentParser(description="Manage the SQLite flavor library.")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help=f"Library database path (default: {DEFAULT_DB_PATH})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_cmd = commands.add_parser("import", help="Import a folder of flavor JSONs or a DIF (.dat/.txt)")
+    import_cmd.add_argument("path")
+    import_cmd.add_argument("--source", default="", help="Unit/station/season label for the imported flavors")
+    list_cmd = commands.add_parser("list", help="List flavors")
+    list_cmd.add_argument("--source", default=None)
+    search_cmd = commands.add_parser("search", help="Search flavors by name pattern and/or product")
+    search_cmd.add_argument("--name", default=None, help="SQL LIKE pattern, i.e. 'K%%'")
+    search_cmd.add_argument("--product", default=None, help="Product or sensor name, i.e. 'ex002a'")
+    search_cmd.add_argument("--source", default=None)
+    export_cmd = commands.add_parser("export", help="Export a flavor to JSON")
+    export_cmd.add_argument("name")
+    export_cmd.add_argument("path")
+    export_cmd.add_argument("--source", default="")
+    args = parser.parse_args(argv)
+
+    with FlavorLibrary(args.db) as library:
+        if args.command == "import":
+            if os.path.isdir(args.path):
+                count = library.import_folder(args.path, source=args.source)
+            else:
+                import FlavorExtractor as FE
+                count = library.save_flavors(FE.extract_flavors_from_file(args.path), source=args.source)
+            return 0 if count > 0 else 1
+        if args.command == "list":
+            rows = library.list_flavors(source=args.source)
+        elif args.command == "search":
+            rows = library.search(name=args.name, product=args.product, source=args.source)
+        else:
+            return 0 if library.export_flavor(args.name, args.path, source=args.source) else 1
+        sys.stdout.write(json.dumps(rows, indent=4) + "\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
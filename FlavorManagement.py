@@ -1,10 +1,19 @@
 # Manages the flavor details
-import json, re, time
-import logging, coloredlogs
+import json, re, hashlib
+import logging
+import DIFKeys
 log = logging.getLogger(__name__)
-coloredlogs.install(level="INFO")
 
 flavor = {}
+edit_listeners = [] # callables run as listener(op, args) after every successful edit to the active flavor (see FlavorJournal)
+
+def notify_edit(op:str, **args):
+    '''Tells every edit listener that the active flavor was changed by op.'''
+    for listener in edit_listeners:
+        try:
+            listener(op, args)
+        except Exception as e:
+            log.error(f"Edit listener failed for '{op}':\n{e}", exc_info=False)
 
 def float_or_int(input_:str):
     '''This is really stupid but whatever. Input a string number, and if it's a whole number, it gets returned as int. If it's a decimal, it's returned as a float.'''
@@ -30,6 +39,7 @@ def load_flavor(path:str):
             flavor = json.load(flavor_file)
             flavor_file.close()
             log.debug(f"Loaded JSON successfully")
+        notify_edit("replace")
     except FileNotFoundError:
         log.error(f"Could not open requested file path: {path}\nFile Not Found", exc_info=False)
     except PermissionError:
@@ -41,14 +51,16 @@ def load_flavor(path:str):
     except:
         log.error(f"What tf happened")
 
-def save_flavor(path:str):
+def save_flavor(path:str, target:dict=None):
+    '''Saves the active flavor, or target if given, to a JSON file.'''
     global flavor
-    if flavor.get("init", None) == None:
-        flavor["init"] = False
+    if target == None: target = flavor
+    if target.get("init", None) == None:
+        target["init"] = False
     try:
         with open(path, "w") as flavor_file:
-            name = flavor.get("name")
-            json.dump(flavor, flavor_file, indent=4)
+            name = target.get("name")
+            json.dump(target, flavor_file, indent=4)
             log.debug(f"Saved JSON successfully")
             log.info(f"Flavor '{name}' has been saved to: '{path}'")
     except PermissionError:
@@ -62,13 +74,44 @@ def clear_flavor():
     global flavor
     flavor = {}
     log.debug(f"Cleared flavor dict")
+    notify_edit("replace")
+
+def set_flavor(new_flavor:dict):
+    '''Replaces the active flavor (i.e. with one extracted from a DIF).'''
+    global flavor
+    flavor = new_flavor
+    notify_edit("replace")
+
+def set_name(name:str):
+    global flavor
+    if flavor.get("name") != name:
+        flavor["name"] = name
+        notify_edit("name", name=name)
+
+def set_init(on:bool):
+    '''Sets whether the flavor is initialized as callable. Turning init off also clears the modifiers.'''
+    global flavor
+    if flavor.get("init") != on:
+        flavor["init"] = on
+        notify_edit("init", on=on)
+    if not on:
+        set_modifiers(None)
+
+def set_modifiers(modifiers:str | None):
+    global flavor
+    if modifiers == "": modifiers = None
+    if flavor.get("modifiers") != modifiers:
+        flavor["modifiers"] = modifiers
+        notify_edit("modifiers", modifiers=modifiers)
 
-def error_check():
+def error_check(target:dict=None):
+    '''Returns a list of configuration errors for the active flavor, or for target if given.'''
     global flavor
+    if target == None: target = flavor
     errors = []
-    flavor_name = flavor.get("name", "")
-    misc_order = flavor.get("misc", {}).get("order", [])
-    product_count, product_duration_total = get_total_products()
+    flavor_name = target.get("name", "") or ""
+    misc_order = target.get("misc", {}).get("order", [])
+    product_count, product_duration_total = get_total_products(target)
     if bool(re.search(r'[^A-Z0-9]', flavor_name)):
         errors.append("Flavor name contains an invalid character.")
     elif len(flavor_name) == 0:
@@ -108,10 +151,12 @@ def update_product(index:int | None, name:str, duration):
         if index != None: # This is an existing product
             flavor["products"]["order"][index] = product
             log.info(f"Updated product {index}: '{name}' with duration of {duration} seconds.")
+            notify_edit("update_product", index=index, name=name, duration=duration)
             return "OK"
         else: # No index means new product
             flavor["products"]["order"].append(product)
             log.info(f"Added product '{name}' with duration of {duration} seconds.")
+            notify_edit("update_product", index=None, name=name, duration=duration)
             return "OK"
     if not name:
         error = "Product requires a name! (i.e. 'ex001a')"
@@ -130,6 +175,7 @@ def remove_product(index:int):
         prod_duration = flavor["products"]["order"][index]["duration"]
         log.debug(f"Removing product {index}: '{prod_name}' with duration of {prod_duration} seconds.")
         flavor["products"]["order"].pop(index)
+        notify_edit("remove_product", index=index)
         return "OK"
     except KeyError:
         error = f"Error trying to remove product index {index}:\nKey Error"
@@ -163,6 +209,7 @@ def renumber(index:int, new_index:int, prod_type:str="products"):
             prods_to_move = prods[(index+1):(len(prods))] # we need to move every product after the current index DOWN by 1
 
             new_product_order = []
+            i = index - 1 # moving the first product leaves the loop below empty
             for i in range(index): # for every product until the existing index
                 i_name = prods[i]["name"]
                 log.debug(f"Product '{i_name}' will remain in its place ({i}).")
@@ -179,6 +226,7 @@ def renumber(index:int, new_index:int, prod_type:str="products"):
 
             log.debug(f"Setting new product order.")
             flavor[prod_type]["order"] = new_product_order # override the global flavor's product order with our new one
+            notify_edit("renumber", index=index, new_index=new_index, prod_type=prod_type)
 
             return "OK"
         else:
@@ -219,6 +267,7 @@ def renumber(index:int, new_index:int, prod_type:str="products"):
 
                 log.debug(f"Setting new product order.")
                 flavor[prod_type]["order"] = new_product_order # override the global flavor's product order with our new one
+                notify_edit("renumber", index=index, new_index=new_index, prod_type=prod_type)
                 return "OK"
             
             elif index < new_index: # IF THE NEW PRODUCT INDEX IS *AFTER* THE CURRENT INDEX....
@@ -237,7 +286,7 @@ def renumber(index:int, new_index:int, prod_type:str="products"):
                 prods_to_move = prods[index+1:(new_index+1)] 
                 for p in prods_to_move:
                     p_name = p["name"]
-                    log.warning(f"Moving product '{p_name}' to new position ({i}).")
+                    log.debug(f"Moving product '{p_name}' to new position ({i}).")
                     new_product_order.append(p)
                     i += 1
                 # ADD THE PRODUCT TO ITS NEW INDEX
@@ -255,6 +304,7 @@ def renumber(index:int, new_index:int, prod_type:str="products"):
 
                 log.debug(f"Setting new product order.")
                 flavor[prod_type]["order"] = new_product_order # override the global flavor's product order with our new one
+                notify_edit("renumber", index=index, new_index=new_index, prod_type=prod_type)
                 return "OK"
 
 
@@ -288,10 +338,12 @@ def update_sensor(index:int | None, name:str, duration):
         if index != None: # This is an existing sensor
             flavor["sensors"]["order"][index] = sensor
             log.info(f"Updated sensor {index}: '{name}' with duration of {duration} seconds.")
+            notify_edit("update_sensor", index=index, name=name, duration=duration)
             return "OK"
         else: # No index means new sensor
             flavor["sensors"]["order"].append(sensor)
             log.info(f"Added sensor '{name}' with duration of {duration} seconds.")
+            notify_edit("update_sensor", index=None, name=name, duration=duration)
             return "OK"
     if not name:
         error = "Sensor requires a name! (i.e. 'par_hum001')"
@@ -310,6 +362,7 @@ def remove_sensor(index:int):
         sens_duration = flavor["sensors"]["order"][index]["duration"]
         log.debug(f"Removing sensor {index}: '{sens_name}' with duration of {sens_duration} seconds.")
         flavor["sensors"]["order"].pop(index)
+        notify_edit("remove_sensor", index=index)
         return "OK"
     except KeyError:
         error = f"Error trying to remove sensor index {index}:\nKey Error"
@@ -324,52 +377,58 @@ def remove_sensor(index:int):
         return None
 
 
-def get_products():
+def get_products(target:dict=None):
+    '''Returns the product order of the active flavor, or of target if given.'''
     global flavor
-    if not flavor.get("products"):
-        flavor["products"] = {}
+    if target == None: target = flavor
+    if not target.get("products"):
+        target["products"] = {}
         log.debug("Initialized products dict")
-    if not flavor.get("products", {}).get("order"):
-        flavor["products"]["order"] = []
+    if not target.get("products", {}).get("order"):
+        target["products"]["order"] = []
         log.debug("Initialized products order list")
-    return flavor["products"]["order"]
+    return target["products"]["order"]
 
-def get_sensors():
+def get_sensors(target:dict=None):
+    '''Returns the sensor order of the active flavor, or of target if given.'''
     global flavor
-    if not flavor.get("sensors"):
-        flavor["sensors"] = {}
+    if target == None: target = flavor
+    if not target.get("sensors"):
+        target["sensors"] = {}
         log.debug("Initialized sensors dict")
-    if not flavor.get("sensors", {}).get("order"):
-        flavor["sensors"]["order"] = []
+    if not target.get("sensors", {}).get("order"):
+        target["sensors"]["order"] = []
         log.debug("Initialized sensors order list")
-    return flavor["sensors"]["order"]
+    return target["sensors"]["order"]
 
 
-def get_total_products():
+def get_total_products(target:dict=None):
     '''Updates the product count and defines the flavor duration.'''
     global flavor
-    products = get_products()
+    if target == None: target = flavor
+    products = get_products(target)
     product_count = 0
     product_time = 0
     for product_dict in products:
         product_count += 1
         product_duration = product_dict.get("duration", 0)
         product_time += float_or_int(product_duration)
-    flavor["products"]["count"] = product_count
-    flavor["duration"] = f"{product_time} sec"
+    target["products"]["count"] = product_count
+    target["duration"] = f"{product_time} sec"
     return product_count, float_or_int(product_time) # we'll use this to set the clock
 
-def get_total_sensors():
+def get_total_sensors(target:dict=None):
     '''Updates the sensor count and defines the flavor duration.'''
     global flavor
-    sensors = get_sensors()
+    if target == None: target = flavor
+    sensors = get_sensors(target)
     sensor_count = 0
     sensor_time = 0
     for sensor in sensors:
         sensor_count += 1
         sensor_duration = sensor.get("duration", 0)
         sensor_time += float_or_int(sensor_duration)
-    flavor["sensors"]["count"] = sensor_count
+    target["sensors"]["count"] = sensor_count
     #flavor["duration"] = f"{sensor_time} sec"
     return sensor_count, float_or_int(sensor_time)
 
@@ -378,8 +437,7 @@ def update_clock_setting(on:bool, duration:float):
     on: If True, the misc layer becomes available.
     duration: Float value, should match the length of all products.'''
     global flavor
-
-    duration
+    previous = flavor.get("misc")
 
     if on == True:
         flavor["misc"] = {}
@@ -388,71 +446,95 @@ def update_clock_setting(on:bool, duration:float):
     else:
         flavor["misc"] = {}
         flavor["misc"]["count"] = 0
+    if flavor["misc"] != previous: # the GUI re-applies the clock on every refresh, only real changes count as edits
+        notify_edit("clock", on=on, duration=duration)
 
 
-def dif_string(key:str, data:str):
-    l = f'"{key}",0,0,"{data}"\n'
+def dif_string(key:str, data:str, exp_ts:int | None=None, fields:tuple=(0, 0)):
+    '''Formats one DIF import line. exp_ts: Optional expiry timestamp, appended as the fifth field.
+    fields: Optional values for the two numeric fields, written as given (DIFDecode.iter_wxl_txt reads them back the same way).'''
+    if exp_ts != None:
+        return f'"{key}",{fields[0]},{fields[1]},"{data}",{exp_ts}\n'
+    l = f'"{key}",{fields[0]},{fields[1]},"{data}"\n'
     return l
 
-def export_dif_txt(file_path:str):
-    log.info("Building DIF import TXT...")
-    flavor_name = flavor.get("name", None)
-    get_total_products()
-    dif = ''
-    flavor_duration = flavor.get("duration", "NULL sec")
-    flavor_str = f"c_flavor_{flavor_name}"
-    flavor_init = flavor.get("init", False)
-    flavor_mods = flavor.get("modifiers", "")
-    flavor_products_order = flavor["products"].get("order", [])
-    flavor_sensors_order = flavor["sensors"].get("order", [])
-    flavor_misc_order = flavor["misc"].get("order", [])
-    version_str = f"EXPORT_{int(time.time())}" # will add a version string manager later
+LAYER_TYPES = DIFKeys.LAYERS # ("product", "sensor", "misc")
+DIF_SECTIONS = ("flavor",) + LAYER_TYPES
+
+def dif_entries(target:dict=None):
+    '''Returns the DIF keys for the active flavor, or for target if given, grouped by section:
+    {"flavor": [(key, data), ...], "product": [...], "sensor": [...], "misc": [...]}. The layer version keys aren't included, see layer_version.'''
+    global flavor
+    if target == None: target = flavor
+    flavor_name = target.get("name", None)
+    get_total_products(target)
+    get_total_sensors(target)
+    flavor_duration = target.get("duration", "NULL sec")
+    flavor_str = DIFKeys.encode(flavor_name, None, DIFKeys.INIT)
+    flavor_init = target.get("init", False)
+    flavor_mods = target.get("modifiers", "")
+    flavor_misc_order = target.get("misc", {}).get("order", [])
+    layer_orders = {
+        "product": target["products"].get("order", []),
+        "sensor": target["sensors"].get("order", []),
+        "misc": flavor_misc_order
+    }
+    layer_counts = {
+        "product": target["products"]["count"],
+        "sensor": target["sensors"]["count"],
+        "misc": target.get("misc", {}).get("count", len(flavor_misc_order))
+    }
+    sections = {"flavor": []}
     # Flavor Init
     if flavor_init:
         flavor_init_str = f"@Init({flavor_name})"
         if flavor_mods:
             flavor_init_str += flavor_mods
-        dif += dif_string(flavor_str, flavor_init_str) # being under this condition makes sure the key is only created if init is true
+        sections["flavor"].append((flavor_str, flavor_init_str)) # being under this condition makes sure the key is only created if init is true
     # Flavor Duration
-    dif += dif_string(f"c_{flavor_name}_duration", flavor_duration)
-    # PRODUCTS --------------------------------------------------------------
-    dif += dif_string(f"c_{flavor_name}_product_num", flavor["products"]["count"]) # Product Count
-    i = 0
-    for item in flavor_products_order:
-        item_type = "product"
-        item_name = item["name"]
-        item_duration = item["duration"]
-        i_str = f"{i:02}"
-        dif += dif_string(f"c_{flavor_name}_{item_type}_{i_str}", item_name)
-        dif += dif_string(f"c_{flavor_name}_{item_type}_duration_{i_str}", item_duration)
-        i += 1
-    # SENSORS --------------------------------------------------------------
-    dif += dif_string(f"c_{flavor_name}_sensor_num", flavor["sensors"]["count"]) # Product Count
-    i = 0
-    for item in flavor_sensors_order:
-        item_type = "sensor"
-        item_name = item["name"]
-        item_duration = item["duration"]
-        i_str = f"{i:02}"
-        dif += dif_string(f"c_{flavor_name}_{item_type}_{i_str}", item_name)
-        dif += dif_string(f"c_{flavor_name}_{item_type}_duration_{i_str}", item_duration)
-        i += 1
-    # MISC --------------------------------------------------------------
-    dif += dif_string(f"c_{flavor_name}_misc_num", flavor["misc"]["count"]) # Product Count
-    i = 0
-    for item in flavor_misc_order:
-        item_type = "misc"
-        item_name = item["name"]
-        item_duration = item["duration"]
-        i_str = f"{i:02}"
-        dif += dif_string(f"c_{flavor_name}_{item_type}_{i_str}", item_name)
-        dif += dif_string(f"c_{flavor_name}_{item_type}_duration_{i_str}", item_duration)
-        i += 1
+    sections["flavor"].append((DIFKeys.encode(flavor_name, None, DIFKeys.DURATION), flavor_duration))
+    # PRODUCTS, SENSORS, MISC --------------------------------------------------------------
+    item_key, item_duration_key = DIFKeys.builder(DIFKeys.ITEM), DIFKeys.builder(DIFKeys.ITEM_DURATION)
+    for item_type in LAYER_TYPES:
+        entries = [(DIFKeys.encode(flavor_name, item_type, DIFKeys.COUNT), layer_counts[item_type])] # Item Count
+        i = 0
+        for item in layer_orders[item_type]:
+            item_name = item["name"]
+            item_duration = item["duration"]
+            entries.append((item_key(flavor_name, item_type, i), item_name))
+            entries.append((item_duration_key(flavor_name, item_type, i), item_duration))
+            i += 1
+        sections[item_type] = entries
+    return sections
+
+def layer_version(entries:list, dif:str | None=None):
+    '''Derives a version string from the content of a DIF section, so it only changes when the exported keys change.
+    dif: The section's DIF lines, if they were already built from entries.'''
+    if dif == None: dif = "".join(dif_string(key, data) for key, data in entries)
+    digest = hashlib.sha1(dif.encode("utf-8")).hexdigest()
+    return f"HASH_{digest[:16]}"
+
+def build_dif_txt(target:dict=None, sections=None):
+    '''Builds the DIF import TXT for the active flavor, or for target if given, and returns it as a string.
+    sections: Optionally only emit these sections (see DIF_SECTIONS), i.e. to skip layers that haven't changed since the last export.'''
+    entries = dif_entries(target)
+    if sections == None: sections = DIF_SECTIONS
+    section_difs = {}
+    for section in DIF_SECTIONS:
+        if section in sections:
+            section_difs[section] = "".join([dif_string(key, data) for key, data in entries[section]])
+    dif = "".join(section_difs.values())
     # Version Strings (still don't know if they're needed for load or not)
-    dif += dif_string(f"c_{flavor_name}_product_version", version_str)
-    dif += dif_string(f"c_{flavor_name}_sensor_version", version_str)
-    dif += dif_string(f"c_{flavor_name}_misc_version", version_str)
+    flavor_name = (target if target != None else flavor).get("name", None)
+    for item_type in LAYER_TYPES:
+        if item_type in sections:
+            dif += dif_string(DIFKeys.encode(flavor_name, item_type, DIFKeys.VERSION), layer_version(entries[item_type], section_difs[item_type]))
+    return dif
+
+def export_dif_txt(file_path:str, target:dict=None):
+    log.info("Building DIF import TXT...")
+    dif = build_dif_txt(target)
     with open(file_path, "w") as out_f:
         out_f.write(dif)
         out_f.close()
-    log.info(f"Wrote DIF to '{file_path}'!\nYou can import this to your XL by uploading the file via FTP, and then running the following command:\n/twc/bin/db_imp -d -r -s dif /twc/dif/wxl_dif /path/to/file.txt")
\ No newline at end of file
+    log.info(f"Wrote DIF to '{file_path}'!\nYou can import this to your XL by uploading the file via FTP, and then running the following command:\n/twc/bin/db_imp -d -r -s dif /twc/dif/wxl_dif /path/to/file.txt")
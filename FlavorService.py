@@ -0,0 +1,306 @@
+## Optional local HTTP/JSON service for provisioning scripts, so they don't have to start Python and re-parse the same DIF for
+## every question. Parsed databases (and the flavors extracted from them) are kept in an LRU keyed by the file's identity
+## (path, size, mtime), so asking about the same dump again is a dictionary lookup. Requests are handled on their own threads.
+## Usage: python FlavorService.py [--host 127.0.0.1] [--port 8765] [--cache-size 8]
+## Endpoints (POST a JSON object, get a JSON object back; errors come back as {"error": "..."} with a 4xx/5xx status):
+##   /parse     {"path", "prefix"?}                      -> {"keys": count, "database": {key: data}}
+##   /extract   {"path", "names"?}                       -> {"flavors": {name: flavor}}
+##   /validate  {"flavor"} or {"path", "names"?}         -> {"errors": {name: [error, ...]}}
+##   /export    {"flavor"} or {"path", "names"?}, "out"? -> {"dif": "...", "skipped": [name, ...]}
+##   GET /status                                         -> cache statistics
+## POSTs must be sent as Content-Type: application/json, so a web page can't make the browser send one without a CORS preflight.
+## The Host header has to be localhost, 127.0.0.1, ::1 or the address the service listens on, so a web page can't reach it by
+## pointing its own domain name at 127.0.0.1 (DNS rebinding).
+## "out" is a file name inside the folder given with --out-dir. Without --out-dir the service never writes files, the caller
+## writes the returned "dif" itself.
+import os, sys, json, copy, time, threading, argparse, logging, coloredlogs
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import FlavorManagement as FM
+log = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1" # local only, there is no authentication
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_SIZE = 8
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1")
+
+class ServiceError(Exception):
+    def __init__(self, message:str, status:int=400):
+        super().__init__(message)
+        self.status = status
+
+def file_identity(path:str):
+    '''Returns (real path, size, mtime_ns), which changes whenever the file is replaced or rewritten.'''
+    try:
+        stat = os.stat(path)
+    except OSError as e:
+        raise ServiceError(f"Can't read '{path}': {e.strerror}", 404)
+    return (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+
+class DatabaseCache:
+    '''LRU of parsed databases. Each file is only parsed once even if several requests ask for it at the same time.'''
+    def __init__(self, max_entries:int=DEFAULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict() # identity -> {"database", "flavors"/"index" (built on first use), "flavors_lock"}
+        self.lock = threading.Lock()
+        self.loading = {} # identity -> threading.Lock held while that file is parsed
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path:str):
+        '''Returns the cache entry for path ({"database": dict, "flavors": dict or None}), parsing the file if needed.'''
+        identity = file_identity(path)
+        with self.lock:
+            entry = self.entries.get(identity)
+            if entry != None:
+                self.entries.move_to_end(identity)
+                self.hits += 1
+                return entry
+            file_lock = self.loading.setdefault(identity, threading.Lock())
+        with file_lock:
+            try:
+                with self.lock:
+                    entry = self.entries.get(identity)
+                    if entry != None: # another request parsed it while we waited
+                        self.hits += 1
+                        return entry
+                import DIFDecode
+                started = time.perf_counter()
+                database = DIFDecode.parse(identity[0])
+                log.info(f"Parsed '{path}' ({len(database)} keys) in {(time.perf_counter() - started) * 1000:.0f} ms")
+                entry = {"database": database, "flavors": None, "index": None, "flavors_lock": threading.Lock()}
+                with self.lock:
+                    self.misses += 1
+                    self.entries[identity] = entry
+                    # Anything older for the same path is stale now
+                    for old in [key for key in self.entries if key[0] == identity[0] and key != identity]:
+                        del self.entries[old]
+                    while len(self.entries) > self.max_entries:
+                        self.entries.popitem(last=False)
+                return entry
+            finally:
+                with self.lock:
+                    self.loading.pop(identity, None) # even if the parse failed, so the next request tries again
+
+    def flavors(self, path:str):
+        '''Returns the flavors extracted from path. They're shared between requests, so copy them before changing anything.'''
+        entry = self.get(path)
+        with entry["flavors_lock"]:
+            if entry["flavors"] == None:
+                import FlavorExtractor as FE
+                entry["flavors"] = FE.extract_flavors(entry["database"])
+        return entry["flavors"]
+
+    def index(self, path:str):
+        '''Returns the DIFIndex.KeyIndex of path's keys, built on first use.'''
+        entry = self.get(path)
+        with entry["flavors_lock"]:
+            if entry["index"] == None:
+                import DIFIndex
+                entry["index"] = DIFIndex.KeyIndex(entry["database"])
+        return entry["index"]
+
+    def named_flavors(self, path:str, names:list):
+        '''Returns {name: flavor} for the named flavors that are in path. Unless every flavor was already extracted, only the
+        keys of the named flavors are read (through the key index).'''
+        entry = self.get(path)
+        flavors = entry["flavors"]
+        if flavors == None:
+            import FlavorExtractor as FE
+            index = self.index(path)
+            flavors = {name: FE.extract_flavor(index, name) for name in names}
+        return {name: flavors[name] for name in names if flavors.get(name) != None}
+
+    def status(self):
+        with self.lock:
+            return {
+                "entries": [{"path": key[0], "size": key[1], "keys": len(entry["database"])} for key, entry in self.entries.items()],
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+class FlavorService:
+    '''The request handlers, kept apart from the HTTP plumbing so they can be called directly too.'''
+    def __init__(self, cache_size:int=DEFAULT_CACHE_SIZE, out_dir:str | None=None):
+        '''out_dir: The only folder /export may write to. None turns writing files off.'''
+        self.cache = DatabaseCache(cache_size)
+        self.out_dir = None if out_dir == None else os.path.realpath(out_dir)
+
+    def handle(self, endpoint:str, request:dict):
+        handler = {
+            "/parse": self.parse,
+            "/extract": self.extract,
+            "/validate": self.validate,
+            "/export": self.export,
+        }.get(endpoint)
+        if handler == None:
+            raise ServiceError(f"Unknown endpoint '{endpoint}'", 404)
+        return handler(request)
+
+    def require_path(self, request:dict):
+        path = request.get("path")
+        if not isinstance(path, str) or not path:
+            raise ServiceError("Missing 'path' to a DIF (.dat/.txt)")
+        return path
+
+    def selected_flavors(self, request:dict):
+        '''Returns {name: flavor} from the request: a single "flavor", or the flavors of "path" (optionally only "names").
+        The flavors are copies, FM's totals write into the dicts they're given.'''
+        if request.get("flavor") != None:
+            target = request["flavor"]
+            if not isinstance(target, dict):
+                raise ServiceError("'flavor' must be a flavor JSON object")
+            return {target.get("name"): copy.deepcopy(target)}
+        path = self.require_path(request)
+        names = request.get("names")
+        if names != None and (not isinstance(names, list) or not all(isinstance(name, str) for name in names)):
+            raise ServiceError("'names' must be a list of flavor names")
+        if names == None:
+            flavors = self.cache.flavors(path)
+            names = sorted(flavors)
+        else:
+            flavors = self.cache.named_flavors(path, names)
+        missing = [name for name in names if name not in flavors]
+        if missing:
+            raise ServiceError(f"Flavor(s) not found: {', '.join(missing)}", 404)
+        return {name: copy.deepcopy(flavors[name]) for name in names}
+
+    def parse(self, request:dict):
+        path = self.require_path(request)
+        database = self.cache.get(path)["database"]
+        prefix = request.get("prefix")
+        if prefix != None and not isinstance(prefix, str):
+            raise ServiceError("'prefix' must be a string")
+        if prefix:
+            index = self.cache.index(path)
+            database = index.items(index.prefix(prefix))
+        return {"keys": len(database), "database": database}
+
+    def extract(self, request:dict):
+        return {"flavors": self.selected_flavors(request)}
+
+    def validate(self, request:dict):
+        return {"errors": {name: FM.error_check(target) for name, target in self.selected_flavors(request).items()}}
+
+    def out_path(self, out):
+        '''Returns where "out" is in the output folder, refusing anything that would end up outside of it.'''
+        if self.out_dir == None:
+            raise ServiceError("Writing files is turned off, start the service with --out-dir (or write the returned 'dif' yourself)", 403)
+        if not isinstance(out, str):
+            raise ServiceError("'out' must be a file name")
+        path = os.path.realpath(os.path.join(self.out_dir, out))
+        if os.path.commonpath((self.out_dir, path)) != self.out_dir or path == self.out_dir:
+            raise ServiceError(f"'{out}' is outside of the output folder", 403)
+        return path
+
+    def export(self, request:dict):
+        out = request.get("out")
+        out_path = self.out_path(out) if out else None # checked before doing any work
+        dif = ''
+        skipped = []
+        for name, target in self.selected_flavors(request).items():
+            if len(FM.error_check(target)) > 0:
+                skipped.append(name)
+                continue
+            dif += FM.build_dif_txt(target)
+        if out_path != None:
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            with open(out_path, "w") as out_f:
+                out_f.write(dif)
+            log.info(f"Wrote DIF to '{out_path}'")
+        return {"dif": dif, "skipped": skipped}
+
+class _Handler(BaseHTTPRequestHandler):
+    service = None # set by make_server
+    protocol_version = "HTTP/1.1" # keep-alive, scripts making many calls reuse the connection
+
+    def check_host(self):
+        '''Raises ServiceError unless the request's Host header names this machine, see LOCAL_HOSTS.'''
+        host = self.headers.get("Host", "").strip().lower()
+        if host.startswith("["): # [::1]:8765
+            host = host[1:].split("]", 1)[0]
+        elif host.count(":") == 1:
+            host = host.split(":", 1)[0]
+        if host not in LOCAL_HOSTS + (self.server.server_address[0].lower(),):
+            raise ServiceError(f"Requests must be sent to localhost, not '{self.headers.get('Host', '')}'", 403)
+
+    def do_GET(self):
+        try:
+            self.check_host()
+            if self.path != "/status":
+                raise ServiceError(f"Unknown endpoint '{self.path}'", 404)
+            self.reply(200, self.service.cache.status())
+        except ServiceError as e:
+            self.reply(e.status, {"error": str(e)})
+
+    def do_POST(self):
+        started = time.perf_counter()
+        body = None
+        try:
+            self.check_host()
+            if self.headers.get_content_type() != "application/json":
+                raise ServiceError("Requests must be sent as Content-Type: application/json", 415)
+            length = int(self.headers.get("Content-Length", 0))
+            if length > MAX_REQUEST_BYTES:
+                raise ServiceError("Request is too large", 413)
+            body = self.rfile.read(length) if length > 0 else b"{}"
+            try:
+                request = json.loads(body)
+            except json.JSONDecodeError as e:
+                raise ServiceError(f"Malformatted JSON: {e}")
+            if not isinstance(request, dict):
+                raise ServiceError("The request must be a JSON object")
+            self.reply(200, self.service.handle(self.path, request))
+        except ServiceError as e:
+            if body == None:
+                self.close_connection = True # the unread body would be taken for the next request
+            self.reply(e.status, {"error": str(e)})
+        except Exception as e:
+            log.error(f"Request to '{self.path}' failed:\n{e}", exc_info=False)
+            self.reply(500, {"error": str(e)})
+        log.debug(f"{self.path} took {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    def reply(self, status:int, response:dict):
+        body = json.dumps(response, separators=(",", ":")).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        log.debug(f"{self.address_string()} {format % args}")
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 64 # the default backlog of 5 resets connections when a script fires off a burst of requests
+
+def make_server(host:str=DEFAULT_HOST, port:int=DEFAULT_PORT, cache_size:int=DEFAULT_CACHE_SIZE, out_dir:str | None=None):
+    '''Returns a ThreadingHTTPServer serving a new FlavorService (port 0 picks a free port, see server.server_address).'''
+    handler = type("FlavorServiceHandler", (_Handler,), {"service": FlavorService(cache_size, out_dir)})
+    return _Server((host, port), handler)
+
+def main(argv=None):
+    coloredlogs.install("INFO")
+    parser = argparse.ArgumentParser(description="Serve DIF parsing, flavor extraction, validation and export over local HTTP/JSON.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Address to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE, help="Number of parsed DIFs to keep in memory")
+    parser.add_argument("--out-dir", default=None, help="Let /export write its 'out' files into this folder (and nowhere else)")
+    args = parser.parse_args(argv)
+    server = make_server(args.host, args.port, args.cache_size, args.out_dir)
+    log.info(f"Flavor service listening on http://{server.server_address[0]}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
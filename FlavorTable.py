@@ -0,0 +1,98 @@
+## Table model for the flavors extracted from a DIF, used by the DIF flavor picker.
+## Only the names are gathered up front. The other columns are worked out the first time a row is actually shown (or sorted
+## on), so a DIF with thousands of flavors opens straight away, and filtering by name never has to look inside a flavor.
+## Sorting and filtering work on the Python lists directly instead of going through data() once per row.
+import logging
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, QSortFilterProxyModel, Qt
+import FlavorManagement as FM
+import FlavorTimeline
+log = logging.getLogger(__name__)
+
+COLUMNS = ("Name", "Init", "Modifiers", "Products", "Length")
+NAME_COLUMN = 0
+
+def flavor_summary(flavor:dict):
+    '''Returns the picker columns after the name: (init, modifiers, product count, total product length).'''
+    order = (flavor.get("products") or {}).get("order") or [] # not FM.get_total_products, that writes into the flavor
+    product_count = len(order)
+    product_length = FM.float_or_int(sum(FlavorTimeline.item_duration(product) for product in order)) # bad durations count as 0
+    return ("Yes" if flavor.get("init") else "", flavor.get("modifiers") or "", product_count, product_length)
+
+class FlavorTableModel(QAbstractTableModel):
+    def __init__(self, flavors:dict, parent=None):
+        super().__init__(parent)
+        self.flavors = flavors
+        self.names = sorted(flavors)
+        self.summaries = {} # name -> flavor_summary, filled in as rows are shown
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.names)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.names):
+            return None
+        name = self.names[index.row()]
+        if role == Qt.DisplayRole:
+            if index.column() == NAME_COLUMN:
+                return name
+            return self.summary(name)[index.column() - 1]
+        if role == Qt.ToolTipRole and index.column() == COLUMNS.index("Modifiers"):
+            return self.summary(name)[1] or None
+        if role == Qt.TextAlignmentRole and index.column() >= COLUMNS.index("Products"):
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+    def summary(self, name:str):
+        summary = self.summaries.get(name)
+        if summary == None:
+            summary = flavor_summary(self.flavors.get(name, {}))
+            self.summaries[name] = summary
+        return summary
+
+    def flavor_name(self, row:int):
+        return self.names[row]
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        if column < 0 or column >= len(COLUMNS):
+            return # no sort column, the names keep their current order
+        self.layoutAboutToBeChanged.emit()
+        # selections, the current index and the proxy's mapping are persistent indexes, they have to follow their flavor
+        persistent = self.persistentIndexList()
+        persistent_names = [(self.names[index.row()], index.column()) for index in persistent]
+        if column == NAME_COLUMN:
+            key = lambda name: name
+        else:
+            key = lambda name: (self.summary(name)[column - 1], name)
+        self.names.sort(key=key, reverse=order == Qt.DescendingOrder)
+        rows = {name: row for row, name in enumerate(self.names)}
+        self.changePersistentIndexList(persistent, [self.index(rows[name], index_column) for name, index_column in persistent_names])
+        self.layoutChanged.emit()
+
+class FlavorFilterProxy(QSortFilterProxyModel):
+    '''Filters on the flavor name only (case insensitive), so typing never computes the lazy columns.
+    Sorting is left to FlavorTableModel.sort.'''
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.filter_text = ""
+
+    def set_filter_text(self, text:str):
+        self.filter_text = text.lower()
+        self.invalidateRowsFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        return self.filter_text in self.sourceModel().names[source_row].lower()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.sourceModel().sort(column, order)
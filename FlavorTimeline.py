@@ -0,0 +1,75 @@
+## Timeline of a flavor: what is on screen at second t of the local forecast.
+## Each layer (products, sensors, misc) keeps its start/end times as prefix sums of the item durations, so looking up time t is
+## a binary search. segments() merges every layer's boundaries into a frame schedule (one entry per stretch of time where
+## nothing changes), which is what the preview plays back. The misc layer only ever holds the clock, see FM.update_clock_setting.
+from bisect import bisect_right
+from itertools import accumulate
+import FlavorManagement as FM
+
+LAYERS = ("products", "sensors", "misc")
+
+def item_duration(item:dict):
+    duration = FM.float_or_int(str(item.get("duration")))
+    if duration == None or duration < 0:
+        return 0
+    return duration
+
+class Timeline:
+    def __init__(self, target:dict=None):
+        '''Builds the timeline of the active flavor, or of target if given.'''
+        if target == None: target = FM.flavor
+        self.names = {} # layer -> [item name, ...]
+        self.starts = {} # layer -> [start time of each item]
+        self.ends = {} # layer -> [end time of each item]
+        for layer in LAYERS:
+            order = (target.get(layer) or {}).get("order") or []
+            self.names[layer] = [item.get("name") for item in order]
+            self.ends[layer] = list(accumulate(item_duration(item) for item in order))
+            self.starts[layer] = [0] + self.ends[layer][:-1]
+        self.length = max([ends[-1] for ends in self.ends.values() if ends] + [0])
+        self.build_segments()
+
+    def index_at(self, layer:str, t:float):
+        '''Returns the index of the item of layer that is showing at time t, or None if the layer is empty by then.'''
+        i = bisect_right(self.starts[layer], t) - 1
+        if i < 0 or t >= self.ends[layer][i]:
+            return None
+        return i
+
+    def at(self, t:float):
+        '''Returns {layer: (index, name, start, end) or None} for time t.'''
+        showing = {}
+        for layer in LAYERS:
+            i = self.index_at(layer, t)
+            showing[layer] = None if i == None else (i, self.names[layer][i], self.starts[layer][i], self.ends[layer][i])
+        return showing
+
+    def clock_showing(self, t:float):
+        i = self.index_at("misc", t)
+        return i != None and self.names["misc"][i] == "clock"
+
+    def build_segments(self):
+        '''Works out the frame schedule: sorted segment start times, and for each segment the item index per layer.'''
+        boundaries = {0}
+        for layer in LAYERS:
+            boundaries.update(self.starts[layer])
+            boundaries.update(self.ends[layer])
+        self.segment_starts = sorted(t for t in boundaries if t < self.length)
+        self.segment_items = [tuple(self.index_at(layer, t) for layer in LAYERS) for t in self.segment_starts]
+
+    def segments(self):
+        '''Returns the frame schedule as [(start, end, {layer: index or None}), ...] covering the whole forecast.'''
+        schedule = []
+        for n, start in enumerate(self.segment_starts):
+            end = self.segment_starts[n + 1] if n + 1 < len(self.segment_starts) else self.length
+            schedule.append((start, end, dict(zip(LAYERS, self.segment_items[n]))))
+        return schedule
+
+    def segment_at(self, t:float):
+        '''Returns the number of the segment showing at time t (clamped to the forecast), for cheap "did anything change" checks.'''
+        return max(0, min(bisect_right(self.segment_starts, t) - 1, len(self.segment_starts) - 1))
+
+    def next_change(self, t:float):
+        '''Returns the time the picture changes next after t (the forecast length if nothing changes again).'''
+        n = bisect_right(self.segment_starts, t)
+        return self.segment_starts[n] if n < len(self.segment_starts) else self.length
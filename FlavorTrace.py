@@ -0,0 +1,189 @@
+## Opt-in timing for the editor (python FlavorBuilderGUI.py --trace trace.json), for tracking down "the editor hangs" reports.
+## Tracer.instrument wraps a class's or module's functions in timing spans, nothing is wrapped unless tracing is turned on.
+## StallWatchdog keeps a heartbeat timer on the UI thread and samples that thread's stack from a background thread whenever the
+## heartbeat is late, so a stall is logged along with what the UI thread was busy with.
+## The trace is written in the Chrome trace event format; open it in chrome://tracing or https://ui.perfetto.dev
+import os, sys, json, time, inspect, threading, functools, traceback, logging
+from collections import Counter, deque
+log = logging.getLogger(__name__)
+
+DEFAULT_SLOW_MS = 100 # spans on the UI thread longer than this are logged
+DEFAULT_STALL_MS = 250 # the UI thread counts as stalled once its heartbeat is this late
+HEARTBEAT_MS = 20
+SAMPLE_MS = 50 # how often the watchdog checks the heartbeat (and samples the stack while stalled)
+MAX_EVENTS = 200000 # oldest events are dropped past this, so a long session can't eat all the memory
+STACK_DEPTH = 12 # frames kept per stack sample
+
+class Tracer:
+    def __init__(self, slow_ms:float=DEFAULT_SLOW_MS, max_events:int=MAX_EVENTS):
+        self.slow_ms = slow_ms
+        self.events = deque(maxlen=max_events)
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self.ui_thread = threading.get_ident() # the thread that turned tracing on, i.e. the one running the Qt event loop
+        self.local = threading.local() # open spans per thread
+        self.thread_names = {}
+        self.heartbeats = 0 # counted by StallWatchdog; if it moved during a span, the span ran an event loop (i.e. a dialog)
+        self.instrumented = [] # (owner, name, original function) for restore
+
+    def timestamp(self, t:float):
+        '''perf_counter() seconds -> trace microseconds.'''
+        return round((t - self.origin) * 1000000, 1)
+
+    def thread_id(self, name:str=None):
+        tid = threading.get_native_id()
+        if tid not in self.thread_names:
+            self.thread_names[tid] = name or ("UI" if threading.get_ident() == self.ui_thread else threading.current_thread().name)
+        return tid
+
+    def add_span(self, name:str, start:float, end:float, args:dict=None, tid:int=None):
+        event = {"name": name, "ph": "X", "ts": self.timestamp(start), "dur": round((end - start) * 1000000, 1),
+                 "pid": self.pid, "tid": self.thread_id() if tid == None else tid}
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    def add_instant(self, name:str, t:float, args:dict=None, tid:int=None):
+        event = {"name": name, "ph": "i", "s": "t", "ts": self.timestamp(t), "pid": self.pid, "tid": self.thread_id() if tid == None else tid}
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    def span(self, name:str, function, *args, **kwargs):
+        '''Calls function(*args, **kwargs) inside a span called name and returns what it returns.
+        Slow spans on the UI thread are logged, unless they ran an event loop (modal dialogs) or a slow span inside them already was.'''
+        open_spans = getattr(self.local, "open_spans", None)
+        if open_spans == None:
+            open_spans = self.local.open_spans = []
+        current = {"child_logged": False}
+        open_spans.append(current)
+        heartbeats = self.heartbeats
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            end = time.perf_counter()
+            open_spans.pop()
+            event_loop = self.heartbeats != heartbeats
+            self.add_span(name, start, end, {"event_loop": True} if event_loop else None)
+            elapsed_ms = (end - start) * 1000
+            logged = current["child_logged"]
+            if not logged and not event_loop and elapsed_ms > self.slow_ms and threading.get_ident() == self.ui_thread:
+                log.warning(f"'{name}' blocked the UI thread for {elapsed_ms:.0f} ms")
+                logged = True
+            if logged and open_spans:
+                open_spans[-1]["child_logged"] = True
+
+    def wrap(self, name:str, function):
+        # Qt leaves out the signal arguments a slot has no room for, going by the slot's code object. The wrapper's code takes
+        # *args, so it drops them itself, the way Qt would have for function
+        code = getattr(function, "__code__", None)
+        max_args = code.co_argcount if code != None and not code.co_flags & inspect.CO_VARARGS else None
+        @functools.wraps(function) # keeps the name and signature for logs and inspect
+        def traced(*args, **kwargs):
+            return self.span(name, function, *args[:max_args], **kwargs)
+        return traced
+
+    def instrument(self, owner, names=None):
+        '''Wraps the functions of a class or module in spans. names: Only these (default: everything the class/module defines
+        itself that isn't a dunder). Returns the names that were wrapped. They stay wrapped until restore is called.'''
+        owner_name = getattr(owner, "__name__", str(owner))
+        if names == None:
+            names = [name for name, value in vars(owner).items() if callable(value) and not name.startswith("__")
+                     and (not hasattr(value, "__module__") or value.__module__ == getattr(owner, "__module__", owner_name))]
+        wrapped = []
+        for name in names:
+            function = vars(owner).get(name)
+            if function == None or not callable(function) or hasattr(function, "__wrapped__"):
+                continue
+            setattr(owner, name, self.wrap(f"{owner_name}.{name}", function))
+            self.instrumented.append((owner, name, function))
+            wrapped.append(name)
+        log.debug(f"Tracing {len(wrapped)} function(s) of {owner_name}")
+        return wrapped
+
+    def restore(self):
+        '''Puts back every function instrument wrapped, so another tracer can instrument them. Signals connected in the meantime
+        keep calling the wrapped versions.'''
+        while self.instrumented:
+            owner, name, function = self.instrumented.pop()
+            setattr(owner, name, function)
+
+    def export(self, path:str):
+        '''Writes the trace in the Chrome trace event format. Returns the number of events written.'''
+        events = list(self.events)
+        metadata = [{"name": "process_name", "ph": "M", "pid": self.pid, "args": {"name": "Flavor Builder"}}]
+        metadata += [{"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}} for tid, name in self.thread_names.items()]
+        with open(path, "w") as trace_file:
+            json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, trace_file)
+        return len(events)
+
+def format_frames(frame):
+    '''Returns the innermost STACK_DEPTH frames of frame's stack as "file:line function" strings, innermost last.'''
+    return [f"{os.path.basename(entry.filename)}:{entry.lineno} {entry.name}" for entry in traceback.extract_stack(frame)[-STACK_DEPTH:]]
+
+class StallWatchdog:
+    '''Logs (and traces) every stretch of time the UI thread doesn't get back to the event loop for at least stall_ms.'''
+    def __init__(self, tracer:Tracer, stall_ms:float=DEFAULT_STALL_MS):
+        self.tracer = tracer
+        self.stall_ms = stall_ms
+        self.ui_thread = threading.get_ident()
+        self.last_beat = time.perf_counter()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.timer = None
+        self.stalls = 0
+
+    def beat(self):
+        self.last_beat = time.perf_counter()
+        self.tracer.heartbeats += 1
+
+    def start(self, parent=None):
+        '''Starts the heartbeat (call from the UI thread, after the QApplication exists) and the watchdog thread.'''
+        from PySide6.QtCore import QTimer
+        self.timer = QTimer(parent)
+        self.timer.setInterval(HEARTBEAT_MS)
+        self.timer.timeout.connect(self.beat)
+        self.timer.start()
+        self.beat()
+        self.thread = threading.Thread(target=self.run, name="StallWatchdog", daemon=True)
+        self.thread.start()
+        log.info(f"Stall watchdog running, UI stalls over {self.stall_ms:g} ms are logged")
+
+    def stop(self):
+        self.stop_event.set()
+        if self.timer != None:
+            self.timer.stop()
+        if self.thread != None:
+            self.thread.join(timeout=1)
+
+    def run(self):
+        tid = self.tracer.thread_id("Stall watchdog")
+        stall_start = None
+        samples = []
+        while not self.stop_event.wait(SAMPLE_MS / 1000):
+            now = time.perf_counter()
+            last_beat = self.last_beat
+            if (now - last_beat) * 1000 > self.stall_ms:
+                if stall_start == None:
+                    stall_start = last_beat
+                    samples = []
+                frame = sys._current_frames().get(self.ui_thread)
+                if frame == None:
+                    continue
+                stack = format_frames(frame)
+                del frame
+                samples.append(stack)
+                self.tracer.add_instant("stack sample", now, {"stack": stack}, tid=tid)
+                if len(samples) == 1:
+                    log.warning(f"UI thread has been stalled for {(now - last_beat) * 1000:.0f} ms, it's in:\n  " + "\n  ".join(reversed(stack)))
+            elif stall_start != None:
+                self.stall_ended(stall_start, last_beat, samples, tid)
+                stall_start = None
+
+    def stall_ended(self, start:float, end:float, samples:list, tid:int):
+        self.stalls += 1
+        hottest = Counter(stack[-1] for stack in samples if stack).most_common(3)
+        summary = ", ".join(f"{frame} ({count}/{len(samples)})" for frame, count in hottest)
+        self.tracer.add_span("UI stall", start, end, {"samples": len(samples), "hottest": summary}, tid=tid)
+        log.warning(f"UI thread was stalled for {(end - start) * 1000:.0f} ms. Most sampled: {summary or 'no samples'}")
@@ -0,0 +1,69 @@
+## Keeps track of what was last exported to each unit, so batch exports can skip flavors/layers that haven't changed.
+## Layer versions come from FM.layer_version (a hash of the layer's DIF keys), so the same content always gets the same version.
+import os, json, time, logging
+import FlavorManagement as FM
+log = logging.getLogger(__name__)
+
+DEFAULT_MANIFEST_PATH = os.path.join("exported", "manifest.json")
+
+def section_hashes(target:dict):
+    '''Returns {section: version} for every DIF section of the flavor (see FM.DIF_SECTIONS).'''
+    entries = FM.dif_entries(target)
+    return {section: FM.layer_version(entries[section]) for section in FM.DIF_SECTIONS}
+
+def changed_sections(previous:dict | None, hashes:dict):
+    '''Compares a flavor's manifest entry against its current section hashes. Returns the sections that need exporting.'''
+    if not previous:
+        return list(FM.DIF_SECTIONS)
+    return [section for section in FM.DIF_SECTIONS if previous.get(section) != hashes.get(section)]
+
+class VersionManifest:
+    '''Manifest layout: {"units": {unit: {flavor name: {section: version, ..., "exported": unix time}}}}'''
+    def __init__(self, path:str=DEFAULT_MANIFEST_PATH):
+        self.path = path
+        self.data = {"units": {}}
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as manifest_file:
+                    self.data = json.load(manifest_file)
+                self.data.setdefault("units", {})
+            except Exception as e:
+                log.error(f"Could not read version manifest '{path}', everything will be exported:\n{e}", exc_info=False)
+
+    def unit(self, unit:str):
+        '''Returns the {flavor name: entry} dict for a unit.'''
+        return self.data["units"].get(unit, {})
+
+    def get(self, unit:str, flavor_name:str):
+        return self.unit(unit).get(flavor_name)
+
+    def mark_exported(self, unit:str, flavor_name:str, hashes:dict):
+        entry = dict(hashes)
+        entry["exported"] = int(time.time())
+        self.data["units"].setdefault(unit, {})[flavor_name] = entry
+
+    def forget(self, unit:str, flavor_name:str | None=None):
+        '''Drops a flavor (or a whole unit) so it gets fully exported next time, i.e. after the unit's database was rebuilt.'''
+        if flavor_name == None:
+            self.data["units"].pop(unit, None)
+        else:
+            self.unit(unit).pop(flavor_name, None)
+
+    def save(self):
+        folder = os.path.dirname(self.path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as manifest_file:
+            json.dump(self.data, manifest_file, indent=4)
+        os.replace(tmp_path, self.path)
+        log.debug(f"Saved version manifest to '{self.path}'")
+
+def build_incremental_dif(target:dict, previous:dict | None):
+    '''Builds the DIF TXT containing only the sections that changed since previous (a manifest entry).
+    Returns (dif, hashes, sections). dif is empty if nothing changed.'''
+    hashes = section_hashes(target)
+    sections = changed_sections(previous, hashes)
+    if len(sections) == 0:
+        return "", hashes, sections
+    return FM.build_dif_txt(target, sections=sections), hashes, sections
@@ -0,0 +1,212 @@
+## Watch-folder mode: keeps per-unit flavor JSONs up to date from the DIF dumps dropped into a folder.
+## The folder is checked with a stat scan (woken early by inotify if the optional inotify_simple package is installed). A dump is
+## only processed once its size and mtime have stayed the same for a while, so half-copied files are left alone, and only dumps
+## that are new or changed since the last run are parsed. Each unit's flavors are written to <out>/<unit>/<flavor>.json.
+## Two dumps for the same unit (KXYZ.dat and KXYZ.txt) are both left alone until one of them is removed, and flavor names that
+## would land outside the unit's folder are skipped.
+## Usage: python FlavorWatch.py <drop folder> [--out flavor-data/units] [--interval 10] [--settle 5] [--once]
+import os, sys, json, time, argparse, logging, coloredlogs
+import FlavorManagement as FM
+log = logging.getLogger(__name__)
+
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
+DUMP_EXTENSIONS = (".dat", ".txt")
+DEFAULT_OUT = os.path.join("flavor-data", "units")
+STATE_FILE_NAME = ".watch_state.json"
+
+def write_json_atomic(path:str, data):
+    '''Writes JSON to a temp file next to path and renames it into place, so readers never see half a file.'''
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as out_f:
+        json.dump(data, out_f, indent=4)
+        out_f.flush()
+        os.fsync(out_f.fileno())
+    os.replace(tmp_path, path)
+
+def scan(folder:str):
+    '''Returns {file name: (size, mtime_ns)} for every dump in the folder. Stats only, nothing is opened.'''
+    found = {}
+    try:
+        entries = list(os.scandir(folder))
+    except OSError as e:
+        log.error(f"Can't scan drop folder '{folder}': {e}")
+        return found
+    for entry in entries:
+        if entry.is_file() and entry.name.lower().endswith(DUMP_EXTENSIONS):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue # removed while scanning
+            found[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    return found
+
+def dump_unit(name:str):
+    '''The unit a dump is for, its file name without the extension.'''
+    return os.path.splitext(name)[0]
+
+def safe_file_name(name:str):
+    '''True if name can be used as a file name inside the output folder without reaching outside it.'''
+    return name not in ("", ".") and ".." not in name and not any(sep in name for sep in ("/", "\\", os.sep, "\0"))
+
+class FlavorWatcher:
+    def __init__(self, folder:str, out_dir:str=DEFAULT_OUT, settle:float=5.0):
+        self.folder = folder
+        self.out_dir = out_dir
+        self.settle = settle
+        self.state_path = os.path.join(out_dir, STATE_FILE_NAME)
+        self.state = self.load_state() # file name -> {"size", "mtime_ns", "unit", "flavors"}
+        self.pending = {} # file name -> ((size, mtime_ns), monotonic time it was first seen like that)
+        self.collisions = set() # units with more than one dump in the folder, already logged
+
+    def load_state(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, "r") as state_file:
+                return json.load(state_file)
+        except Exception as e:
+            log.warning(f"Watch state '{self.state_path}' is unreadable, every dump will be processed again:\n{e}")
+            return {}
+
+    def poll(self, now:float | None=None):
+        '''Runs one scan and processes every dump that is new/changed and has settled. Returns the number processed.'''
+        if now == None: now = time.monotonic()
+        found = scan(self.folder)
+        units = {}
+        for name in found:
+            units.setdefault(dump_unit(name), []).append(name)
+        collisions = {unit for unit, names in units.items() if len(names) > 1}
+        for unit in sorted(collisions - self.collisions):
+            log.error(f"Unit '{unit}' has more than one dump ({', '.join(sorted(units[unit]))}), none of them is processed until only one is left")
+        self.collisions = collisions
+        processed = 0
+        for name, signature in sorted(found.items()):
+            if dump_unit(name) in collisions:
+                self.pending.pop(name, None)
+                continue
+            known = self.state.get(name)
+            if known != None and (known["size"], known["mtime_ns"]) == signature:
+                self.pending.pop(name, None)
+                continue
+            seen = self.pending.get(name)
+            if seen == None or seen[0] != signature:
+                self.pending[name] = (signature, now) # new, or still being written
+                log.debug(f"Waiting for '{name}' to settle")
+                continue
+            if now - seen[1] < self.settle:
+                continue
+            del self.pending[name]
+            try:
+                self.process(name, signature)
+            except Exception as e:
+                log.error(f"Couldn't process '{name}', it'll be retried when it changes:\n{e}", exc_info=False)
+                self.state[name] = {"size": signature[0], "mtime_ns": signature[1], "unit": dump_unit(name), "flavors": self.state.get(name, {}).get("flavors", [])}
+            processed += 1
+        for name in [name for name in self.pending if name not in found]:
+            del self.pending[name]
+        if processed > 0:
+            write_json_atomic(self.state_path, self.state)
+        return processed
+
+    def process(self, name:str, signature:tuple):
+        '''Parses one dump and writes its unit's flavor JSONs. Removes JSONs this watcher wrote earlier for flavors that are gone.'''
+        import DIFDecode
+        import FlavorExtractor as FE
+        path = os.path.join(self.folder, name)
+        unit = dump_unit(name)
+        if not safe_file_name(unit):
+            raise ValueError(f"'{unit}' can't be used as a unit folder name")
+        started = time.perf_counter()
+        database = DIFDecode.parse(path)
+        flavors = FE.extract_flavors(database)
+        previous = self.state.get(name, {}).get("flavors", [])
+        record = {"size": signature[0], "mtime_ns": signature[1], "unit": unit, "flavors": previous}
+        self.state[name] = record
+        if not database:
+            log.error(f"No database keys found in '{path}', keeping the flavors from the last good dump")
+            return
+        unit_dir = os.path.join(self.out_dir, unit)
+        if not os.path.exists(unit_dir):
+            os.makedirs(unit_dir)
+        for flavor_name in [flavor_name for flavor_name in flavors if not safe_file_name(flavor_name)]:
+            log.warning(f"Flavor '{flavor_name}' in '{name}' can't be written to a file of its own, skipped")
+            del flavors[flavor_name]
+        written = 0
+        for flavor_name, target in sorted(flavors.items()):
+            FM.get_total_products(target) # fills in the count/duration fields the editor's JSONs have
+            target.setdefault("init", False)
+            flavor_path = os.path.join(unit_dir, f"{flavor_name}.json")
+            if os.path.exists(flavor_path):
+                try:
+                    with open(flavor_path, "r") as flavor_file:
+                        if json.load(flavor_file) == target:
+                            continue # unchanged, leave the file (and its mtime) alone
+                except Exception:
+                    pass # unreadable, rewrite it
+            write_json_atomic(flavor_path, target)
+            written += 1
+        for flavor_name in previous:
+            if flavor_name not in flavors and safe_file_name(flavor_name):
+                try:
+                    os.remove(os.path.join(unit_dir, f"{flavor_name}.json"))
+                    log.info(f"Flavor '{flavor_name}' is gone from unit '{unit}', removed its JSON")
+                except FileNotFoundError:
+                    pass
+        record["flavors"] = sorted(flavors)
+        log.info(f"Processed '{name}': {len(flavors)} flavor(s), {written} updated, in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    def run(self, interval:float=10.0):
+        '''Polls forever. With inotify, changes in the folder wake the loop early.'''
+        notify = None
+        if inotify_simple != None:
+            try:
+                notify = inotify_simple.INotify()
+                flags = inotify_simple.flags
+                notify.add_watch(self.folder, flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE | flags.MODIFY)
+                log.info(f"Watching '{self.folder}' with inotify")
+            except OSError as e:
+                log.warning(f"inotify isn't available, polling instead: {e}")
+                notify = None
+        else:
+            log.info(f"Polling '{self.folder}' every {interval} seconds")
+        while True:
+            self.poll()
+            # Dumps waiting to settle are re-checked as soon as they could be ready
+            wait = min(interval, self.settle) if self.pending else interval
+            if notify != None:
+                notify.read(timeout=int(wait * 1000))
+            else:
+                time.sleep(wait)
+
+def main(argv=None):
+    coloredlogs.install("INFO")
+    parser = argparse.ArgumentParser(description="Keep per-unit flavor JSONs up to date from DIF dumps dropped into a folder.")
+    parser.add_argument("folder", help="Drop folder the unit DIF dumps (.dat/.txt) land in")
+    parser.add_argument("--out", default=DEFAULT_OUT, help=f"Where the per-unit flavor folders are written (default: {DEFAULT_OUT})")
+    parser.add_argument("--interval", type=float, default=10.0, help="Seconds between scans")
+    parser.add_argument("--settle", type=float, default=5.0, help="Seconds a dump has to stay unchanged before it's processed")
+    parser.add_argument("--once", action="store_true", help="Scan, wait --settle seconds, process what's ready and exit (for cron)")
+    args = parser.parse_args(argv)
+    if not os.path.isdir(args.folder):
+        log.error(f"Drop folder '{args.folder}' doesn't exist")
+        return 1
+    if not os.path.exists(args.out):
+        os.makedirs(args.out)
+    watcher = FlavorWatcher(args.folder, args.out, settle=args.settle)
+    if args.once:
+        watcher.poll() # the first scan only records what's there
+        time.sleep(args.settle)
+        watcher.poll()
+        return 0
+    try:
+        watcher.run(args.interval)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
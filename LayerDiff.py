@@ -0,0 +1,93 @@
+## Works out the smallest set of edits that turns one layer order into another, so the GUI can update only the tiles that
+## actually changed (instead of rebuilding the whole product/sensor strip after every edit).
+from difflib import SequenceMatcher
+
+def diff_orders(old:list, new:list):
+    '''Compares two layer orders (lists of item names) and returns a list of operations that turn old into new when applied
+    one after another to a list:
+        ("remove", index)          - remove the item at index
+        ("move", from, to)         - pop the item at from, then insert it at to
+        ("insert", index, name)    - insert a new item at index
+        ("retitle", index, name)   - the item at index now shows a different name
+    Items that don't change aren't mentioned at all, a renumbered item is a single move, and an edited item is a retitle.'''
+    matcher = SequenceMatcher(None, old, new, autojunk=False)
+    new_source = [None] * len(new) # new index -> old index it reuses (None means a new item)
+    stable = set() # old indices that keep their relative order and don't need to move
+    unmatched_old = []
+    unmatched_new = []
+    replace_blocks = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            for k in range(i2 - i1):
+                new_source[j1 + k] = i1 + k
+                stable.add(i1 + k)
+        else:
+            unmatched_old += range(i1, i2)
+            unmatched_new += range(j1, j2)
+            if tag == "replace":
+                replace_blocks.append((i1, i2, j1, j2))
+
+    # Items that only changed position are moved rather than rebuilt
+    free_old = {}
+    for i in unmatched_old:
+        free_old.setdefault(old[i], []).append(i)
+    for j in unmatched_new:
+        candidates = free_old.get(new[j])
+        if candidates:
+            new_source[j] = candidates.pop(0)
+    used = set(i for i in new_source if i != None)
+
+    # Whatever is left in a replaced block is edited in place
+    for i1, i2, j1, j2 in replace_blocks:
+        olds = [i for i in range(i1, i2) if i not in used]
+        news = [j for j in range(j1, j2) if new_source[j] == None]
+        for i, j in zip(olds, news):
+            new_source[j] = i
+            stable.add(i)
+            used.add(i)
+
+    ops = []
+    working = [i for i in range(len(old))] # tokens: old index (int) or ("new", j)
+    for i in reversed(range(len(old))):
+        if i not in used:
+            ops.append(("remove", i))
+            working.pop(i)
+
+    # Place everything that isn't stable right after its predecessor in the new order, in ascending order. Everything placed so
+    # far (plus the stable items) is already in the right relative order, so each item only has to be handled once.
+    token_of = lambda j: new_source[j] if new_source[j] != None else ("new", j)
+    for j in range(len(new)):
+        source = new_source[j]
+        if source != None and source in stable:
+            continue
+        target = 0 if j == 0 else working.index(token_of(j - 1)) + 1
+        if source == None:
+            working.insert(target, ("new", j))
+            ops.append(("insert", target, new[j]))
+        else:
+            position = working.index(source)
+            if position < target:
+                target -= 1 # the predecessor shifts down once the item is taken out
+            if position != target:
+                working.insert(target, working.pop(position))
+                ops.append(("move", position, target))
+
+    for j in range(len(new)):
+        source = new_source[j]
+        if source != None and old[source] != new[j]:
+            ops.append(("retitle", j, new[j]))
+    return ops
+
+def apply_ops(items:list, ops:list):
+    '''Applies diff_orders operations to a copy of items and returns it. Handy for checking a diff.'''
+    items = list(items)
+    for op in ops:
+        if op[0] == "remove":
+            items.pop(op[1])
+        elif op[0] == "move":
+            items.insert(op[2], items.pop(op[1]))
+        elif op[0] == "insert":
+            items.insert(op[1], op[2])
+        elif op[0] == "retitle":
+            items[op[1]] = op[2]
+    return items
@@ -0,0 +1,190 @@
+## Model/view product and sensor strips.
+## LayerModel mirrors one layer order of FM.flavor and reports changes as fine-grained row signals (using LayerDiff), and
+## LayerStripView is a horizontal QListView that only paints the tiles that are on screen. Tiles can be dragged to reorder them.
+import logging
+from PySide6.QtWidgets import QListView, QStyledItemDelegate, QStyle, QAbstractItemView, QStyleOptionButton
+from PySide6.QtGui import QIcon, QPalette
+from PySide6.QtCore import QAbstractListModel, QModelIndex, QRect, QSize, Qt, Signal
+import FlavorManagement as FM
+import ThumbnailCache
+import LayerDiff
+log = logging.getLogger(__name__)
+
+# kind: (FM layer key, tile size, icon size)
+STRIP_KINDS = {
+    "product": ("products", QSize(110, 110), QSize(100, 100)),
+    "sensor": ("sensors", QSize(110, 50), QSize(100, 50)),
+}
+DurationRole = Qt.UserRole + 1
+ThumbnailPendingRole = Qt.UserRole + 2 # True while the tile's thumbnail is still decoding, the delegate draws a placeholder
+
+class LayerModel(QAbstractListModel):
+    moved = Signal(int, int) # emitted after a tile was dragged to a new position (from, to)
+
+    def __init__(self, kind:str, parent=None):
+        super().__init__(parent)
+        self.kind = kind
+        self.prod_type = STRIP_KINDS[kind][0]
+        self.items = [] # [name, duration] per row, in flavor order
+        self.thumbnails = ThumbnailCache.get_cache()
+        self.thumbnails.loaded.connect(self.thumbnail_loaded)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.items)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.items):
+            return None
+        name, duration = self.items[index.row()]
+        if role == Qt.DisplayRole:
+            return name
+        if role == Qt.DecorationRole:
+            return self.thumbnails.icon(self.kind, name) # only asked for rows that are actually painted
+        if role == Qt.ToolTipRole:
+            return f"{name} ({duration} seconds)"
+        if role == DurationRole:
+            return duration
+        if role == ThumbnailPendingRole:
+            return self.thumbnails.pending(self.kind, name)
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemIsDropEnabled
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsDragEnabled
+
+    def supportedDragActions(self):
+        return Qt.MoveAction | Qt.CopyAction
+
+    def supportedDropActions(self):
+        return Qt.MoveAction | Qt.CopyAction
+
+    def sync(self, order:list):
+        '''Brings the model in line with a layer order from FM, emitting only the row changes that are needed.'''
+        ops = LayerDiff.diff_orders([item[0] for item in self.items], [item.get("name") for item in order])
+        for op in ops:
+            if op[0] == "remove":
+                self.beginRemoveRows(QModelIndex(), op[1], op[1])
+                self.items.pop(op[1])
+                self.endRemoveRows()
+            elif op[0] == "move":
+                source, target = op[1], op[2]
+                # beginMoveRows wants the row the item ends up in front of, in the list before the move
+                self.beginMoveRows(QModelIndex(), source, source, QModelIndex(), target + 1 if target > source else target)
+                self.items.insert(target, self.items.pop(source))
+                self.endMoveRows()
+            elif op[0] == "insert":
+                self.beginInsertRows(QModelIndex(), op[1], op[1])
+                self.items.insert(op[1], [op[2], None]) # the duration is filled in below, once every row is in its final place
+                self.endInsertRows()
+            elif op[0] == "retitle":
+                self.items[op[1]][0] = op[2]
+                index = self.index(op[1])
+                self.dataChanged.emit(index, index)
+        for row, item in enumerate(order):
+            if self.items[row][1] != item.get("duration"):
+                self.items[row][1] = item.get("duration")
+                index = self.index(row)
+                self.dataChanged.emit(index, index, [Qt.ToolTipRole, DurationRole])
+        if ops:
+            log.debug(f"Updated {self.kind} strip: {len(ops)} change(s)")
+
+    def thumbnail_loaded(self, kind:str, name:str):
+        '''Swaps the placeholder for the thumbnail in every tile showing name.'''
+        if kind != self.kind:
+            return
+        for row, item in enumerate(self.items):
+            if item[0] == name:
+                index = self.index(row)
+                self.dataChanged.emit(index, index, [Qt.DecorationRole, ThumbnailPendingRole])
+
+    def thumbnails_changed(self):
+        if self.items:
+            self.dataChanged.emit(self.index(0), self.index(len(self.items) - 1), [Qt.DecorationRole])
+
+    def moveRows(self, source_parent, source_row, count, destination_parent, destination_child):
+        '''Qt's row move API (destination_child is the row to move in front of). Reorders the flavor through FM.renumber.'''
+        if count != 1 or source_parent.isValid() or destination_parent.isValid():
+            return False
+        target = destination_child - 1 if destination_child > source_row else destination_child
+        target = max(0, min(target, len(self.items) - 1))
+        if target == source_row:
+            return False
+        if FM.renumber(index=source_row, new_index=target, prod_type=self.prod_type) != "OK":
+            return False
+        self.beginMoveRows(QModelIndex(), source_row, source_row, QModelIndex(), target + 1 if target > source_row else target)
+        self.items.insert(target, self.items.pop(source_row))
+        self.endMoveRows()
+        self.moved.emit(source_row, target)
+        return True
+
+class TileDelegate(QStyledItemDelegate):
+    '''Paints a tile like the old QToolButtons: thumbnail on top, name underneath.'''
+    def __init__(self, kind:str, parent=None):
+        super().__init__(parent)
+        self.tile_size = STRIP_KINDS[kind][1]
+
+    def sizeHint(self, option, index):
+        return self.tile_size
+
+    def paint(self, painter, option, index):
+        painter.save()
+        button = QStyleOptionButton()
+        button.rect = option.rect.adjusted(2, 2, -2, -2)
+        button.state = option.state | QStyle.State_Raised
+        if option.state & QStyle.State_Selected:
+            button.state |= QStyle.State_Sunken
+        style = option.widget.style() if option.widget else QStyle()
+        style.drawPrimitive(QStyle.PE_PanelButtonTool, button, painter, option.widget)
+        text_height = option.fontMetrics.height()
+        icon = index.data(Qt.DecorationRole)
+        icon_rect = QRect(option.rect.x(), option.rect.y() + 2, option.rect.width(), option.rect.height() - text_height - 4)
+        if isinstance(icon, QIcon) and not icon.isNull():
+            icon.paint(painter, icon_rect, Qt.AlignCenter)
+        elif index.data(ThumbnailPendingRole):
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(option.palette.midlight())
+            painter.drawRoundedRect(icon_rect.adjusted(6, 4, -6, -2), 4, 4)
+            painter.setPen(option.palette.color(QPalette.Text))
+        text_rect = QRect(option.rect.x(), option.rect.bottom() - text_height - 1, option.rect.width(), text_height)
+        painter.drawText(text_rect, Qt.AlignHCenter | Qt.AlignVCenter, str(index.data(Qt.DisplayRole)))
+        painter.restore()
+
+class LayerStripView(QListView):
+    def __init__(self, kind:str, model:LayerModel, parent=None):
+        super().__init__(parent)
+        self.setModel(model)
+        self.setItemDelegate(TileDelegate(kind, self))
+        self.setViewMode(QListView.ListMode)
+        self.setFlow(QListView.LeftToRight)
+        self.setWrapping(False)
+        self.setUniformItemSizes(True) # lets the view lay out thousands of rows without asking each one for its size
+        self.setSpacing(4)
+        self.setHorizontalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.setDragDropMode(QAbstractItemView.InternalMove)
+        self.setDefaultDropAction(Qt.MoveAction)
+        self.setDropIndicatorShown(True)
+        self.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.setFixedHeight(STRIP_KINDS[kind][1].height() + self.horizontalScrollBar().sizeHint().height() + 12)
+
+    def drop_row(self, pos):
+        '''Returns the row a drop at pos should land in front of.'''
+        index = self.indexAt(pos)
+        if not index.isValid():
+            return self.model().rowCount()
+        rect = self.visualRect(index)
+        return index.row() + 1 if pos.x() > rect.center().x() else index.row()
+
+    def dropEvent(self, event):
+        if event.source() != self or len(self.selectedIndexes()) != 1:
+            event.ignore()
+            return
+        source_row = self.selectedIndexes()[0].row()
+        self.model().moveRows(QModelIndex(), source_row, 1, QModelIndex(), self.drop_row(event.position().toPoint()))
+        # The model already moved the row. Reporting a copy stops the view from also removing the source row after the drag.
+        event.setDropAction(Qt.CopyAction)
+        event.accept()
@@ -0,0 +1,129 @@
+## Pre-built thumbnail atlas: every product-data/*/thumb.jpg and sensor-data/*/thumb.png, already scaled to the tile size and
+## packed into one PNG with a JSON index of name -> rect. Loading it at startup is one file read and one decode instead of a
+## directory probe and a full-size decode per thumbnail. The index remembers a stat signature of the source folders, so a stale
+## atlas is noticed (and rebuilt) automatically.
+## Usage: python ThumbnailAtlas.py  (rebuilds app/thumb_atlas.png + app/thumb_atlas.json)
+import os, sys, json, logging, coloredlogs
+from PySide6.QtGui import QImage, QImageReader, QPainter
+from PySide6.QtCore import QRect, QSize, Qt
+log = logging.getLogger(__name__)
+
+# kind: (folder, thumbnail file name, tile icon size)
+THUMB_SOURCES = {
+    "product": ("product-data", "thumb.jpg", QSize(100, 100)),
+    "sensor": ("sensor-data", "thumb.png", QSize(100, 50)),
+}
+
+def thumb_path(kind:str, name:str):
+    folder, file_name, _ = THUMB_SOURCES[kind]
+    return os.path.join(folder, name, file_name)
+
+def decode_image(kind:str, name:str):
+    '''Reads a thumbnail from disk, scaled to the tile size while decoding. Returns a QImage (null if there's no thumbnail).
+    Only uses QImage, so it's safe to call from a worker thread.'''
+    path = thumb_path(kind, name)
+    if not os.path.exists(path):
+        return QImage()
+    reader = QImageReader(path)
+    size = reader.size()
+    if size.isValid():
+        reader.setScaledSize(size.scaled(THUMB_SOURCES[kind][2], Qt.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        log.warning(f"Couldn't decode thumbnail '{path}': {reader.errorString()}")
+    return image
+
+ATLAS_IMAGE_PATH = os.path.join("app", "thumb_atlas.png")
+ATLAS_INDEX_PATH = os.path.join("app", "thumb_atlas.json")
+ATLAS_COLUMNS = 16
+
+def source_signature():
+    '''Returns {"product/<name>": [mtime_ns, size], ...} for every thumbnail on disk. Stats only, nothing is opened.'''
+    signature = {}
+    for kind, (folder, file_name, _) in THUMB_SOURCES.items():
+        if not os.path.isdir(folder):
+            continue
+        for entry in os.scandir(folder):
+            if not entry.is_dir():
+                continue
+            try:
+                stat = os.stat(os.path.join(entry.path, file_name))
+            except OSError:
+                continue
+            signature[f"{kind}/{entry.name}"] = [stat.st_mtime_ns, stat.st_size]
+    return signature
+
+def build_atlas(image_path:str=ATLAS_IMAGE_PATH, index_path:str=ATLAS_INDEX_PATH, signature:dict | None=None):
+    '''Decodes and packs every thumbnail into the atlas. Only uses QImage/QPainter on an image, so it can run off the GUI thread.
+    Returns the number of thumbnails packed.'''
+    if signature == None:
+        signature = source_signature()
+    thumbs = []
+    for key in sorted(signature):
+        kind, name = key.split("/", 1)
+        image = decode_image(kind, name)
+        if not image.isNull():
+            thumbs.append((key, kind, image))
+    # Products and sensors get their own rows, each row is as tall as its tile icon size
+    entries = {}
+    placements = []
+    y = 0
+    width = 0
+    for kind, (_, _, cell) in THUMB_SOURCES.items():
+        kind_thumbs = [thumb for thumb in thumbs if thumb[1] == kind]
+        for i, (key, _, image) in enumerate(kind_thumbs):
+            x = (i % ATLAS_COLUMNS) * cell.width()
+            row_y = y + (i // ATLAS_COLUMNS) * cell.height()
+            placements.append((x, row_y, image))
+            entries[key] = [x, row_y, image.width(), image.height()]
+            width = max(width, x + cell.width())
+        rows = (len(kind_thumbs) + ATLAS_COLUMNS - 1) // ATLAS_COLUMNS
+        y += rows * cell.height()
+    atlas = QImage(max(width, 1), max(y, 1), QImage.Format_ARGB32_Premultiplied)
+    atlas.fill(Qt.transparent)
+    painter = QPainter(atlas)
+    for x, row_y, image in placements:
+        painter.drawImage(x, row_y, image)
+    painter.end()
+
+    folder = os.path.dirname(image_path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+    tmp_image_path = image_path + ".tmp.png" # keeps the extension so Qt knows to write a PNG
+    if not atlas.save(tmp_image_path, "PNG"):
+        log.error(f"Couldn't write thumbnail atlas to '{image_path}'")
+        return 0
+    os.replace(tmp_image_path, image_path)
+    tmp_index_path = index_path + ".tmp"
+    with open(tmp_index_path, "w") as index_file:
+        json.dump({"signature": signature, "entries": entries}, index_file, separators=(",", ":"))
+    os.replace(tmp_index_path, index_path)
+    log.info(f"Built thumbnail atlas with {len(entries)} thumbnail(s): '{image_path}'")
+    return len(entries)
+
+def load_atlas(image_path:str=ATLAS_IMAGE_PATH, index_path:str=ATLAS_INDEX_PATH):
+    '''Reads the atlas without checking it against the source folders. Returns (QImage, entries, signature) or None.'''
+    if not (os.path.exists(image_path) and os.path.exists(index_path)):
+        return None
+    try:
+        with open(index_path, "r") as index_file:
+            index = json.load(index_file)
+    except Exception as e:
+        log.warning(f"Thumbnail atlas index is unreadable, ignoring the atlas:\n{e}")
+        return None
+    image = QImage(image_path)
+    if image.isNull():
+        log.warning(f"Thumbnail atlas image is unreadable, ignoring the atlas")
+        return None
+    entries = {key: QRect(*rect) for key, rect in index.get("entries", {}).items()}
+    return image, entries, index.get("signature", {})
+
+def is_stale(signature:dict):
+    return signature != source_signature()
+
+def main():
+    coloredlogs.install("INFO")
+    return 0 if build_atlas() > 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
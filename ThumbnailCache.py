@@ -0,0 +1,220 @@
+## Shared cache of decoded product/sensor thumbnails for the GUI tiles.
+## Each thumbnail is decoded once, already scaled to the tile size, and kept in an LRU. Names without a thumbnail are kept in a
+## negative cache so they aren't probed again. A QFileSystemWatcher drops entries when the thumbnail folders change, so
+## refreshing the tiles doesn't touch the filesystem at all once everything has been seen.
+## Decoding happens on a QThreadPool: icon() returns None straight away for a thumbnail that isn't loaded yet (pending() tells
+## the tile to draw a placeholder), and loaded is emitted once the image is ready.
+## Thumbnails found in the pre-built atlas (see ThumbnailAtlas.py) are cut straight out of it. The atlas is checked against the
+## source folders in the background at startup and rebuilt if it's stale or missing.
+import os, logging
+from collections import OrderedDict
+from PySide6.QtGui import QIcon, QImage, QPixmap
+from PySide6.QtCore import QObject, QFileSystemWatcher, QRunnable, QThreadPool, Signal
+import ThumbnailAtlas
+from ThumbnailAtlas import THUMB_SOURCES, thumb_path, decode_image
+log = logging.getLogger(__name__)
+
+MAX_ENTRIES = 256 # comfortably more than 99 products + every sensor, so a refresh never evicts its own tiles
+
+class _Notifier(QObject):
+    # Lives in the GUI thread, so emitting from a worker is delivered there as a queued signal
+    done = Signal(str, str, int, QImage, bool) # kind, name, generation, image, item folder exists
+    atlas_checked = Signal(bool) # True if the atlas was rebuilt
+
+class _DecodeJob(QRunnable):
+    def __init__(self, notifier:_Notifier, kind:str, name:str, generation:int):
+        super().__init__()
+        self.notifier = notifier
+        self.kind = kind
+        self.name = name
+        self.generation = generation
+
+    def run(self):
+        image = decode_image(self.kind, self.name)
+        folder_exists = os.path.isdir(os.path.join(THUMB_SOURCES[self.kind][0], self.name))
+        self.notifier.done.emit(self.kind, self.name, self.generation, image, folder_exists)
+
+class _AtlasCheckJob(QRunnable):
+    def __init__(self, notifier:_Notifier, signature:dict):
+        super().__init__()
+        self.notifier = notifier
+        self.signature = signature
+
+    def run(self):
+        signature = ThumbnailAtlas.source_signature()
+        rebuilt = False
+        if signature != self.signature:
+            log.info("Thumbnail atlas is out of date, rebuilding it")
+            rebuilt = ThumbnailAtlas.build_atlas(signature=signature) > 0
+        self.notifier.atlas_checked.emit(rebuilt)
+
+class ThumbnailCache(QObject):
+    changed = Signal(str) # emitted with the kind ("product"/"sensor") when thumbnails on disk changed
+    loaded = Signal(str, str) # emitted with (kind, name) when a thumbnail finished decoding in the background
+
+    def __init__(self, max_entries:int=MAX_ENTRIES, parent=None):
+        super().__init__(parent)
+        self.max_entries = max_entries
+        self.icons = OrderedDict() # (kind, name) -> QIcon, least recently used first
+        self.missing = set() # (kind, name) known to have no thumbnail
+        self.loading = {} # (kind, name) -> generation of the decode in flight
+        self.generation = 0 # bumped on invalidation so stale decodes are thrown away
+        self.static_icons = {} # path -> QIcon for app icons (add buttons)
+        self.pool = QThreadPool(self)
+        self.notifier = _Notifier(self)
+        self.notifier.done.connect(self.decoded)
+        self.notifier.atlas_checked.connect(self.atlas_checked)
+        self.atlas = None # QPixmap of the pre-built atlas
+        self.atlas_entries = {} # "kind/name" -> QRect in the atlas
+        self.atlas_signature = {}
+        self.atlas_checking = False
+        self.atlas_recheck = False # folders changed while a check was running
+        self.load_atlas()
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.path_changed)
+        self.watcher.fileChanged.connect(self.path_changed)
+        for kind, (folder, _, _) in THUMB_SOURCES.items():
+            if os.path.isdir(folder):
+                self.watcher.addPath(folder)
+        self.check_atlas()
+
+    def icon(self, kind:str, name:str, wait:bool=False):
+        '''Returns the QIcon for a product/sensor thumbnail, or None if it has no thumbnail or is still loading.
+        wait: Decode on the calling thread instead of in the background if the thumbnail isn't cached yet.'''
+        key = (kind, name)
+        icon = self.icons.get(key)
+        if icon != None:
+            self.icons.move_to_end(key)
+            return icon
+        if key in self.missing:
+            return None
+        rect = self.atlas_entries.get(f"{kind}/{name}")
+        if rect != None:
+            # Watched like a decoded thumbnail, so editing it drops the atlas entry and rebuilds the atlas
+            self.watch(kind, name, os.path.isdir(os.path.join(THUMB_SOURCES[kind][0], name)), os.path.exists(thumb_path(kind, name)))
+            return self.remember(key, QIcon(self.atlas.copy(rect)))
+        if wait:
+            self.loading.pop(key, None)
+            image = decode_image(kind, name)
+            return self.store(kind, name, image, os.path.isdir(os.path.join(THUMB_SOURCES[kind][0], name)))
+        if key not in self.loading:
+            self.loading[key] = self.generation
+            self.pool.start(_DecodeJob(self.notifier, kind, name, self.generation))
+        return None
+
+    def pending(self, kind:str, name:str):
+        '''True while a thumbnail is being decoded in the background.'''
+        return (kind, name) in self.loading
+
+    def wait_for_pending(self, timeout_ms:int=-1):
+        '''Blocks until every queued decode has finished (the results are still delivered through the event loop).'''
+        return self.pool.waitForDone(timeout_ms)
+
+    def decoded(self, kind:str, name:str, generation:int, image:QImage, folder_exists:bool):
+        key = (kind, name)
+        if self.loading.get(key) != generation:
+            return # invalidated (or decoded synchronously) while this was in flight
+        del self.loading[key]
+        self.store(kind, name, image, folder_exists)
+        self.loaded.emit(kind, name)
+
+    def store(self, kind:str, name:str, image:QImage, folder_exists:bool):
+        '''Caches a decoded thumbnail (QPixmaps may only be made on the GUI thread, so this happens here). Returns the QIcon or None.'''
+        key = (kind, name)
+        found = not image.isNull()
+        self.watch(kind, name, folder_exists, found)
+        if not found:
+            self.missing.add(key)
+            return None
+        log.debug(f"Found thumbnail for {kind} '{name}'")
+        return self.remember(key, QIcon(QPixmap.fromImage(image)))
+
+    def remember(self, key:tuple, icon:QIcon):
+        self.icons[key] = icon
+        if len(self.icons) > self.max_entries:
+            self.icons.popitem(last=False)
+        return icon
+
+    def load_atlas(self):
+        atlas = ThumbnailAtlas.load_atlas()
+        if atlas == None:
+            self.atlas, self.atlas_entries, self.atlas_signature = None, {}, {}
+            return
+        image, self.atlas_entries, self.atlas_signature = atlas
+        self.atlas = QPixmap.fromImage(image)
+        log.debug(f"Loaded thumbnail atlas with {len(self.atlas_entries)} thumbnail(s)")
+
+    def check_atlas(self):
+        '''Compares the atlas with the thumbnail folders in the background, and rebuilds it if they don't match.'''
+        if self.atlas_checking:
+            self.atlas_recheck = True
+            return
+        self.atlas_checking = True
+        self.pool.start(_AtlasCheckJob(self.notifier, self.atlas_signature))
+
+    def atlas_checked(self, rebuilt:bool):
+        self.atlas_checking = False
+        if rebuilt:
+            self.load_atlas()
+            for kind in THUMB_SOURCES:
+                self.invalidate(kind)
+                self.changed.emit(kind)
+        if self.atlas_recheck:
+            self.atlas_recheck = False
+            self.check_atlas()
+
+    def static_icon(self, path:str):
+        icon = self.static_icons.get(path)
+        if icon == None:
+            icon = QIcon(path)
+            self.static_icons[path] = icon
+        return icon
+
+    def watch(self, kind:str, name:str, folder_exists:bool, found:bool):
+        folder = THUMB_SOURCES[kind][0]
+        paths = []
+        if folder_exists:
+            paths.append(os.path.join(folder, name)) # catches the thumbnail being added/removed/replaced by rename
+        if found:
+            paths.append(thumb_path(kind, name)) # catches it being overwritten in place
+        paths = [path for path in paths if path not in self.watcher.files() and path not in self.watcher.directories()]
+        if paths:
+            self.watcher.addPaths(paths)
+
+    def path_changed(self, path:str):
+        for kind, (folder, _, _) in THUMB_SOURCES.items():
+            relative = os.path.relpath(path, folder)
+            if relative.startswith(os.pardir):
+                continue
+            if relative == os.curdir:
+                # Something was added to/removed from the top folder, any name we gave up on might have a thumbnail now
+                self.missing = {key for key in self.missing if key[0] != kind}
+            else:
+                name = relative.split(os.sep)[0]
+                self.invalidate(kind, name)
+                self.atlas_entries.pop(f"{kind}/{name}", None) # decoded from disk until the atlas is rebuilt
+            self.check_atlas()
+            log.debug(f"Thumbnails changed on disk: '{path}'")
+            self.changed.emit(kind)
+            return
+
+    def invalidate(self, kind:str, name:str | None=None):
+        '''Forgets one thumbnail, or every thumbnail of a kind if name is None.'''
+        self.generation += 1
+        if name == None:
+            self.icons = OrderedDict((key, icon) for key, icon in self.icons.items() if key[0] != kind)
+            self.missing = {key for key in self.missing if key[0] != kind}
+            self.loading = {key: gen for key, gen in self.loading.items() if key[0] != kind}
+        else:
+            self.icons.pop((kind, name), None)
+            self.missing.discard((kind, name))
+            self.loading.pop((kind, name), None)
+
+_cache = None
+
+def get_cache():
+    '''Returns the shared ThumbnailCache. Must be called after the QApplication exists.'''
+    global _cache
+    if _cache == None:
+        _cache = ThumbnailCache()
+    return _cache
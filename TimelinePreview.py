@@ -0,0 +1,140 @@
+## Preview player for a flavor: shows the product, sensor and clock that are on screen at any point of the local forecast.
+## The picture only repaints when the scrub position crosses into a new FlavorTimeline segment, so dragging the slider across a
+## 99-product flavor is just a binary search per move.
+import logging
+from PySide6.QtWidgets import QDialog, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QSlider, QLabel, QSizePolicy
+from PySide6.QtGui import QPainter, QPalette
+from PySide6.QtCore import QElapsedTimer, QRect, QTime, QTimer, Qt
+import FlavorTimeline
+import ThumbnailCache
+log = logging.getLogger(__name__)
+
+TICK_MS = 40 # playback timer, only moves the slider/label; the picture repaints on segment changes
+
+class _Screen(QWidget):
+    '''Paints the current product (big), sensor (underneath) and the clock overlay.'''
+    def __init__(self, preview, parent=None):
+        super().__init__(parent)
+        self.preview = preview
+        self.setMinimumSize(420, 330)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.setAutoFillBackground(True)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        showing = self.preview.showing()
+        sensor_height = 80
+        product_rect = self.rect().adjusted(10, 10, -10, -sensor_height - 20)
+        sensor_rect = QRect(10, self.height() - sensor_height - 10, self.width() - 20, sensor_height)
+        self.paint_item(painter, product_rect, "product", showing["products"])
+        self.paint_item(painter, sensor_rect, "sensor", showing["sensors"])
+        if showing["clock"]:
+            clock_rect = QRect(product_rect.right() - 110, product_rect.top(), 110, 28)
+            painter.fillRect(clock_rect, self.palette().color(QPalette.Shadow))
+            painter.setPen(self.palette().color(QPalette.BrightText))
+            painter.drawText(clock_rect, Qt.AlignCenter, QTime.currentTime().toString("h:mm:ss AP"))
+        painter.end()
+
+    def paint_item(self, painter, rect:QRect, kind:str, name:str | None):
+        painter.setPen(self.palette().color(QPalette.Mid))
+        painter.drawRect(rect)
+        painter.setPen(self.palette().color(QPalette.Text))
+        if name == None:
+            painter.drawText(rect, Qt.AlignCenter, f"(no {kind})")
+            return
+        text_height = painter.fontMetrics().height()
+        icon = self.preview.thumbnails.icon(kind, name)
+        if icon != None:
+            icon.paint(painter, rect.adjusted(4, 4, -4, -text_height - 6), Qt.AlignCenter)
+        painter.drawText(QRect(rect.x(), rect.bottom() - text_height - 2, rect.width(), text_height), Qt.AlignCenter, name)
+
+class TimelinePreview(QDialog):
+    def __init__(self, target:dict=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Forecast Preview")
+        self.resize(480, 460)
+        self.timeline = FlavorTimeline.Timeline(target)
+        self.thumbnails = ThumbnailCache.get_cache()
+        self.thumbnails.loaded.connect(self.thumbnail_loaded)
+        self.thumbnails_connected = True
+        self.t = 0
+        self.segment = None
+
+        self.preview_screen = _Screen(self)
+        self.slider = QSlider(Qt.Horizontal)
+        self.slider.setRange(0, int(self.timeline.length * 1000))
+        self.slider.valueChanged.connect(lambda value: self.set_time(value / 1000))
+        self.play_btn = QPushButton("Play")
+        self.play_btn.clicked.connect(self.toggle_play)
+        self.time_label = QLabel("")
+        controls = QHBoxLayout()
+        controls.addWidget(self.play_btn)
+        controls.addWidget(self.slider)
+        controls.addWidget(self.time_label)
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.preview_screen)
+        layout.addLayout(controls)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(TICK_MS)
+        self.timer.timeout.connect(self.tick)
+        self.clock = QElapsedTimer()
+        self.play_start = 0
+        self.clock_second = None
+
+        # Start decoding every thumbnail of the flavor now, so scrubbing never waits on one
+        for kind, layer in (("product", "products"), ("sensor", "sensors")):
+            for name in set(self.timeline.names[layer]):
+                if name:
+                    self.thumbnails.icon(kind, name)
+        self.set_time(0)
+
+    def showing(self):
+        '''Returns {"products": name or None, "sensors": name or None, "clock": bool} for the current time.'''
+        items = {}
+        for layer in ("products", "sensors"):
+            i = self.timeline.index_at(layer, self.t)
+            items[layer] = None if i == None else self.timeline.names[layer][i]
+        items["clock"] = self.timeline.clock_showing(self.t)
+        return items
+
+    def set_time(self, t:float):
+        self.t = max(0, min(t, self.timeline.length))
+        self.time_label.setText(f"{self.t:.1f} / {self.timeline.length} sec")
+        segment = self.timeline.segment_at(self.t)
+        if segment != self.segment:
+            self.segment = segment
+            self.preview_screen.update()
+
+    def toggle_play(self):
+        if self.timer.isActive():
+            self.timer.stop()
+            self.play_btn.setText("Play")
+            return
+        if self.t >= self.timeline.length:
+            self.slider.setValue(0)
+        self.play_start = self.t
+        self.clock.start()
+        self.timer.start()
+        self.play_btn.setText("Pause")
+
+    def tick(self):
+        t = self.play_start + self.clock.elapsed() / 1000
+        self.slider.setValue(int(t * 1000)) # calls set_time
+        if t >= self.timeline.length:
+            self.toggle_play()
+        elif self.timeline.clock_showing(t) and QTime.currentTime().second() != self.clock_second:
+            self.clock_second = QTime.currentTime().second()
+            self.preview_screen.update() # keeps the clock overlay ticking
+
+    def thumbnail_loaded(self, kind:str, name:str):
+        if name in self.showing().values():
+            self.preview_screen.update()
+
+    def done(self, result):
+        '''Every way of closing the dialog ends up here. The thumbnail cache outlives it, so the slot is disconnected too.'''
+        self.timer.stop()
+        if self.thumbnails_connected:
+            self.thumbnails.loaded.disconnect(self.thumbnail_loaded)
+            self.thumbnails_connected = False
+        super().done(result)
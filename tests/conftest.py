@@ -0,0 +1,6 @@
+## Lets the tests import the top-level modules (FlavorManagement, DIFDecode, ...) when pytest is run from anywhere.
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "perf: timing test checked against tests/perf_baseline.json (deselect with -m 'not perf')")
@@ -0,0 +1,72 @@
+## Random valid flavors for the round-trip tests, and the exact dict FlavorExtractor should hand back for each of them.
+import os, random
+import FlavorManagement as FM
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NAME_CHARS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+RESERVED_NAMES = ("SENSORS", "PERM", "TAG") # FlavorExtractor skips these
+MODIFIERS = (
+    "IfValidAppend(l_nws001a_valid c_flavmod_nws1)",
+    "IfValidAppend(l_nws002a_valid c_flavmod_nws2)IfValidAppend(l_ccn001a_valid c_flavmod_ccn1)",
+    "IfValidAppend(l_wfo001a_valid c_flavmod_wfo)",
+)
+DURATIONS = ("1", "2", "4.5", ".5", "10", "12", "15.5", "0.25", "30", "7.75")
+
+def item_names(folder:str, fallback:str):
+    '''The product/sensor names shipped with the repo (offline, just a folder listing), or made up ones without them.'''
+    path = os.path.join(ROOT, folder)
+    names = sorted(name for name in os.listdir(path) if os.path.isdir(os.path.join(path, name))) if os.path.isdir(path) else []
+    return names or [f"{fallback}{n:03}" for n in range(40)]
+
+PRODUCTS = item_names("product-data", "prod")
+SENSORS = item_names("sensor-data", "par_sens")
+
+def random_name(rng:random.Random, taken:set):
+    while True:
+        name = "".join(rng.choice(NAME_CHARS) for _ in range(rng.randint(1, 6)))
+        if name not in taken and name not in RESERVED_NAMES:
+            taken.add(name)
+            return name
+
+def random_duration(rng:random.Random):
+    if rng.random() < 0.3:
+        return str(round(rng.uniform(0.1, 20), rng.randint(1, 3))) # fractional, up to 3 places
+    return rng.choice(DURATIONS)
+
+def random_flavor(rng:random.Random, taken:set=None):
+    '''Returns a flavor JSON that passes FM.error_check: 1-99 products, 0-99 sensors, maybe a clock and modifiers.'''
+    if taken == None: taken = set()
+    product_count = rng.choice((1, 2, rng.randint(1, 20), rng.randint(1, 99), 99))
+    sensor_count = rng.choice((0, 1, rng.randint(0, 20), rng.randint(0, 99)))
+    target = {
+        "name": random_name(rng, taken),
+        "init": rng.random() < 0.8,
+        "modifiers": None,
+        "products": {"order": [{"name": rng.choice(PRODUCTS), "duration": random_duration(rng)} for _ in range(product_count)]},
+        "sensors": {"order": [{"name": rng.choice(SENSORS), "duration": random_duration(rng)} for _ in range(sensor_count)]},
+        "misc": {"count": 0},
+    }
+    if target["init"] and rng.random() < 0.4:
+        target["modifiers"] = rng.choice(MODIFIERS)
+    FM.get_total_products(target)
+    FM.get_total_sensors(target)
+    if rng.random() < 0.6:
+        _, total = FM.get_total_products(target)
+        target["misc"] = {"count": 1, "order": [{"name": "clock", "duration": rng.choice((total, FM.float_or_int(str(total / 2))))}]}
+    assert FM.error_check(target) == [], FM.error_check(target)
+    return target
+
+def expected_extraction(target:dict):
+    '''What FlavorExtractor gives back for target: durations come back as the strings that were exported, the layers carry
+    their counts, and only the keys the DIF actually has are there (no "duration", no empty "order", no null modifiers).'''
+    expected = {"name": target["name"]}
+    if target.get("init"):
+        expected["init"] = True
+        if target.get("modifiers"):
+            expected["modifiers"] = target["modifiers"]
+    for layer in ("products", "sensors", "misc"):
+        order = (target.get(layer) or {}).get("order") or []
+        expected[layer] = {"count": len(order)}
+        if order:
+            expected[layer]["order"] = [{"name": item["name"], "duration": str(item["duration"])} for item in order]
+    return expected
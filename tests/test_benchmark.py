@@ -0,0 +1,39 @@
+## Smoke test of the offscreen UI benchmark on a tiny workload: every operation gets timed, no widgets are left behind, and the
+## flavor that was active before is put back.
+import json
+import pytest
+pytest.importorskip("PySide6")
+import FlavorBenchmark
+import FlavorBuilderGUI as FBG
+import FlavorManagement as FM
+
+def test_tiny_run_reports_every_operation():
+    FM.flavor = {"name": "KEEP"}
+    results = FlavorBenchmark.run(product_counts=(3,), dif_flavors=(20,), repeat=2, dif_repeat=1, seed=1)
+    assert FM.flavor == {"name": "KEEP"}
+    assert results["platform"] == "offscreen"
+    flavor_scenario, dif_scenario = results["scenarios"]
+    assert set(flavor_scenario["ops"]) == {"load", "refresh_flavor", "get_products", "get_sensors", "repaint"} | {
+        f"{op}_{kind}" for op in ("add", "edit", "renumber", "delete") for kind in ("product", "sensor")}
+    assert set(dif_scenario["ops"]) == {"extract", "picker_open", "picker_filter", "picker_sort", "picker_load"}
+    for scenario in results["scenarios"]:
+        assert scenario["widgets"]["end"] == scenario["widgets"]["start"]
+        for summary in scenario["ops"].values():
+            assert summary["n"] > 0
+            assert 0 <= summary["p50"] <= summary["p90"] <= summary["p99"] <= summary["max"]
+    assert dif_scenario["ops"]["picker_filter"]["n"] == len(FlavorBenchmark.FILTERS)
+    assert dif_scenario["widgets"]["picker_open"] > dif_scenario["widgets"]["start"]
+
+def test_traced_runs_can_be_repeated(tmp_path):
+    original = FBG.MainWindow.refresh_flavor
+    for n in range(2):
+        path = tmp_path / f"trace{n}.json"
+        FlavorBenchmark.run(product_counts=(3,), dif_flavors=(), repeat=1, seed=1, trace=str(path))
+        names = {event["name"] for event in json.loads(path.read_text())["traceEvents"] if event["ph"] == "X"}
+        assert {"MainWindow.refresh_flavor", "FlavorManagement.renumber"} <= names
+        assert FBG.MainWindow.refresh_flavor is original # nothing is left wrapped after the run
+
+def test_percentile_is_nearest_rank():
+    values = list(range(1, 101))
+    assert [FlavorBenchmark.percentile(values, pct) for pct in (50, 90, 99, 100)] == [50, 90, 99, 100]
+    assert FlavorBenchmark.latency_summary([5.0])["p99"] == 5.0
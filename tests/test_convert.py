@@ -0,0 +1,72 @@
+## DIFConvert and the TXT record format it reads and writes: expiry timestamps quoted or not, data with quotes and commas,
+## and the numeric fields and DAT flags coming back exactly as they went in.
+import pytest
+import DIFConvert
+import DIFDecode
+import FlavorManagement as FM
+
+RECORDS = [ # (key, flags, data, exp_ts) as a DAT holds them
+    ("c_K_product_00", 0, "ex002a", 0),
+    ("c_flavor_K", 0, '@Init(K)IfValidAppend(l_nws002a_valid c_flavmod_nws2)', 0),
+    ("obs_KATL_text", 7, 'Say "hi", then, "bye"', 1700000000),
+    ("obs_KATL_empty", 65537, "", 1700000001),
+    ("obs_KATL_quote", 0, '"', 5),
+    ("obs_KATL_accent", 0, "Café °F", 0),
+    ("obs_KATL_lines", 0, 'Line one\r\n"Line two",0,0,"x"\nline three\rfour\n', 1700000002),
+    ("c_K_note", 0, "ends with a break\r\n", 0),
+]
+
+def read_txt(tmp_path, text:str):
+    path = tmp_path / "dif.txt"
+    path.write_text(text, encoding=DIFConvert.TXT_ENCODING)
+    return list(DIFDecode.iter_wxl_txt(str(path)))
+
+@pytest.mark.parametrize("line", ['"k",0,0,"5","1700000000"\n', '"k",0,0,"5",1700000000\n', '"k", 0, 0, "5", "1700000000"\r\n'])
+def test_exp_ts_quoted_or_not(tmp_path, line):
+    assert read_txt(tmp_path, line) == [("k", (0, 0), "5", 1700000000)]
+
+def test_lines_round_trip(tmp_path):
+    lines = [FM.dif_string("k", "a, b", fields=(3, 4)), FM.dif_string("k", "", exp_ts=9), FM.dif_string("k", 'say ""hi""', exp_ts=1)]
+    assert lines[1] == '"k",0,0,"",9\n'
+    assert read_txt(tmp_path, "".join(lines) + "not a record\n") == [("k", (3, 4), "a, b", 0), ("k", (0, 0), "", 9), ("k", (0, 0), 'say "hi"', 1)]
+    assert read_txt(tmp_path, '"k",0,0,"lone " quote"\n') == [] # not something dif_string writes, so it isn't guessed at
+
+def test_data_with_line_breaks(tmp_path):
+    text = '"a",0,0,"one\r\ntwo\n"\n\n"b",0,0,"three\nfour",5\n"c",0,0,"x"\n'
+    assert read_txt(tmp_path, text) == [("a", (0, 0), "one\r\ntwo\n", 0), ("b", (0, 0), "three\nfour", 5), ("c", (0, 0), "x", 0)]
+
+def test_bad_lines_are_reported_and_the_records_after_them_kept(tmp_path):
+    path = tmp_path / "dif.txt"
+    path.write_text('"a",0,0,"x"\n"b",0,0,"never closed\n"c",0,0,"y"\ngarbage\n\n', encoding=DIFConvert.TXT_ENCODING)
+    bad_lines = []
+    assert [record[0] for record in DIFDecode.iter_wxl_txt(str(path), bad_lines=bad_lines)] == ["a", "c"]
+    assert bad_lines == [(2, '"b",0,0,"never closed\n'), (4, "garbage\n")]
+    with pytest.raises(ValueError, match="2 line"):
+        DIFConvert.convert(str(path), str(tmp_path / "unit.dat"))
+    assert not (tmp_path / "unit.dat").exists()
+
+def write_dat(tmp_path):
+    path = tmp_path / "unit.dat"
+    path.write_bytes(b"".join(DIFDecode.encode_record(*record) for record in RECORDS))
+    return str(path)
+
+def test_dat_round_trip_keeps_everything_with_flags(tmp_path):
+    dat_path = write_dat(tmp_path)
+    assert DIFConvert.convert(dat_path, str(tmp_path / "unit.txt"), expiring=True, flags=True) == {"records": 8, "skipped": 0, "bad": 0}
+    assert [(key, fields[0], data, exp_ts) for key, fields, data, exp_ts in DIFDecode.iter_wxl_txt(str(tmp_path / "unit.txt"))] == RECORDS
+    DIFConvert.convert(str(tmp_path / "unit.txt"), str(tmp_path / "back.dat"), expiring=True, flags=True)
+    assert (tmp_path / "back.dat").read_bytes() == (tmp_path / "unit.dat").read_bytes()
+
+def test_defaults_drop_expiring_records_and_flags(tmp_path):
+    dat_path = write_dat(tmp_path)
+    assert DIFConvert.convert(dat_path, str(tmp_path / "unit.txt")) == {"records": 4, "skipped": 4, "bad": 0}
+    assert list(DIFDecode.iter_wxl_txt(str(tmp_path / "unit.txt"))) == [(key, (0, 0), data, 0) for key, flags, data, exp_ts in RECORDS if exp_ts == 0]
+
+def test_second_numeric_field_has_no_place_in_a_dat(tmp_path):
+    txt_path = tmp_path / "unit.txt"
+    txt_path.write_text(FM.dif_string("k", "data", fields=(0, 3)))
+    with pytest.raises(ValueError):
+        DIFConvert.convert(str(txt_path), str(tmp_path / "unit.dat"), flags=True)
+    assert not (tmp_path / "unit.dat").exists()
+    DIFConvert.convert(str(txt_path), str(tmp_path / "unit.dat"))
+    assert list(DIFDecode.iter_wxl_dif(str(tmp_path / "unit.dat"))) == [("k", 0, "data", 0)]
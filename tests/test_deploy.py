@@ -0,0 +1,148 @@
+## FlavorDeploy against local pyftpdlib servers standing in for units: concurrent uploads, one login per unit, retries after a
+## transient failure (but not after a permanent one), and files that end up exactly as they were exported.
+import os, time, threading
+import pytest
+pytest.importorskip("pyftpdlib")
+from pyftpdlib.authorizers import DummyAuthorizer
+from pyftpdlib.handlers import FTPHandler
+from pyftpdlib.ioloop import IOLoop
+from pyftpdlib.servers import FTPServer
+import FlavorDeploy
+
+USER, PASSWORD = "xl", "secret"
+
+class Unit:
+    '''One FTP server on localhost, on its own IOLoop and thread. Counts what the deployer did to it.'''
+    active = 0 # sessions connected across every unit right now
+    peak = 0
+    lock = threading.Lock()
+
+    def __init__(self, root:str, fail_stors:int=0, refuse_overwrite:bool=False, stor_delay:float=0):
+        self.root = root
+        self.logins = 0
+        self.commands = []
+        self.fail_stors = fail_stors
+        unit = self
+        class Handler(FTPHandler):
+            def on_connect(self):
+                with Unit.lock:
+                    Unit.active += 1
+                    Unit.peak = max(Unit.peak, Unit.active)
+            def on_disconnect(self):
+                with Unit.lock:
+                    Unit.active -= 1
+            def on_login(self, username):
+                unit.logins += 1
+            def ftp_STOR(self, file, mode="w"):
+                unit.commands.append("STOR")
+                if unit.fail_stors > 0:
+                    unit.fail_stors -= 1
+                    self.respond("451 Injected failure")
+                    return
+                time.sleep(stor_delay) # only holds up this unit's loop
+                return super().ftp_STOR(file, mode)
+            def ftp_RNTO(self, path):
+                unit.commands.append("RNTO")
+                if refuse_overwrite and os.path.exists(path):
+                    self.respond("550 Target exists")
+                    return
+                return super().ftp_RNTO(path)
+            def ftp_DELE(self, path):
+                unit.commands.append("DELE")
+                return super().ftp_DELE(path)
+        authorizer = DummyAuthorizer()
+        authorizer.add_user(USER, PASSWORD, root, perm="elradfmw")
+        Handler.authorizer = authorizer
+        Handler.auth_failed_timeout = 0
+        self.server = FTPServer(("127.0.0.1", 0), Handler, ioloop=IOLoop())
+        self.port = self.server.address[1]
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        while not self.stopped.is_set():
+            self.server.serve_forever(timeout=0.05, blocking=False, handle_exit=False)
+        self.server.close_all()
+
+    def host(self, password:str=PASSWORD):
+        return {"host": "127.0.0.1", "port": self.port, "user": USER, "password": password}
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join(timeout=5)
+
+@pytest.fixture
+def units(tmp_path):
+    started = []
+    def start(count:int=1, **options):
+        for n in range(count):
+            root = tmp_path / f"unit{len(started)}"
+            root.mkdir()
+            started.append(Unit(str(root), **options))
+        return started[-count:]
+    Unit.active = Unit.peak = 0
+    yield start
+    for unit in started:
+        unit.stop()
+
+@pytest.fixture
+def files(tmp_path):
+    paths = []
+    for name, size in (("K.txt", 200), ("D.txt", 5000), ("all_flavors.txt", 300000)):
+        path = tmp_path / name
+        path.write_bytes(bytes((n * 7 + len(name)) % 256 for n in range(size)))
+        paths.append(str(path))
+    return paths
+
+def assert_deployed(unit:Unit, files:list):
+    assert sorted(os.listdir(unit.root)) == sorted(os.path.basename(path) for path in files) # no .part files left
+    for path in files:
+        with open(path, "rb") as local, open(os.path.join(unit.root, os.path.basename(path)), "rb") as remote:
+            assert remote.read() == local.read()
+
+def test_concurrent_deploy_reuses_one_session_per_unit(units, files):
+    started = units(4, stor_delay=0.1)
+    results = FlavorDeploy.deploy(files, [unit.host() for unit in started], workers=4, backoff=0)
+    assert [result["ok"] for result in results] == [True] * 4
+    assert Unit.peak == 4 # every unit had a session open at the same time
+    for unit, result in zip(started, results):
+        assert unit.logins == 1
+        assert result["attempts"] == len(files)
+        assert [os.path.basename(path) for path in result["uploaded"]] == [os.path.basename(path) for path in files]
+        assert_deployed(unit, files)
+
+def test_transient_failure_is_retried_on_a_new_session(units, files):
+    unit, = units(1, fail_stors=2)
+    result, = FlavorDeploy.deploy(files, [unit.host()], backoff=0.01)
+    assert result["ok"]
+    assert result["attempts"] == len(files) + 2
+    assert unit.logins == 3 # reconnected after each failure
+    assert_deployed(unit, files)
+
+def test_permanent_failure_is_not_retried(units, files):
+    unit, = units(1)
+    started = time.perf_counter()
+    result, = FlavorDeploy.deploy(files, [unit.host(password="wrong")], retries=3, backoff=2)
+    assert not result["ok"] and "530" in result["error"]
+    assert result["attempts"] == 1
+    assert time.perf_counter() - started < 1 # no backoff sleep
+    assert os.listdir(unit.root) == []
+
+def test_redeploy_renames_over_the_old_file(units, files, tmp_path):
+    unit, = units(1)
+    for path in files:
+        with open(os.path.join(unit.root, os.path.basename(path)), "wb") as old_file:
+            old_file.write(b"old database")
+    assert FlavorDeploy.deploy(files, [unit.host()], backoff=0)[0]["ok"]
+    assert "DELE" not in unit.commands # the real file was never missing
+    assert_deployed(unit, files)
+
+def test_redeploy_deletes_first_only_when_the_server_refuses(units, files):
+    unit, = units(1, refuse_overwrite=True)
+    for path in files:
+        with open(os.path.join(unit.root, os.path.basename(path)), "wb") as old_file:
+            old_file.write(b"old database")
+    assert FlavorDeploy.deploy(files, [unit.host()], backoff=0)[0]["ok"]
+    assert unit.commands == ["STOR", "RNTO", "DELE", "RNTO"] * len(files)
+    assert_deployed(unit, files)
@@ -0,0 +1,60 @@
+## The DIF flavor picker's table model: sorting keeps selections on the same flavors, and the lazy columns never change the
+## extracted flavors.
+import copy
+import pytest
+pytest.importorskip("PySide6")
+from PySide6.QtCore import Qt, QItemSelectionModel
+import FlavorTable
+
+def flavor(name:str, durations:list):
+    return {"name": name, "init": True, "products": {"order": [{"name": "ex002a", "duration": duration} for duration in durations]}}
+
+FLAVORS = {
+    "A": flavor("A", ["5", "5", "5"]),
+    "B": flavor("B", ["1"]),
+    "C": flavor("C", ["2", "2"]),
+    "D": flavor("D", ["30", ".5"]),
+}
+PRODUCTS_COLUMN = FlavorTable.COLUMNS.index("Products")
+LENGTH_COLUMN = FlavorTable.COLUMNS.index("Length")
+
+def picker(flavors:dict):
+    model = FlavorTable.FlavorTableModel(flavors)
+    proxy = FlavorTable.FlavorFilterProxy()
+    proxy.setSourceModel(model)
+    return model, proxy, QItemSelectionModel(proxy)
+
+def selected_names(model, proxy, selection):
+    return sorted(model.flavor_name(proxy.mapToSource(index).row()) for index in selection.selectedRows(FlavorTable.NAME_COLUMN))
+
+def test_sort_keeps_the_selection_on_the_same_flavors():
+    model, proxy, selection = picker(copy.deepcopy(FLAVORS))
+    for row in (1, 3): # B and D
+        selection.select(proxy.index(row, 0), QItemSelectionModel.Select | QItemSelectionModel.Rows)
+    selection.setCurrentIndex(proxy.index(1, 0), QItemSelectionModel.NoUpdate)
+    for column, order in ((PRODUCTS_COLUMN, Qt.DescendingOrder), (LENGTH_COLUMN, Qt.AscendingOrder), (0, Qt.DescendingOrder)):
+        proxy.sort(column, order)
+        assert selected_names(model, proxy, selection) == ["B", "D"]
+        assert model.flavor_name(proxy.mapToSource(selection.currentIndex()).row()) == "B"
+    assert model.names == ["D", "C", "B", "A"]
+
+def test_sort_with_a_filter_keeps_the_selection():
+    model, proxy, selection = picker(copy.deepcopy(FLAVORS))
+    proxy.set_filter_text("c")
+    selection.select(proxy.index(0, 0), QItemSelectionModel.Select | QItemSelectionModel.Rows)
+    proxy.set_filter_text("")
+    proxy.sort(LENGTH_COLUMN, Qt.DescendingOrder)
+    assert selected_names(model, proxy, selection) == ["C"]
+
+def test_columns_do_not_change_the_flavors():
+    flavors = copy.deepcopy(FLAVORS)
+    model, proxy, _ = picker(flavors)
+    proxy.sort(LENGTH_COLUMN, Qt.AscendingOrder)
+    assert [model.summary(name) for name in ("A", "D")] == [("Yes", "", 3, 15), ("Yes", "", 2, 30.5)]
+    assert flavors == FLAVORS
+
+def test_bad_durations_count_as_zero():
+    flavors = {"E": flavor("E", ["4", "soon", None, "-2"]), "F": {"name": "F", "products": {"order": [{"name": "ex002a"}]}}, **FLAVORS}
+    model, proxy, _ = picker(flavors)
+    proxy.sort(LENGTH_COLUMN, Qt.AscendingOrder)
+    assert [model.summary(name) for name in ("E", "F")] == [("Yes", "", 4, 4), ("", "", 1, 0)]
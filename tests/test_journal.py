@@ -0,0 +1,92 @@
+## The autosave journal: edits come back after a crash exactly once, even when the crash hits in the middle of a compaction,
+## and opening the editor without editing anything leaves nothing to restore.
+import os
+import pytest
+import FlavorJournal as FJ
+import FlavorManagement as FM
+
+FLAVOR = {"name": "K", "init": True, "products": {"count": 1, "order": [{"name": "ex002a", "duration": "10"}]}}
+
+@pytest.fixture
+def flavor():
+    previous, listeners = FM.flavor, FM.edit_listeners[:]
+    FM.set_flavor({"name": "K", "init": True, "products": {"count": 1, "order": [{"name": "ex002a", "duration": "10"}]}})
+    yield
+    FM.flavor = previous
+    FM.edit_listeners[:] = listeners
+
+def edit():
+    FM.update_product(None, "cc001a", "5") # appends, so replaying it twice would add it twice
+    FM.set_name("KA")
+
+def crash(journal:FJ.FlavorJournal):
+    '''Leaves the files as they are, the way the app dying would.'''
+    FM.edit_listeners.remove(journal.record)
+    journal.journal_file.close()
+
+def recovered(folder:str):
+    FM.flavor = {}
+    assert FJ.FlavorJournal(folder).recover() != None
+    return FM.flavor
+
+def test_edits_are_recovered(tmp_path, flavor):
+    journal = FJ.FlavorJournal(str(tmp_path))
+    journal.start()
+    edit()
+    expected = FM.flavor
+    crash(journal)
+    assert recovered(str(tmp_path)) == expected
+    journal = FJ.FlavorJournal(str(tmp_path))
+    journal.start()
+    journal.compact() # survives any number of compactions
+    crash(journal)
+    assert recovered(str(tmp_path)) == expected
+
+def test_crash_between_snapshot_and_journal_truncation(tmp_path, flavor, monkeypatch):
+    journal = FJ.FlavorJournal(str(tmp_path))
+    journal.start()
+    edit()
+    expected = FM.flavor
+    replace = os.replace
+    def replace_then_die(src, dst):
+        replace(src, dst)
+        raise OSError("died before the journal was truncated")
+    monkeypatch.setattr(FJ.os, "replace", replace_then_die)
+    assert journal.compact() == False
+    monkeypatch.setattr(FJ.os, "replace", replace)
+    crash(journal)
+    assert journal.read_snapshot()[1] == expected # the snapshot already has the edits the journal still lists
+    assert recovered(str(tmp_path)) == expected
+    assert len(FM.flavor["products"]["order"]) == 2
+
+def test_fresh_start_leaves_nothing_to_recover(tmp_path, flavor):
+    journal = FJ.FlavorJournal(str(tmp_path))
+    journal.start()
+    edit()
+    crash(journal)
+    journal = FJ.FlavorJournal(str(tmp_path))
+    assert journal.has_session()
+    journal.start(snapshot=False) # the restore was declined
+    assert not journal.has_session()
+    FM.set_name("D")
+    assert journal.has_session()
+    crash(journal)
+    assert recovered(str(tmp_path))["name"] == "D"
+
+def test_opening_the_editor_is_not_an_edit(tmp_path):
+    pytest.importorskip("PySide6")
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtWidgets import QApplication
+    import FlavorBuilderGUI as FBG
+    app = QApplication.instance() or QApplication([])
+    previous = FM.flavor
+    FM.flavor = {}
+    folder = str(tmp_path / "autosave")
+    window = FBG.MainWindow(autosave_folder=folder)
+    try:
+        assert not FJ.FlavorJournal(folder).has_session() # killed now, the next launch wouldn't ask to restore anything
+        FM.set_name("K")
+        assert FJ.FlavorJournal(folder).has_session()
+    finally:
+        window.close()
+        FM.flavor = previous
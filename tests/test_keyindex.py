@@ -0,0 +1,43 @@
+## DIFIndex queries against a brute-force scan of the same database, and single-flavor extraction against the full one.
+import random, fnmatch
+import pytest
+import DIFIndex
+import FlavorExtractor as FE
+import FlavorManagement as FM
+import DIFDecode
+from flavorgen import random_flavor
+
+@pytest.fixture(scope="module")
+def database(tmp_path_factory):
+    rng = random.Random(49)
+    taken = set()
+    dif = "".join(FM.build_dif_txt(random_flavor(rng, taken)) for _ in range(40))
+    dif += "".join(FM.dif_string(f"obs_{rng.randint(0, 9999)}_{n}", "x") for n in range(3000))
+    dif += FM.dif_string("c_flavor_name_prefix", "ignored") + FM.dif_string("c_\U0010ffff", "edge")
+    path = tmp_path_factory.mktemp("dif") / "unit.txt"
+    path.write_text(dif, encoding="utf-8")
+    return DIFDecode.parse_wxl_txt(str(path))
+
+PATTERNS = ["c_*_product_num", "c_flavor_*", "*_duration_0?", "c_[A-D]*_sensor_*", "obs_1*_2", "*", "c_*", "nothing*", "c_flavor_name_prefix"]
+
+@pytest.mark.parametrize("pattern", PATTERNS)
+def test_glob_matches_a_full_scan(database, pattern):
+    index = DIFIndex.KeyIndex(database)
+    assert index.glob(pattern) == sorted(key for key in database if fnmatch.fnmatchcase(key, pattern))
+
+@pytest.mark.parametrize("prefix", ["", "c_", "c_A", "obs_99", "c_\U0010ffff", "zzz"])
+def test_prefix_matches_a_full_scan(database, prefix):
+    index = DIFIndex.KeyIndex(database)
+    assert index.prefix(prefix) == sorted(key for key in database if key.startswith(prefix))
+
+def test_range(database):
+    index = DIFIndex.KeyIndex(database)
+    assert index.range("c_B", "c_D") == sorted(key for key in database if "c_B" <= key < "c_D")
+    assert index.range("obs_5") == sorted(key for key in database if key >= "obs_5")
+
+def test_single_flavor_extraction_matches_the_full_one(database):
+    index = DIFIndex.KeyIndex(database)
+    flavors = FE.extract_flavors(database)
+    for name, flavor in flavors.items():
+        assert FE.extract_flavor(index, name) == flavor
+    assert FE.extract_flavor(index, "NOTHERE") == None
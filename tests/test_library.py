@@ -0,0 +1,90 @@
+## FlavorLibrary against a throwaway database: flavors come back in exactly the JSON shape they went in, and search finds
+## them by name pattern, product and source.
+import os, json, glob, random
+import pytest
+import FlavorLibrary as FL
+from flavorgen import ROOT, random_flavor
+
+@pytest.fixture
+def library(tmp_path):
+    with FL.FlavorLibrary(str(tmp_path / "library.db")) as library:
+        yield library
+
+def example_flavors():
+    flavors = []
+    for path in sorted(glob.glob(os.path.join(ROOT, "flavor-data", "*.json"))):
+        with open(path, "r") as flavor_file:
+            flavors.append(json.load(flavor_file))
+    return flavors
+
+def test_example_flavors_round_trip(library):
+    flavors = example_flavors()
+    assert library.save_flavors(flavors, source="EXAMPLES") == len(flavors)
+    for flavor in flavors:
+        assert library.load_flavor(flavor["name"], source="EXAMPLES") == flavor
+
+def test_random_flavors_round_trip(library):
+    rng = random.Random(7)
+    taken = set()
+    flavors = [random_flavor(rng, taken) for _ in range(50)]
+    assert library.save_flavors(flavors) == len(flavors)
+    for flavor in flavors:
+        assert library.load_flavor(flavor["name"]) == flavor
+
+def test_missing_and_null_keys_stay_as_they_were(library):
+    layers = {"products": {"count": 1, "order": [{"name": "ex002a", "duration": "10"}]}, "sensors": {"count": 0}, "misc": {"count": 0}}
+    without = {"name": "K", "init": True, **layers}
+    with_nulls = {"name": "D", "init": False, "modifiers": None, "duration": None, "comment": "kept", **layers}
+    library.save_flavors([without, with_nulls])
+    assert library.load_flavor("K") == without
+    assert "modifiers" not in library.load_flavor("K")
+    assert library.load_flavor("D") == with_nulls
+
+def test_saving_does_not_touch_the_flavor(library):
+    flavor = {"name": "K", "products": {"order": [{"name": "ex002a", "duration": "10"}]}}
+    library.save_flavor(flavor)
+    assert flavor == {"name": "K", "products": {"order": [{"name": "ex002a", "duration": "10"}]}}
+
+def test_search(library):
+    def flavor(name, products):
+        return {"name": name, "init": True, "products": {"count": len(products), "order": [{"name": product, "duration": "5"} for product in products]}}
+    library.save_flavors([flavor("K", ["ex002a", "cc001a"]), flavor("KA", ["cc001a"])], source="UNIT1")
+    library.save_flavors([flavor("K", ["ex002a"]), flavor("D", ["rad001a"])], source="UNIT2")
+    found = lambda **query: [(row["source"], row["name"]) for row in library.search(**query)]
+    assert found(product="ex002a") == [("UNIT1", "K"), ("UNIT2", "K")]
+    assert found(product="cc001a", source="UNIT1") == [("UNIT1", "K"), ("UNIT1", "KA")]
+    assert found(name="K%") == [("UNIT1", "K"), ("UNIT1", "KA"), ("UNIT2", "K")]
+    assert found(name="K%", product="cc001a") == [("UNIT1", "K"), ("UNIT1", "KA")]
+    assert found(product="nope") == []
+    assert library.sources() == ["UNIT1", "UNIT2"]
+    assert library.product_usage() == {"cc001a": 2, "ex002a": 2, "rad001a": 1}
+    library.delete_flavor("K", source="UNIT2")
+    assert found(product="ex002a") == [("UNIT1", "K")]
+    assert library.load_flavor("K", source="UNIT2") == None
+
+def test_layer_counts_and_keys_stay_as_they_were(library):
+    flavor = {"name": "K", "init": True,
+              "products": {"count": 5, "order": [{"name": "ex002a", "duration": "10"}, {"name": "cc001a", "duration": 5}], "num_key": "c_K_product_num"},
+              "sensors": {"count": 2, "order": []},
+              "misc": {"count": 1, "order": None}}
+    library.save_flavor(flavor)
+    assert library.load_flavor("K") == flavor
+    assert library.search(product="cc001a")[0]["product_count"] == 2
+    without_layers = {"name": "D", "init": False}
+    library.save_flavor(without_layers)
+    assert library.load_flavor("D") == without_layers
+
+def test_libraries_from_before_layers_were_stored(tmp_path):
+    import sqlite3
+    path = str(tmp_path / "old.db")
+    with sqlite3.connect(path) as db:
+        db.executescript(FL.SCHEMA.replace("    layers TEXT,\n", ""))
+        db.execute("INSERT INTO product_names (name) VALUES ('ex002a')")
+        db.execute("INSERT INTO flavors (id, name, init, updated) VALUES (1, 'K', 1, 0)")
+        db.execute("INSERT INTO layer_items VALUES (1, 'products', 0, 1, '10')")
+    with FL.FlavorLibrary(path) as library:
+        assert library.load_flavor("K") == {"name": "K", "init": True, "products": {"count": 1, "order": [{"name": "ex002a", "duration": "10"}]},
+                                            "sensors": {"count": 0}, "misc": {"count": 0}}
+        flavor = {"name": "D", "init": True, "products": {"count": 3, "order": [{"name": "ex002a", "duration": "10"}]}}
+        library.save_flavor(flavor)
+        assert library.load_flavor("D") == flavor
@@ -0,0 +1,64 @@
+## Times each stage of the export -> parse -> extract round trip on a fixed workload and fails if any stage got slower than
+## tests/perf_baseline.json allows. Run with -s to see the numbers. To record a new baseline after an intended change:
+##   FLAVOR_PERF_UPDATE=1 python -m pytest tests/test_perf.py
+import os, json, time, random
+import pytest
+import DIFDecode
+import FlavorExtractor as FE
+import FlavorManagement as FM
+from flavorgen import random_flavor, expected_extraction
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "perf_baseline.json")
+FLAVOR_COUNT = 200
+SEED = 2024
+REPEATS = 5 # best of, to keep the noise of a busy machine out
+
+def best_time(function, *args):
+    best = None
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best == None else min(best, elapsed)
+    return best, result
+
+def write_txt(path:str, dif:str):
+    with open(path, "w") as out_f:
+        out_f.write(dif)
+
+@pytest.mark.perf
+def test_round_trip_throughput(tmp_path, record_property):
+    rng = random.Random(SEED)
+    taken = set()
+    targets = [random_flavor(rng, taken) for _ in range(FLAVOR_COUNT)]
+    path = str(tmp_path / "unit.txt")
+
+    timings = {}
+    timings["build"], dif = best_time(lambda: "".join(FM.build_dif_txt(target) for target in targets))
+    write_txt(path, dif) # not timed, that's just the disk cache
+    timings["parse"], database = best_time(DIFDecode.parse_wxl_txt, path)
+    timings["extract"], flavors = best_time(FE.extract_flavors, database)
+    assert flavors == {target["name"]: expected_extraction(target) for target in targets}
+
+    keys = len(database)
+    throughput = {stage: round(keys / seconds) for stage, seconds in timings.items()} # keys per second
+    for stage, seconds in timings.items():
+        record_property(f"{stage}_ms", round(seconds * 1000, 2))
+    print(f"\nRound trip of {FLAVOR_COUNT} flavors ({keys} keys): " +
+          ", ".join(f"{stage} {seconds * 1000:.1f} ms ({throughput[stage]} keys/s)" for stage, seconds in timings.items()))
+
+    if os.environ.get("FLAVOR_PERF_UPDATE"):
+        with open(BASELINE_PATH, "w") as baseline_file:
+            json.dump({"flavors": FLAVOR_COUNT, "seed": SEED, "keys": keys, "allowed_slowdown": 3.0, "keys_per_second": throughput}, baseline_file, indent=4)
+        pytest.skip(f"Wrote a new baseline to '{BASELINE_PATH}'")
+    if not os.path.exists(BASELINE_PATH):
+        pytest.skip("No perf baseline yet, record one with FLAVOR_PERF_UPDATE=1")
+    with open(BASELINE_PATH, "r") as baseline_file:
+        baseline = json.load(baseline_file)
+    assert baseline["keys"] == keys, "The workload changed, record a new baseline"
+    slow = []
+    for stage, expected in baseline["keys_per_second"].items():
+        floor = expected / baseline["allowed_slowdown"]
+        if throughput[stage] < floor:
+            slow.append(f"{stage}: {throughput[stage]} keys/s, baseline {expected} (at least {floor:.0f} allowed)")
+    assert not slow, "Round trip got slower than the baseline:\n" + "\n".join(slow)
@@ -0,0 +1,48 @@
+## The forecast preview dialog cleans up after itself: no dialog or thumbnail slot is left behind per preview.
+import os
+import pytest
+pytest.importorskip("PySide6")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import QCoreApplication, QEvent, QTimer, SIGNAL
+import FlavorManagement as FM
+import FlavorBuilderGUI as FBG
+import TimelinePreview
+
+FLAVOR = {"name": "K", "init": True, "products": {"order": [{"name": "ex002a", "duration": "10"}, {"name": "cc001a", "duration": "5"}]},
+          "sensors": {"order": [{"name": "par_tmp001", "duration": "15"}]}, "misc": {"count": 1, "order": [{"name": "clock", "duration": 15}]}}
+
+def loaded_receivers(cache):
+    return cache.receivers(SIGNAL("loaded(QString,QString)"))
+
+def close_preview():
+    for widget in QApplication.topLevelWidgets():
+        if isinstance(widget, TimelinePreview.TimelinePreview) and widget.isVisible():
+            widget.reject()
+
+def test_preview_leaves_nothing_behind(tmp_path):
+    app = QApplication.instance() or QApplication([])
+    previous = FM.flavor
+    window = FBG.MainWindow(autosave_folder=str(tmp_path / "autosave"))
+    try:
+        FM.set_flavor(dict(FLAVOR))
+        window.refresh_flavor()
+        widgets = len(QApplication.allWidgets())
+        receivers = loaded_receivers(window.thumbnails)
+        for _ in range(3):
+            QTimer.singleShot(0, close_preview)
+            window.preview_flavor()
+            QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+        assert len(QApplication.allWidgets()) == widgets
+        assert not window.findChildren(TimelinePreview.TimelinePreview)
+        assert loaded_receivers(window.thumbnails) == receivers
+    finally:
+        window.close()
+        FM.flavor = previous
+
+def test_screen_is_not_shadowed():
+    app = QApplication.instance() or QApplication([])
+    preview = TimelinePreview.TimelinePreview(dict(FLAVOR))
+    assert callable(preview.screen) # QWidget.screen()
+    preview.done(0)
+    preview.done(0) # closing twice doesn't try to disconnect twice
@@ -0,0 +1,65 @@
+## Export -> parse -> extract round trips of random flavors. Every flavor has to come back exactly as it was exported.
+import random
+import pytest
+import DIFConvert
+import DIFDecode
+import FlavorExtractor as FE
+import FlavorManagement as FM
+from flavorgen import random_flavor, expected_extraction
+
+SEEDS = range(40)
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_single_flavor_round_trip(tmp_path, seed):
+    target = random_flavor(random.Random(seed))
+    path = tmp_path / "flavor.txt"
+    FM.export_dif_txt(str(path), target)
+    flavors = FE.extract_flavors_from_file(str(path))
+    assert flavors == {target["name"]: expected_extraction(target)}
+
+def test_many_flavors_in_one_dif(tmp_path):
+    rng = random.Random(1234)
+    taken = set()
+    targets = [random_flavor(rng, taken) for _ in range(60)]
+    path = tmp_path / "unit.txt"
+    path.write_text("".join(FM.build_dif_txt(target) for target in targets))
+    flavors = FE.extract_flavors_from_file(str(path))
+    assert flavors == {target["name"]: expected_extraction(target) for target in targets}
+
+def test_flavor_named_flavor(tmp_path):
+    '''Its keys (c_flavor_product_num, ...) look like init keys of other flavors, they're still read as its own.'''
+    targets = [random_flavor(random.Random(1)), random_flavor(random.Random(2))] # one with sensors and a clock, one without init
+    targets[0]["name"], targets[1]["name"] = "flavor", "Day"
+    path = tmp_path / "unit.txt"
+    path.write_text("".join(FM.build_dif_txt(target) for target in targets))
+    flavors = FE.extract_flavors_from_file(str(path))
+    assert flavors == {target["name"]: expected_extraction(target) for target in targets}
+
+def test_round_trip_through_dat(tmp_path):
+    rng = random.Random(99)
+    taken = set()
+    targets = [random_flavor(rng, taken) for _ in range(20)]
+    txt_path = tmp_path / "unit.txt"
+    dat_path = tmp_path / "unit.dat"
+    txt_path.write_text("".join(FM.build_dif_txt(target) for target in targets))
+    DIFConvert.convert(str(txt_path), str(dat_path))
+    assert DIFDecode.parse(str(dat_path)) == DIFDecode.parse_wxl_txt(str(txt_path))
+    assert FE.extract_flavors_from_file(str(dat_path)) == {target["name"]: expected_extraction(target) for target in targets}
+
+def test_extracted_flavor_exports_the_same_dif(tmp_path):
+    '''Re-exporting an extracted flavor gives the same TXT, version hashes included.'''
+    target = random_flavor(random.Random(7))
+    path = tmp_path / "flavor.txt"
+    FM.export_dif_txt(str(path), target)
+    extracted = FE.extract_flavors_from_file(str(path))[target["name"]]
+    assert FM.build_dif_txt(extracted) == path.read_text()
+
+def test_expiring_records_are_left_out(tmp_path):
+    target = random_flavor(random.Random(3))
+    path = tmp_path / "flavor.txt"
+    dif = FM.build_dif_txt(target)
+    path.write_text(dif + FM.dif_string(f"c_{target['name']}_product_00", "stale", exp_ts=1))
+    expiring = []
+    database = DIFDecode.parse(str(path), expiring=expiring)
+    assert database[f"c_{target['name']}_product_00"] == target["products"]["order"][0]["name"]
+    assert expiring == [(f"c_{target['name']}_product_00", "stale", 1)]
@@ -0,0 +1,154 @@
+## FlavorService over real HTTP on localhost: every endpoint, the parse cache (hits, misses, rewritten files, concurrent
+## requests for one file), and the guards against requests it must refuse.
+import os, json, time, random, threading, urllib.request, urllib.error
+import pytest
+import DIFDecode
+import FlavorManagement as FM
+import FlavorService
+from flavorgen import random_flavor, expected_extraction
+
+@pytest.fixture
+def flavors():
+    rng = random.Random(41)
+    taken = set()
+    return [random_flavor(rng, taken) for _ in range(12)]
+
+@pytest.fixture
+def dif_path(tmp_path, flavors):
+    path = tmp_path / "unit.txt"
+    path.write_text("".join(FM.build_dif_txt(target) for target in flavors))
+    return str(path)
+
+@pytest.fixture
+def server(tmp_path):
+    server = FlavorService.make_server(port=0, out_dir=str(tmp_path / "out"))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def call(server, endpoint:str, request:dict=None, content_type:str="application/json", host:str=None):
+    '''Returns (status, response JSON). GET without a request.'''
+    url = f"http://127.0.0.1:{server.server_address[1]}{endpoint}"
+    data = None if request == None else json.dumps(request).encode("utf-8")
+    headers = {"Content-Type": content_type} if data != None else {}
+    if host != None:
+        headers["Host"] = host
+    http_request = urllib.request.Request(url, data=data, headers=headers)
+    try:
+        with urllib.request.urlopen(http_request, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+def cache_counts(server):
+    status = call(server, "/status")[1]
+    return status["hits"], status["misses"]
+
+def test_endpoints(server, dif_path, flavors, tmp_path):
+    status, parsed = call(server, "/parse", {"path": dif_path})
+    assert status == 200 and parsed["database"] == DIFDecode.parse(dif_path) and parsed["keys"] == len(parsed["database"])
+    name = flavors[0]["name"]
+    status, prefixed = call(server, "/parse", {"path": dif_path, "prefix": f"c_{name}_"})
+    assert prefixed["database"] == {key: data for key, data in parsed["database"].items() if key.startswith(f"c_{name}_")}
+
+    status, extracted = call(server, "/extract", {"path": dif_path})
+    assert extracted["flavors"] == {target["name"]: expected_extraction(target) for target in flavors}
+    assert call(server, "/extract", {"path": dif_path, "names": [name]})[1]["flavors"] == {name: expected_extraction(flavors[0])}
+    assert call(server, "/extract", {"path": dif_path, "names": ["NOPE"]})[0] == 404
+
+    assert call(server, "/validate", {"path": dif_path})[1]["errors"] == {target["name"]: [] for target in flavors}
+    assert call(server, "/validate", {"flavor": {"name": "bad!"}})[1]["errors"]["bad!"] != []
+
+    status, exported = call(server, "/export", {"flavor": flavors[0], "out": "K.txt"})
+    assert status == 200 and exported == {"dif": FM.build_dif_txt(dict(flavors[0])), "skipped": []}
+    assert (tmp_path / "out" / "K.txt").read_text() == exported["dif"]
+    assert call(server, "/export", {"flavor": {"name": "bad!"}})[1] == {"dif": "", "skipped": ["bad!"]}
+
+    status, info = call(server, "/status")
+    assert status == 200 and info["entries"][0]["path"] == os.path.realpath(dif_path)
+
+def test_cache_hits_and_rewritten_files(server, dif_path, flavors):
+    call(server, "/parse", {"path": dif_path})
+    assert cache_counts(server) == (0, 1)
+    call(server, "/parse", {"path": dif_path})
+    call(server, "/extract", {"path": dif_path})
+    assert cache_counts(server) == (2, 1)
+    with open(dif_path, "w") as dif_file: # a new dump under the same name is parsed again, and replaces the old one
+        dif_file.write(FM.build_dif_txt(flavors[0]))
+    assert list(call(server, "/extract", {"path": dif_path})[1]["flavors"]) == [flavors[0]["name"]]
+    assert cache_counts(server) == (2, 2)
+    assert len(call(server, "/status")[1]["entries"]) == 1
+
+def test_concurrent_requests_parse_once(server, dif_path, monkeypatch):
+    calls = []
+    parse = DIFDecode.parse
+    def slow_parse(path, *args, **kwargs):
+        calls.append(path)
+        time.sleep(0.2) # long enough for every request to be waiting on the same file
+        return parse(path, *args, **kwargs)
+    monkeypatch.setattr(DIFDecode, "parse", slow_parse)
+    results = []
+    barrier = threading.Barrier(8)
+    def request():
+        barrier.wait()
+        results.append(call(server, "/extract", {"path": dif_path})[0])
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [200] * 8
+    assert len(calls) == 1
+    assert cache_counts(server) == (7, 1)
+
+def test_failed_parse_is_retried(server, dif_path, monkeypatch):
+    parse = DIFDecode.parse
+    def broken_parse(path, *args, **kwargs):
+        raise OSError("disk went away")
+    monkeypatch.setattr(DIFDecode, "parse", broken_parse)
+    assert call(server, "/parse", {"path": dif_path})[0] == 500
+    assert server.RequestHandlerClass.service.cache.loading == {}
+    monkeypatch.setattr(DIFDecode, "parse", parse)
+    assert call(server, "/parse", {"path": dif_path})[0] == 200
+
+def test_refused_requests(server, dif_path, flavors, tmp_path):
+    assert call(server, "/parse", {"path": dif_path}, content_type="text/plain")[0] == 415 # a cross-site "simple" POST
+    assert call(server, "/parse", {"path": dif_path}, content_type="application/x-www-form-urlencoded")[0] == 415
+    assert call(server, "/parse", {"path": dif_path}, content_type="application/json; charset=utf-8")[0] == 200
+    for out in ("../escaped.txt", str(tmp_path / "escaped.txt"), "."):
+        assert call(server, "/export", {"flavor": flavors[0], "out": out})[0] == 403
+    assert not (tmp_path / "escaped.txt").exists()
+    assert call(server, "/nope", {})[0] == 404
+    assert call(server, "/parse", {})[0] == 400
+    for names in ("K", [1], {"K": 1}):
+        assert call(server, "/extract", {"path": dif_path, "names": names})[0] == 400
+    assert call(server, "/parse", {"path": dif_path, "prefix": 1})[0] == 400
+
+def test_other_hosts_are_refused(server, dif_path):
+    port = server.server_address[1]
+    for host in ("evil.example", f"evil.example:{port}", "127.0.0.1.evil.example", "localhost.:1", ""):
+        assert call(server, "/parse", {"path": dif_path}, host=host)[0] == 403
+        assert call(server, "/status", host=host)[0] == 403
+    for host in (f"localhost:{port}", "LOCALHOST", f"127.0.0.1:{port}", f"[::1]:{port}"):
+        assert call(server, "/parse", {"path": dif_path}, host=host)[0] == 200
+
+def test_refused_requests_do_not_break_the_connection(server, dif_path):
+    import http.client
+    connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=10)
+    body = json.dumps({"path": dif_path})
+    connection.request("POST", "/parse", body, {"Content-Type": "text/plain"})
+    response = connection.getresponse()
+    assert response.status == 415
+    response.read()
+    connection.request("POST", "/parse", body, {"Content-Type": "application/json"}) # reconnects if the server closed it
+    assert connection.getresponse().status == 200
+    connection.close()
+
+def test_writing_files_is_off_without_an_out_dir(flavors):
+    service = FlavorService.FlavorService()
+    with pytest.raises(FlavorService.ServiceError) as error:
+        service.export({"flavor": flavors[0], "out": "K.txt"})
+    assert error.value.status == 403
+    assert service.export({"flavor": flavors[0]})["skipped"] == []
@@ -0,0 +1,55 @@
+## ThumbnailCache with a pre-built atlas: a thumbnail that's edited on disk after it was served from the atlas is decoded again,
+## and the atlas is rebuilt with the new one.
+import os, time
+import pytest
+pytest.importorskip("PySide6")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+from PySide6.QtWidgets import QApplication
+from PySide6.QtGui import QColor, QImage
+import ThumbnailAtlas
+import ThumbnailCache
+
+def write_thumb(name:str, color:str):
+    os.makedirs(os.path.join("product-data", name), exist_ok=True)
+    image = QImage(100, 100, QImage.Format_RGB32)
+    image.fill(QColor(color))
+    assert image.save(ThumbnailAtlas.thumb_path("product", name), quality=100)
+
+def icon_color(icon):
+    return icon.pixmap(100, 100).toImage().pixelColor(50, 50)
+
+def process_until(app, condition, timeout:float=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+    return condition()
+
+def close_enough(color, expected:str):
+    expected = QColor(expected)
+    return all(abs(a - b) < 16 for a, b in zip(color.getRgb()[:3], expected.getRgb()[:3]))
+
+def test_editing_an_atlas_thumbnail_reloads_it(tmp_path, monkeypatch):
+    app = QApplication.instance() or QApplication([])
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("app")
+    write_thumb("ex002a", "red")
+    write_thumb("cc001a", "blue")
+    assert ThumbnailAtlas.build_atlas() == 2
+    cache = ThumbnailCache.ThumbnailCache()
+    cache.wait_for_pending()
+    assert process_until(app, lambda: not cache.atlas_checking)
+    assert "product/ex002a" in cache.atlas_entries
+    assert close_enough(icon_color(cache.icon("product", "ex002a")), "red") # cut out of the atlas
+    changed = []
+    cache.changed.connect(changed.append)
+    time.sleep(0.01) # a new mtime even on coarse filesystem clocks
+    write_thumb("ex002a", "green")
+    assert process_until(app, lambda: changed)
+    assert "product/ex002a" not in cache.atlas_entries
+    assert close_enough(icon_color(cache.icon("product", "ex002a", wait=True)), "green")
+    assert process_until(app, lambda: "product/ex002a" in cache.atlas_entries and not cache.atlas_checking) # rebuilt
+    image, entries, signature = ThumbnailAtlas.load_atlas()
+    assert close_enough(image.copy(entries["product/ex002a"]).pixelColor(50, 50), "green")
+    assert not ThumbnailAtlas.is_stale(signature)
+    assert close_enough(icon_color(cache.icon("product", "cc001a")), "blue")
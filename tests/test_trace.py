@@ -0,0 +1,176 @@
+## FlavorTrace's Tracer: nested spans and which of them get logged, the event loop exemption (driven by a fake heartbeat counter
+## instead of a StallWatchdog), instrumenting classes and modules, and the Chrome trace it exports.
+import json, time, types, inspect, logging, threading
+import pytest
+import FlavorTrace
+
+def sleep_ms(ms:float):
+    time.sleep(ms / 1000)
+
+def slow_warnings(caplog):
+    return [record.getMessage() for record in caplog.records if record.name == "FlavorTrace" and record.levelno == logging.WARNING]
+
+def test_nested_spans_log_only_the_innermost_slow_one(caplog):
+    tracer = FlavorTrace.Tracer(slow_ms=50)
+    def outer():
+        tracer.span("fast", lambda: None)
+        tracer.span("inner", tracer.span, "innermost", sleep_ms, 80)
+        sleep_ms(60)
+        return "done"
+    with caplog.at_level(logging.WARNING, "FlavorTrace"):
+        assert tracer.span("outer", outer) == "done"
+        tracer.span("sibling", sleep_ms, 80) # an earlier logged span doesn't silence the next one
+    assert [message.split("'")[1] for message in slow_warnings(caplog)] == ["innermost", "sibling"]
+    spans = {event["name"]: event for event in tracer.events}
+    assert [event["name"] for event in tracer.events] == ["fast", "innermost", "inner", "outer", "sibling"] # in the order they ended
+    outer_span, inner_span = spans["outer"], spans["inner"]
+    assert outer_span["ts"] <= inner_span["ts"] and inner_span["ts"] + inner_span["dur"] <= outer_span["ts"] + outer_span["dur"]
+    assert outer_span["dur"] >= 140000
+
+def test_slow_parent_of_fast_children_is_logged(caplog):
+    tracer = FlavorTrace.Tracer(slow_ms=50)
+    def outer():
+        for _ in range(3):
+            tracer.span("fast", lambda: None)
+        sleep_ms(80)
+    with caplog.at_level(logging.WARNING, "FlavorTrace"):
+        tracer.span("outer", outer)
+    assert [message.split("'")[1] for message in slow_warnings(caplog)] == ["outer"]
+
+def test_spans_that_ran_an_event_loop_are_not_logged(caplog):
+    tracer = FlavorTrace.Tracer(slow_ms=50)
+    def modal_dialog():
+        for _ in range(3): # what StallWatchdog.beat does while a dialog's event loop runs
+            sleep_ms(30)
+            tracer.heartbeats += 1
+    with caplog.at_level(logging.WARNING, "FlavorTrace"):
+        tracer.span("dialog", modal_dialog)
+    assert slow_warnings(caplog) == []
+    assert tracer.events[-1]["args"] == {"event_loop": True}
+
+def test_only_the_ui_thread_is_logged(caplog):
+    tracer = FlavorTrace.Tracer(slow_ms=10)
+    with caplog.at_level(logging.WARNING, "FlavorTrace"):
+        thread = threading.Thread(target=tracer.span, args=("worker", sleep_ms, 30), name="Worker")
+        thread.start()
+        thread.join()
+    assert slow_warnings(caplog) == []
+    assert tracer.thread_names[tracer.events[-1]["tid"]] == "Worker"
+
+def test_errors_still_close_the_span():
+    tracer = FlavorTrace.Tracer()
+    def broken():
+        raise ValueError("nope")
+    with pytest.raises(ValueError):
+        tracer.span("broken", broken)
+    assert [event["name"] for event in tracer.events] == ["broken"]
+    assert tracer.local.open_spans == []
+
+class Window:
+    def __init__(self):
+        self.calls = []
+    def on_click(self, checked=False):
+        self.calls.append(checked)
+        return checked
+    def refresh(self, *args):
+        self.calls.append(args)
+
+def test_instrument_class_skips_what_is_already_wrapped():
+    tracer = FlavorTrace.Tracer()
+    owner = type("Window", (Window,), dict(vars(Window)))
+    signature = inspect.signature(owner.on_click)
+    assert tracer.instrument(owner) == ["on_click", "refresh"] # dunders are left alone
+    assert tracer.instrument(owner) == []
+    assert FlavorTrace.Tracer().instrument(owner, ["on_click", "missing"]) == []
+    assert owner.on_click.__wrapped__ is Window.on_click
+    assert inspect.signature(owner.on_click) == signature and owner.on_click.__name__ == "on_click"
+    window = owner()
+    assert window.on_click(True) == True
+    window.refresh(1, 2)
+    assert window.calls == [True, (1, 2)]
+    assert [event["name"] for event in tracer.events] == ["Window.on_click", "Window.refresh"]
+
+def test_instrument_module_only_wraps_its_own_functions():
+    module = types.ModuleType("fake_module")
+    exec("from json import dumps\ndef parse(path):\n    return path.upper()\nVALUE = 1", module.__dict__)
+    tracer = FlavorTrace.Tracer()
+    assert tracer.instrument(module) == ["parse"]
+    assert module.dumps is json.dumps
+    assert module.parse("k") == "K" and tracer.events[-1]["name"] == "fake_module.parse"
+
+def test_wrapped_functions_drop_extra_arguments_like_qt_does():
+    tracer = FlavorTrace.Tracer()
+    owner = type("Window", (Window,), dict(vars(Window)))
+    tracer.instrument(owner)
+    window = owner()
+    assert window.on_click(True, "extra") == True # a signal with more arguments than the slot takes
+    window.refresh(1, 2, 3)
+    assert window.calls == [True, (1, 2, 3)]
+
+def test_wrapped_slots_still_connect_to_qt_signals():
+    pytest.importorskip("PySide6")
+    from PySide6.QtCore import QObject, Signal
+    class Sender(QObject):
+        changed = Signal(int, str)
+    class Receiver(QObject):
+        def __init__(self):
+            super().__init__()
+            self.values = []
+        def on_changed(self, value):
+            self.values.append(value)
+    tracer = FlavorTrace.Tracer()
+    tracer.instrument(Receiver, ["on_changed"])
+    sender, receiver = Sender(), Receiver()
+    sender.changed.connect(receiver.on_changed)
+    sender.changed.emit(5, "ignored")
+    assert receiver.values == [5]
+    assert [event["name"] for event in tracer.events] == ["Receiver.on_changed"]
+
+def test_export_is_a_chrome_trace(tmp_path):
+    tracer = FlavorTrace.Tracer()
+    tracer.span("MainWindow.load", lambda: None)
+    def dialog():
+        tracer.heartbeats += 1
+    tracer.span("Dialog.exec", dialog)
+    def watchdog(): # what StallWatchdog.run records from its own thread
+        tracer.add_instant("stack sample", time.perf_counter(), {"stack": ["a.py:1 f"]}, tid=tracer.thread_id("Stall watchdog"))
+    thread = threading.Thread(target=watchdog)
+    thread.start()
+    thread.join()
+    path = tmp_path / "trace.json"
+    assert tracer.export(str(path)) == 3
+    trace = json.loads(path.read_text())
+    assert set(trace) == {"traceEvents", "displayTimeUnit"} and trace["displayTimeUnit"] == "ms"
+    metadata = [event for event in trace["traceEvents"] if event["ph"] == "M"]
+    assert metadata[0] == {"name": "process_name", "ph": "M", "pid": tracer.pid, "args": {"name": "Flavor Builder"}}
+    assert sorted(event["args"]["name"] for event in metadata[1:]) == ["Stall watchdog", "UI"]
+    assert all(event["name"] == "thread_name" and event["tid"] in tracer.thread_names for event in metadata[1:])
+    load, dialog_span, sample = [event for event in trace["traceEvents"] if event["ph"] != "M"]
+    for span in (load, dialog_span):
+        assert set(span) - {"args"} == {"name", "ph", "ts", "dur", "pid", "tid"}
+        assert span["ph"] == "X" and span["ts"] >= 0 and span["dur"] >= 0 and span["pid"] == tracer.pid
+    assert "args" not in load and dialog_span["args"] == {"event_loop": True}
+    assert dialog_span["ts"] >= load["ts"] + load["dur"]
+    assert sample["ph"] == "i" and sample["s"] == "t" and sample["args"] == {"stack": ["a.py:1 f"]}
+    assert sample["tid"] != load["tid"]
+
+def test_oldest_events_are_dropped():
+    tracer = FlavorTrace.Tracer(max_events=3)
+    for n in range(5):
+        tracer.span(f"span {n}", lambda: None)
+    assert [event["name"] for event in tracer.events] == ["span 2", "span 3", "span 4"]
+
+def test_restore_puts_the_originals_back():
+    module = types.ModuleType("fake_module")
+    exec("def parse(path):\n    return path.upper()", module.__dict__)
+    owner = type("Window", (Window,), dict(vars(Window)))
+    originals = (module.parse, owner.on_click, owner.refresh)
+    first = FlavorTrace.Tracer()
+    first.instrument(module)
+    first.instrument(owner)
+    first.restore()
+    assert (module.parse, owner.on_click, owner.refresh) == originals and first.instrumented == []
+    second = FlavorTrace.Tracer()
+    assert second.instrument(module) == ["parse"] # a second tracer gets its own spans instead of an empty trace
+    module.parse("k")
+    assert [event["name"] for event in second.events] == ["fake_module.parse"] and len(first.events) == 0
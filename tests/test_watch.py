@@ -0,0 +1,63 @@
+## FlavorWatcher against a drop folder in tmp_path: two dumps for the same unit, and flavor names that aren't file names.
+import os, json, random, logging
+import FlavorManagement as FM
+import FlavorWatch
+from flavorgen import random_flavor
+
+def write_dump(path, *names):
+    rng = random.Random(42)
+    dif = ""
+    for name in names:
+        target = random_flavor(rng)
+        target["name"] = name
+        dif += FM.build_dif_txt(target)
+    path.write_text(dif)
+
+def settle(watcher:FlavorWatch.FlavorWatcher):
+    '''Polls twice, the second time after the dumps count as settled. Returns how many dumps that processed.'''
+    watcher.poll(now=0)
+    return watcher.poll(now=watcher.settle)
+
+def test_dumps_for_the_same_unit_are_refused(tmp_path, caplog):
+    drop, out = tmp_path / "drop", tmp_path / "units"
+    drop.mkdir()
+    out.mkdir()
+    write_dump(drop / "KXYZ.txt", "Day")
+    watcher = FlavorWatch.FlavorWatcher(str(drop), str(out), settle=1)
+    assert settle(watcher) == 1
+    assert os.listdir(out / "KXYZ") == ["Day.json"]
+    write_dump(drop / "KXYZ.dat", "Night")
+    with caplog.at_level(logging.ERROR, "FlavorWatch"):
+        assert settle(watcher) == 0
+        settle(watcher)
+    assert len([record for record in caplog.records if "more than one dump" in record.getMessage()]) == 1 # logged once
+    assert os.listdir(out / "KXYZ") == ["Day.json"] # neither dump touched the other's flavors
+    os.remove(drop / "KXYZ.dat")
+    write_dump(drop / "KXYZ.txt", "Day", "Evening")
+    assert settle(watcher) == 1
+    assert sorted(os.listdir(out / "KXYZ")) == ["Day.json", "Evening.json"]
+
+def test_flavor_names_that_are_not_file_names_are_skipped(tmp_path, caplog):
+    drop, out = tmp_path / "drop", tmp_path / "units"
+    drop.mkdir()
+    out.mkdir()
+    write_dump(drop / "KXYZ.txt", "Day", "../Escape", "..", "sub\\dir")
+    watcher = FlavorWatch.FlavorWatcher(str(drop), str(out), settle=1)
+    with caplog.at_level(logging.WARNING, "FlavorWatch"):
+        assert settle(watcher) == 1
+    assert sorted(os.listdir(tmp_path)) == ["drop", "units"]
+    assert sorted(os.listdir(out)) == [".watch_state.json", "KXYZ"]
+    assert os.listdir(out / "KXYZ") == ["Day.json"]
+    with open(out / ".watch_state.json") as state_file:
+        assert json.load(state_file)["KXYZ.txt"]["flavors"] == ["Day"]
+    assert len([record for record in caplog.records if "can't be written" in record.getMessage()]) == 3
+
+def test_unit_names_that_are_not_folder_names_are_refused(tmp_path):
+    drop, out = tmp_path / "drop", tmp_path / "units"
+    drop.mkdir()
+    out.mkdir()
+    write_dump(drop / "...txt", "Day")
+    watcher = FlavorWatch.FlavorWatcher(str(drop), str(out), settle=1)
+    assert settle(watcher) == 1 # counted, but only recorded as failed
+    assert sorted(os.listdir(tmp_path)) == ["drop", "units"]
+    assert os.listdir(out) == [".watch_state.json"]